@@ -0,0 +1,156 @@
+import argparse
+import json
+import os
+
+from constants import TASK_STATE_NOT_STARTED, DEFAULT_PRIORITY, OWNER_ENV_VAR, DEFAULT_OWNER_ID
+from constants import BATCH_OPERATIONS, BATCH_UPDATE_FROM_STATUSES, BATCH_UPDATE_TO_STATUSES
+from constants import ERROR_UNKNOWN_OPERATION, ERROR_INVALID_TASK_ID, ERROR_INVALID_NEW_STATUS
+from constants import ERROR_INVALID_RECORD, ERROR_INVALID_PRIORITY, ERROR_INVALID_COMMIT_EVERY
+from models import Task
+from db_manager import create_db_manager
+from repository import create_task_repository
+from ingest import read_records
+from utils import validate_task_fields, text_field
+
+
+def parse_task_id(value):
+    """
+    Returns a task ID from a record field, raising ValueError if it is not a positive number
+    """
+    try:
+        task_id = int(value)
+    except (ValueError, TypeError):
+        raise ValueError(ERROR_INVALID_TASK_ID.format(value))
+    if task_id < 1:
+        raise ValueError(ERROR_INVALID_TASK_ID.format(value))
+    return task_id
+
+
+def parse_operation(record):
+    """
+    Turns one script record into an operation for TaskRepository.apply_operations.
+    Adds are checked like the add task prompts and updates like the update flow.
+
+    Raises:
+        ValueError: With the message the interactive flow would show.
+    """
+    if isinstance(record, str):
+        record = json.loads(record)
+    if not isinstance(record, dict):
+        raise ValueError(ERROR_INVALID_RECORD)
+    action = text_field(record, "op").strip().lower()
+    if action not in BATCH_OPERATIONS:
+        raise ValueError(ERROR_UNKNOWN_OPERATION.format(action))
+
+    if action == "add":
+        name = text_field(record, "name")
+        description = text_field(record, "description")
+        status = text_field(record, "status") or TASK_STATE_NOT_STARTED
+        priority = record.get("priority")
+        if priority in (None, ""):
+            priority = DEFAULT_PRIORITY
+        elif isinstance(priority, bool) or not isinstance(priority, (int, str)):
+            raise ValueError(ERROR_INVALID_PRIORITY.format(priority))
+        else:
+            try:
+                priority = int(priority)
+            except ValueError:
+                raise ValueError(ERROR_INVALID_PRIORITY.format(priority))
+        error = validate_task_fields(name, description, status, priority)
+        if error:
+            raise ValueError(error)
+        return action, Task(name=name, description=description, status=status, priority=priority)
+
+    task_id = parse_task_id(record.get("id"))
+    if action == "update":
+        status = text_field(record, "status")
+        if status not in BATCH_UPDATE_TO_STATUSES:
+            raise ValueError(ERROR_INVALID_NEW_STATUS.format(status))
+        return action, (task_id, status, BATCH_UPDATE_FROM_STATUSES)
+    return action, task_id
+
+
+def load_script(path):
+    """
+    Reads and validates every operation of a script before any of them runs
+
+    Returns:
+        tuple: (list of operations, list of (line number, error message))
+    """
+    operations = []
+    errors = []
+    for line_number, record in enumerate(read_records(path), start=1):
+        try:
+            operations.append(parse_operation(record))
+        except ValueError as e:
+            errors.append((line_number, str(e)))
+    return operations, errors
+
+
+def run_script(task_repository, path, commit_every=None):
+    """
+    Validates a script and applies it through one connection
+
+    Args:
+        task_repository (TaskRepository): Repository the operations run against.
+        path (str): Script file, JSON lines or CSV with op, id, name, description,
+            status and priority.
+        commit_every (int, optional): Commit every this many operations. None
+            applies the whole script in one transaction or not at all.
+
+    Returns:
+        dict: Counts per outcome, plus the errors found while validating and
+            the record numbers of operations that failed. Operations that
+            succeeded in a transaction that was rolled back count as
+            "rolled_back", not "applied".
+    """
+    operations, errors = load_script(path)
+    summary = {"operations": len(operations), "applied": 0, "rolled_back": 0, "failed": 0,
+               "committed": 0, "not_run": 0, "errors": errors, "failed_records": []}
+    if errors:
+        summary["not_run"] = len(operations)
+        return summary
+
+    results, committed = task_repository.apply_operations(operations, commit_every)
+    summary["applied"] = sum(1 for ok, done in zip(results, committed) if ok and done)
+    summary["rolled_back"] = sum(1 for ok, done in zip(results, committed) if ok and not done)
+    summary["failed"] = sum(1 for ok in results if ok is False)
+    summary["committed"] = sum(committed)
+    summary["not_run"] = len(operations) - summary["applied"] - summary["rolled_back"] - summary["failed"]
+    summary["failed_records"] = [index + 1 for index, ok in enumerate(results) if ok is False]
+    return summary
+
+
+def print_summary(summary):
+    for line_number, message in summary["errors"]:
+        print(f"Record {line_number}: {message}")
+    if summary["errors"]:
+        print(f"Script rejected: {len(summary['errors'])} invalid records, nothing was applied")
+        return
+    for record_number in summary["failed_records"]:
+        print(f"Record {record_number}: operation failed")
+    print(f"{summary['operations']} operations: {summary['applied']} applied, "
+          f"{summary['rolled_back']} rolled back, {summary['failed']} failed, "
+          f"{summary['not_run']} not run, {summary['committed']} committed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply a file of add, update and delete operations")
+    parser.add_argument("path", help="script file (.jsonl or .csv) with op, id, name, description, "
+                        "status, priority")
+    parser.add_argument("--commit-every", type=int, default=None,
+                        help="commit every N operations instead of all-or-nothing")
+    parser.add_argument("--owner", type=int, default=None, help="ID of the user whose tasks are changed")
+    args = parser.parse_args()
+    if args.commit_every is not None and args.commit_every < 1:
+        parser.error(ERROR_INVALID_COMMIT_EVERY.format(args.commit_every))
+
+    from db_config import DB_CONFIG
+
+    owner_id = args.owner if args.owner is not None else int(os.environ.get(OWNER_ENV_VAR, DEFAULT_OWNER_ID))
+    task_repository = create_task_repository(create_db_manager(DB_CONFIG), owner_id=owner_id)
+    print_summary(run_script(task_repository, args.path, args.commit_every))
+
+
+if __name__ == "__main__":
+    main()
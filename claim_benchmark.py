@@ -0,0 +1,84 @@
+import argparse
+import time
+from collections import Counter
+from multiprocessing import Pool
+
+from constants import TASK_STATE_NOT_STARTED
+from models import Task
+from db_manager import create_db_manager
+from repository import create_task_repository
+
+
+def seed_queue(db_config, owner_id, tasks, batch_size=1000):
+    """
+    Queues the given number of "Not started" tasks for the benchmark owner
+    """
+    repository = create_task_repository(create_db_manager(db_config), owner_id=owner_id)
+    for start in range(0, tasks, batch_size):
+        repository.add_many([
+            Task(name=f"Queued task {start + offset}", description="Claim benchmark",
+                 status=TASK_STATE_NOT_STARTED)
+            for offset in range(min(batch_size, tasks - start))
+        ])
+
+
+def drain_queue(args):
+    """
+    Worker process: claims and finishes tasks until the queue is empty
+
+    Returns:
+        list: IDs of the tasks this worker claimed
+    """
+    db_config, owner_id, worker_id, batch_size = args
+    repository = create_task_repository(create_db_manager(db_config), owner_id=owner_id)
+    claimed = []
+    while True:
+        tasks = repository.claim(batch_size, worker_id)
+        if not tasks:
+            return claimed
+        for task in tasks:
+            repository.finish_claim(task.id, worker_id)
+            claimed.append(task.id)
+
+
+def run_round(db_config, owner_id, workers, batch_size):
+    """
+    Drains the queue with the given number of worker processes.
+    With owner_id None the workers claim across all owners.
+
+    Returns:
+        tuple: (claimed task count, tasks claimed more than once, elapsed seconds)
+    """
+    start = time.perf_counter()
+    with Pool(workers) as pool:
+        results = pool.map(drain_queue, [
+            (db_config, owner_id, f"bench-{workers}-{index}", batch_size) for index in range(workers)
+        ])
+    elapsed = time.perf_counter() - start
+    claims = Counter(task_id for claimed in results for task_id in claimed)
+    duplicates = sum(1 for count in claims.values() if count > 1)
+    return sum(claims.values()), duplicates, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Claim throughput with concurrent worker processes")
+    parser.add_argument("--workers", default="1,2,4,8", help="comma separated worker process counts")
+    parser.add_argument("--tasks", type=int, default=5000, help="tasks queued for each round")
+    parser.add_argument("--batch-size", type=int, default=10, help="tasks claimed per call")
+    parser.add_argument("--owner-id", type=int, default=900000, help="owner ID the benchmark queue uses")
+    parser.add_argument("--unscoped", action="store_true",
+                        help="claim without an owner, as shared workers do (drains every owner's queue)")
+    args = parser.parse_args()
+
+    from db_config import DB_CONFIG
+
+    print(f"{'Workers':>8}{'Claimed':>10}{'Duplicates':>12}{'Seconds':>10}{'Tasks/s':>10}")
+    for workers in (int(count) for count in args.workers.split(",")):
+        seed_queue(DB_CONFIG, args.owner_id, args.tasks)
+        claim_owner_id = None if args.unscoped else args.owner_id
+        claimed, duplicates, elapsed = run_round(DB_CONFIG, claim_owner_id, workers, args.batch_size)
+        print(f"{workers:>8}{claimed:>10}{duplicates:>12}{elapsed:>10.2f}{claimed / elapsed:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
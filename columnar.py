@@ -0,0 +1,59 @@
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Columns that may be requested and how each is stored in a chunk
+INTEGER_COLUMNS = ("id", "priority")
+DATETIME_COLUMNS = ("created_at", "updated_at", "due_at")
+TEXT_COLUMNS = ("name", "description")
+CATEGORY_COLUMNS = ("status",)
+COLUMNS = INTEGER_COLUMNS + DATETIME_COLUMNS + TEXT_COLUMNS + CATEGORY_COLUMNS
+
+
+class StatusEncoder:
+    """
+    Dictionary-encodes status strings into small integer codes.
+    Codes are assigned in order of first appearance and never change,
+    so codes from earlier chunks stay valid as new statuses show up.
+    """
+    def __init__(self):
+        self.categories = []
+        self._codes = {}
+
+    def encode(self, values):
+        codes = []
+        for value in values:
+            code = self._codes.get(value)
+            if code is None:
+                code = self._codes[value] = len(self.categories)
+                self.categories.append(value)
+            codes.append(code)
+        return codes
+
+
+def build_chunk(columns, rows, status_encoder):
+    """
+    Turns a list of row tuples into one contiguous array per column
+
+    Returns:
+        dict: Column name to array. NumPy arrays when NumPy is installed,
+            otherwise array("q") for integers and codes and lists for the rest.
+            "status_categories" maps status codes back to strings.
+    """
+    chunk = {}
+    for index, column in enumerate(columns):
+        values = [row[index] for row in rows]
+        if column in CATEGORY_COLUMNS:
+            codes = status_encoder.encode(values)
+            chunk[column] = numpy.array(codes, dtype=numpy.int8) if numpy else array("b", codes)
+            chunk["status_categories"] = list(status_encoder.categories)
+        elif column in INTEGER_COLUMNS:
+            chunk[column] = numpy.array(values, dtype=numpy.int64) if numpy else array("q", values)
+        elif column in DATETIME_COLUMNS and numpy:
+            chunk[column] = numpy.array(values, dtype="datetime64[us]")
+        else:
+            chunk[column] = numpy.array(values, dtype=object) if numpy else values
+    return chunk
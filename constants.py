@@ -2,6 +2,7 @@
 TASK_STATE_NOT_STARTED = "Not started"
 TASK_STATE_IN_PROGRESS = "In progress"
 TASK_STATE_COMPLETED = "Completed"
+TASK_STATES = (TASK_STATE_NOT_STARTED, TASK_STATE_IN_PROGRESS, TASK_STATE_COMPLETED)
 
 # UI text constants
 UI_DIVIDER = 5*"_"
@@ -13,6 +14,11 @@ UI_HEADER_DELETE_TASK = UI_DIVIDER + "Delete Task" + UI_DIVIDER
 
 UI_EXIT_MESSAGE = "Type 'exit' at any prompt to return to main menu"
 UI_CANCEL_MESSAGE = "{} cancelled."
+UI_TASK_COUNTS = (f"{TASK_STATE_NOT_STARTED}: {{}} | {TASK_STATE_IN_PROGRESS}: {{}} | "
+                  f"{TASK_STATE_COMPLETED}: {{}}")
+UI_PICKER_PROMPT = "\nEnter the ID of the task to {}, or the start of its name: "
+UI_PICKER_MORE_TASKS = "Showing the first {} tasks. Type the start of a name to search."
+UI_NEXT_UP = "Next up (highest priority, earliest due date first):"
 
 # Error messages
 ERROR_TASK_NAME_REQUIRED = "Task name is required. Please enter a valid name."
@@ -23,6 +29,10 @@ ERROR_INVALID_CHOICE = "Please select a valid option ({})"
 ERROR_NO_TASKS = "No tasks found. Please add some tasks first."
 ERROR_NO_TASKS_TO_UPDATE = "No tasks available for update."
 ERROR_NO_TASKS_TO_DELETE = "No tasks available to delete."
+ERROR_INVALID_STATUS = "Invalid task status '{}'."
+ERROR_INVALID_TEXT_FIELD = "Invalid {} '{}', expected text."
+ERROR_PICKER_EMPTY = "Please enter a task ID or the start of a task name."
+ERROR_NO_MATCHING_TASKS = "No tasks found starting with '{}'."
 
 # Success messages
 SUCCESS_TASK_ADDED = "Task '{}' added successfully with status '{}'."
@@ -38,7 +48,126 @@ FAILURE_DELETE_TASK = "Failed to delete task. Please try again."
 # Database messages
 DB_CREATED_OR_EXISTS = "Database '{}' created or already exists"
 DB_TABLE_CREATED_OR_EXISTS = "Tasks table created or already exists"
+DB_CIRCUIT_OPEN = "Database is unavailable. Please try again shortly."
+
+# Database connection handling
+DB_CONNECT_TIMEOUT = 5  # seconds
+DB_QUERY_TIMEOUT = None  # seconds, needs mysql-connector-python 9.1+
+DB_MAX_EXECUTION_TIME_MS = 10000
+DB_CONNECT_RETRIES = 2
+DB_RETRY_BASE_DELAY = 0.1  # seconds
+DB_RETRY_MAX_DELAY = 2  # seconds
+DB_BREAKER_FAILURE_THRESHOLD = 3
+DB_BREAKER_RESET_TIMEOUT = 15  # seconds
+DB_REPLICA_MAX_LAG_SECONDS = 5  # also how long reads stay on the primary after a write
+DB_REPLICA_HEALTH_INTERVAL = 10  # seconds
+DB_SHARD_STRATEGY = "owner"  # "owner" or "id", used when DB_CONFIG lists several shards
 
 # Field constraints
 MAX_NAME_LENGTH = 255
-ERROR_NAME_TOO_LONG = f"Task name too long. Maximum length is {MAX_NAME_LENGTH} characters."
\ No newline at end of file
+ERROR_NAME_TOO_LONG = f"Task name too long. Maximum length is {MAX_NAME_LENGTH} characters."
+
+# Scheduling, higher priorities are worked on first
+DEFAULT_PRIORITY = 0
+MAX_PRIORITY = 9
+ERROR_INVALID_PRIORITY = f"Invalid priority '{{}}'. Use a whole number from {DEFAULT_PRIORITY} to {MAX_PRIORITY}."
+NEXT_UP_LIMIT = 10
+
+# Idempotent inserts
+MAX_IDEMPOTENCY_KEY_LENGTH = 64
+
+# Tags
+MAX_TAG_LENGTH = 50
+ERROR_INVALID_TAG = f"Invalid tag '{{}}'. Tags must be 1 to {MAX_TAG_LENGTH} characters."
+TAG_PROBE_LIMIT = 1000  # tag rows read per group to pick the most selective one
+TAG_INDEX_FETCH_CHUNK_SIZE = 1000  # task IDs per query when loading tasks found in the tag index
+
+# Bulk transitions
+BULK_TRANSITION_CHUNK_SIZE = 1000  # primary key rows walked per transaction
+BULK_TRANSITION_PAUSE_SECONDS = 0.05
+
+# Work claims
+CLAIM_LEASE_SECONDS = 300  # a claim not renewed or finished in time is requeued
+REQUEUE_INTERVAL_SECONDS = 60
+
+# Task ownership
+DEFAULT_OWNER_ID = 0
+OWNER_ENV_VAR = "TASK_MANAGER_OWNER"
+
+# Status counters
+COUNTER_SLOTS = 8
+
+# Soft delete purge
+PURGE_CHUNK_SIZE = 500
+PURGE_PAUSE_SECONDS = 0.2
+PURGE_RETENTION_DAYS = 7
+PURGE_INTERVAL_SECONDS = 300
+
+# Task picker
+PICKER_LIMIT = 20
+
+# Active task view
+TASK_VIEW_REFRESH_SECONDS = 5
+
+# Change feed, seconds re-read before the cursor on every call. Rows carry the
+# time of the statement that wrote them, not of the commit, so a transaction
+# that commits later than a poll must finish within this window to be seen.
+CHANGE_FEED_OVERLAP_SECONDS = 30
+
+# Bulk ingestion
+INGEST_BATCH_SIZE = 1000
+INGEST_QUEUE_SIZE = 8
+
+# Prefetch while the main menu waits for input
+PREFETCH_MAX_AGE_SECONDS = 30
+UI_PREFETCH_REPORT = "Wait for task listings per action:"
+
+# Batch scripts
+BATCH_OPERATIONS = ("add", "update", "delete")
+# The update flow only moves open tasks forward
+BATCH_UPDATE_FROM_STATUSES = (TASK_STATE_NOT_STARTED, TASK_STATE_IN_PROGRESS)
+BATCH_UPDATE_TO_STATUSES = (TASK_STATE_IN_PROGRESS, TASK_STATE_COMPLETED)
+ERROR_UNKNOWN_OPERATION = f"Unknown operation '{{}}'. Use one of: {', '.join(BATCH_OPERATIONS)}."
+ERROR_INVALID_TASK_ID = "Invalid task ID '{}'."
+ERROR_INVALID_NEW_STATUS = f"Invalid new status '{{}}'. Use {' or '.join(BATCH_UPDATE_TO_STATUSES)}."
+ERROR_INVALID_RECORD = "Invalid record, expected an object with op, id, name, description, status and priority."
+ERROR_INVALID_COMMIT_EVERY = "Invalid commit interval '{}'. Use a whole number of at least 1."
+
+# Snapshots
+SNAPSHOT_TABLES = ("tasks", "task_tombstones", "task_counters", "task_status_history", "tags", "task_tags")
+SNAPSHOT_CHUNK_SIZE = 50000
+SNAPSHOT_INSERT_BATCH_SIZE = 1000
+SNAPSHOT_COMPRESS_LEVEL = 1
+
+# Change notifications
+NOTIFY_BATCH_INTERVAL_SECONDS = 0.2
+NOTIFY_MAX_BATCH_EVENTS = 1000
+NOTIFY_SOCKET_PATH = "task_manager.sock"
+# Batches a socket subscriber may fall behind before its backlog is dropped
+NOTIFY_CLIENT_MAX_PENDING = 100
+# Only the user running the publishing process may subscribe
+NOTIFY_SOCKET_MODE = 0o600
+ERROR_NOTIFY_SOCKET_IN_USE = "Another process is publishing on '{}'."
+ERROR_NOTIFY_PATH_NOT_SOCKET = "'{}' exists and is not a socket."
+
+# Profiling
+PROFILE_ENV_VAR = "TASK_MANAGER_PROFILE"
+PROFILE_DEFAULT_DIR = "profiles"
+PROFILE_TOP_FUNCTIONS = 25
+
+# Request tracing
+TRACE_ENV_VAR = "TASK_MANAGER_TRACE"
+TRACE_SAMPLE_ENV_VAR = "TASK_MANAGER_TRACE_SAMPLE"
+TRACE_DEFAULT_FILE = "traces.jsonl"
+TRACE_SAMPLE_RATE = 0.1
+
+# Columnar fetch
+COLUMNAR_CHUNK_SIZE = 50000
+
+# Task columns and description storage
+TASK_FIELDS = ("id", "owner_id", "name", "description", "status", "priority", "due_at",
+               "idempotency_key", "created_at", "updated_at")
+# Everything but the description, enough for pickers and short listings
+SUMMARY_FIELDS = ("id", "owner_id", "name", "status", "priority", "due_at", "created_at", "updated_at")
+DESCRIPTION_COMPRESSION = False
+DESCRIPTION_COMPRESS_THRESHOLD = 1024  # bytes of UTF-8 text
@@ -1,43 +1,553 @@
+import random
+import threading
+import time
+import zlib
 import mysql.connector
-from mysql.connector import Error
-from constants import DB_CREATED_OR_EXISTS, DB_TABLE_CREATED_OR_EXISTS
+from mysql.connector import Error, errorcode
+from constants import DB_CREATED_OR_EXISTS, DB_TABLE_CREATED_OR_EXISTS, DB_CIRCUIT_OPEN
+from constants import (
+    DB_CONNECT_TIMEOUT, DB_QUERY_TIMEOUT, DB_MAX_EXECUTION_TIME_MS,
+    DB_CONNECT_RETRIES, DB_RETRY_BASE_DELAY, DB_RETRY_MAX_DELAY,
+    DB_BREAKER_FAILURE_THRESHOLD, DB_BREAKER_RESET_TIMEOUT, DB_SHARD_STRATEGY,
+    DB_REPLICA_MAX_LAG_SECONDS, DB_REPLICA_HEALTH_INTERVAL
+)
+
+# Driver and server errors worth retrying: the server may be restarting or
+# the connection dropped, so a later attempt can succeed. Lock waits and
+# deadlocks are left out: they come from transactions, not from connecting,
+# and retrying them means replaying the whole transaction.
+TRANSIENT_ERRORS = {
+    errorcode.CR_CONNECTION_ERROR,
+    errorcode.CR_CONN_HOST_ERROR,
+    errorcode.CR_SERVER_GONE_ERROR,
+    errorcode.CR_SERVER_LOST,
+    errorcode.ER_CON_COUNT_ERROR,
+}
+
+# updated_at is maintained by MySQL on every write so the change feed can
+# find modified rows through idx_tasks_updated_at instead of a full scan.
+# deleted_at marks soft-deleted rows. Every interactive query is scoped to
+# one owner, so the owner-leading indexes keep per-user reads proportional to
+# that user's tasks: idx_tasks_owner_status serves listings of live tasks
+# (deleted_at IS NULL) by status in ID order. Long descriptions can be stored
+# zlib-compressed in description_compressed, with description left empty.
+# due_order sorts tasks without a due date last, so idx_tasks_owner_next returns
+# one status's live tasks already in "Next up" order, and idx_tasks_next does
+# the same across owners for unscoped workers claiming work. claimed_by and
+# claim_expires_at hold the lease of a worker that claimed the task.
+# idempotency_key is an optional client request key, unique per owner, so a
+# retried insert finds the task created by the first attempt.
+TASKS_TABLE_QUERY = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    owner_id INT NOT NULL DEFAULT 0,
+    name VARCHAR(255) NOT NULL,
+    description TEXT NOT NULL,
+    description_compressed MEDIUMBLOB NULL DEFAULT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'Not started',
+    priority TINYINT NOT NULL DEFAULT 0,
+    due_at DATETIME NULL DEFAULT NULL,
+    due_order DATETIME AS (IFNULL(due_at, '9999-12-31 23:59:59')) VIRTUAL,
+    created_at DATETIME NOT NULL,
+    updated_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6)
+        ON UPDATE CURRENT_TIMESTAMP(6),
+    deleted_at DATETIME(6) NULL DEFAULT NULL,
+    idempotency_key VARCHAR(64) NULL DEFAULT NULL,
+    claimed_by VARCHAR(64) NULL DEFAULT NULL,
+    claim_expires_at DATETIME(6) NULL DEFAULT NULL,
+    INDEX idx_tasks_updated_at (updated_at),
+    INDEX idx_tasks_deleted_at (deleted_at),
+    INDEX idx_tasks_owner_status (owner_id, deleted_at, status, id),
+    INDEX idx_tasks_owner_name (owner_id, name),
+    INDEX idx_tasks_owner_updated_at (owner_id, updated_at),
+    INDEX idx_tasks_owner_next (owner_id, deleted_at, status, priority DESC, due_order, id),
+    INDEX idx_tasks_next (deleted_at, status, priority DESC, due_order, id),
+    INDEX idx_tasks_claim_expires_at (claim_expires_at),
+    UNIQUE INDEX idx_tasks_owner_idempotency_key (owner_id, idempotency_key)
+)
+"""
+
+# One row per deleted task so feed consumers can drop it from their replica
+TASK_TOMBSTONES_TABLE_QUERY = """
+CREATE TABLE IF NOT EXISTS task_tombstones (
+    task_id INT NOT NULL PRIMARY KEY,
+    owner_id INT NOT NULL DEFAULT 0,
+    deleted_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+    INDEX idx_task_tombstones_deleted_at (deleted_at),
+    INDEX idx_task_tombstones_owner_deleted_at (owner_id, deleted_at)
+)
+"""
+
+# Task counts per owner and status, kept in step with the tasks table by the repository.
+# Each status is spread over several slots so concurrent writers rarely wait
+# on the same counter row; readers add the slots up.
+TASK_COUNTERS_TABLE_QUERY = """
+CREATE TABLE IF NOT EXISTS task_counters (
+    owner_id INT NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    slot TINYINT UNSIGNED NOT NULL,
+    task_count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (owner_id, status, slot)
+)
+"""
+
+# Append-only log of status transitions, written in the same transaction as the
+# change. from_status is NULL for the row recorded when a task is created.
+# idx_task_status_history_task_at serves timelines and finds the previous
+# transition of a task; the at indexes serve time-window statistics.
+TASK_STATUS_HISTORY_TABLE_QUERY = """
+CREATE TABLE IF NOT EXISTS task_status_history (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    task_id INT NOT NULL,
+    owner_id INT NOT NULL DEFAULT 0,
+    from_status VARCHAR(20) NULL,
+    to_status VARCHAR(20) NOT NULL,
+    at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+    INDEX idx_task_status_history_task_at (task_id, at),
+    INDEX idx_task_status_history_at (at),
+    INDEX idx_task_status_history_owner_at (owner_id, at)
+)
+"""
+
+# Tags are stored once per owner and linked to tasks through task_tags. Its
+# primary key keeps the tasks of one tag as a sorted range, so intersecting
+# tags is a range scan of one tag plus primary key lookups for the others.
+TAGS_TABLE_QUERY = """
+CREATE TABLE IF NOT EXISTS tags (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    owner_id INT NOT NULL DEFAULT 0,
+    name VARCHAR(50) NOT NULL,
+    UNIQUE INDEX idx_tags_owner_name (owner_id, name)
+)
+"""
+
+TASK_TAGS_TABLE_QUERY = """
+CREATE TABLE IF NOT EXISTS task_tags (
+    tag_id INT NOT NULL,
+    task_id INT NOT NULL,
+    PRIMARY KEY (tag_id, task_id),
+    INDEX idx_task_tags_task (task_id)
+)
+"""
+
+TABLE_DEFINITIONS = [
+    TASKS_TABLE_QUERY,
+    TASK_TOMBSTONES_TABLE_QUERY,
+    TASK_COUNTERS_TABLE_QUERY,
+    TASK_STATUS_HISTORY_TABLE_QUERY,
+    TAGS_TABLE_QUERY,
+    TASK_TAGS_TABLE_QUERY,
+]
+
+
+def is_transient_error(error):
+    """
+    Check if a database error is worth retrying
+    """
+    return getattr(error, "errno", None) in TRANSIENT_ERRORS
+
+
+class CircuitBreaker:
+    """
+    Stops connection attempts after repeated failures until a probe succeeds
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+    
+    def __init__(self, failure_threshold=DB_BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout=DB_BREAKER_RESET_TIMEOUT):
+        """
+        Initialize the circuit breaker.
+        
+        Args:
+            failure_threshold (int): Consecutive failures that open the circuit.
+            reset_timeout (float): Seconds to wait before probing the database again.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+    
+    def allow_request(self):
+        """
+        Returns True if a connection attempt may go ahead.
+        Once the reset timeout has passed a single caller is let through as
+        the health probe; everyone else keeps failing fast until it reports.
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+    
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+    
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class ReplicaPool:
+    """
+    Read replicas of one database, balanced round-robin.
+    
+    Replicas are probed at most every DB_REPLICA_HEALTH_INTERVAL seconds;
+    unreachable ones and ones lagging more than DB_REPLICA_MAX_LAG_SECONDS
+    are left out until a later probe finds them healthy again. Only the
+    first probe runs in a caller's thread; later ones run in the background,
+    one at a time, while reads keep using the last known health.
+    """
+    def __init__(self, configs, db_manager):
+        self.configs = list(configs)
+        self.db_manager = db_manager
+        self.healthy = [True] * len(self.configs)
+        self.lag = [None] * len(self.configs)
+        self.checked_at = 0.0
+        self._next = 0
+        self._lock = threading.Lock()
+        # Held while a probe runs, so concurrent reads never start a second one
+        self._probe_lock = threading.Lock()
+    
+    def pick(self):
+        """
+        Returns the configuration of the next healthy replica, or None
+        """
+        if not self.checked_at:
+            # Nothing is known yet: the first reader probes, the others wait for it
+            with self._probe_lock:
+                if not self.checked_at:
+                    self.check_health()
+        elif time.monotonic() - self.checked_at >= DB_REPLICA_HEALTH_INTERVAL:
+            self._refresh_in_background()
+        with self._lock:
+            for _ in range(len(self.configs)):
+                index = self._next
+                self._next = (index + 1) % len(self.configs)
+                if self.healthy[index]:
+                    return self.configs[index]
+        return None
+    
+    def mark_unhealthy(self, config):
+        with self._lock:
+            self.healthy[self.configs.index(config)] = False
+    
+    def _refresh_in_background(self):
+        if not self._probe_lock.acquire(blocking=False):
+            return
+        
+        def probe():
+            try:
+                self.check_health()
+            finally:
+                self._probe_lock.release()
+        
+        threading.Thread(target=probe, daemon=True).start()
+    
+    def check_health(self):
+        """
+        Probes every replica for reachability and replication lag
+        """
+        self.checked_at = time.monotonic()
+        for index, config in enumerate(self.configs):
+            lag = self._measure_lag(config)
+            with self._lock:
+                self.lag[index] = lag
+                self.healthy[index] = lag is not None and lag <= DB_REPLICA_MAX_LAG_SECONDS
+    
+    def _measure_lag(self, config):
+        """
+        Returns the replica's lag in seconds, or None if it is unusable.
+        A server without replication status (e.g. a local stand-in) has no lag.
+        """
+        connection = None
+        try:
+            connection = self.db_manager._open(config)
+            cursor = connection.cursor(dictionary=True)
+            try:
+                cursor.execute("SHOW REPLICA STATUS")
+            except Error:
+                # MySQL before 8.0.22
+                cursor.execute("SHOW SLAVE STATUS")
+            status = cursor.fetchone()
+            cursor.close()
+        except Error:
+            return None
+        finally:
+            if connection:
+                try:
+                    connection.close()
+                except Error:
+                    pass
+        if not status:
+            return 0
+        lag = status.get("Seconds_Behind_Source", status.get("Seconds_Behind_Master"))
+        # NULL lag means replication is stopped or broken
+        return lag
+
 
 class DatabaseManager:
     """
     Class to manage database connection and operations
     """
-    def __init__(self, config=None):
+    def __init__(self, config=None, connect_timeout=DB_CONNECT_TIMEOUT,
+                 query_timeout=DB_QUERY_TIMEOUT, max_execution_time_ms=DB_MAX_EXECUTION_TIME_MS,
+                 retries=DB_CONNECT_RETRIES, circuit_breaker=None, session_variables=None,
+                 replica_configs=None):
         """
         Initialize the database manager with configuration.
         
         Args:
             config (dict, optional): Database configuration with host, user, password, and database keys.
+            connect_timeout (int): Seconds to wait for the server to accept a connection.
+            query_timeout (int, optional): Seconds to wait for a query result on the socket,
+                None to use the driver default.
+            max_execution_time_ms (int, optional): Server-side cap on SELECT statements.
+            retries (int): Extra connection attempts after a transient error.
+            circuit_breaker (CircuitBreaker, optional): Breaker to share between managers.
+            session_variables (dict, optional): Extra session variables set on every connection.
+            replica_configs (list, optional): Configurations of read replicas of this database.
         """
         self.config = config
-        self.connection = None
+        # Each thread gets its own connection, so a background thread can't
+        # close the connection another thread is using
+        self._local = threading.local()
+        self.session_variables = dict(session_variables or {})
+        if max_execution_time_ms:
+            self.session_variables["MAX_EXECUTION_TIME"] = max_execution_time_ms
+        self.connect_timeout = connect_timeout
+        self.query_timeout = query_timeout
+        self.max_execution_time_ms = max_execution_time_ms
+        self.retries = retries
+        self.circuit_breaker = circuit_breaker if circuit_breaker else CircuitBreaker()
+        self.replicas = ReplicaPool(replica_configs, self) if replica_configs else None
+        self.last_write_at = None
+        # A primary connection opened ahead of time by warm(), shared by all threads
+        self._warm_connection = None
+        self._warm_lock = threading.Lock()
+    
+    @property
+    def connection(self):
+        return getattr(self._local, "connection", None)
+    
+    @connection.setter
+    def connection(self, value):
+        self._local.connection = value
+    
+    def _connection_params(self, config=None):
+        """
+        Builds driver arguments with the configured timeouts
+        """
+        params = {"connection_timeout": self.connect_timeout}
+        if self.query_timeout:
+            params["read_timeout"] = self.query_timeout
+            params["write_timeout"] = self.query_timeout
+        params.update(config if config else self.config)
+        return params
+    
+    def _open(self, config=None, overrides=None):
+        """
+        Opens a connection and applies the session variables in one statement
         
-    def connect(self):
+        Args:
+            config (dict, optional): Server to connect to, the primary by default.
+            overrides (dict, optional): Session variables replacing the configured ones.
+        """
+        connection = mysql.connector.connect(**self._connection_params(config))
+        variables = dict(self.session_variables, **(overrides or {}))
+        if variables:
+            try:
+                cursor = connection.cursor()
+                cursor.execute("SET " + ", ".join(f"SESSION {name} = %s" for name in variables),
+                               tuple(variables.values()))
+                cursor.close()
+            except Error:
+                connection.close()
+                raise
+        return connection
+    
+    def _reads_need_primary(self):
+        """
+        Check if this session wrote recently enough that replicas may not have its changes
+        """
+        return (self.last_write_at is not None
+                and time.monotonic() - self.last_write_at < DB_REPLICA_MAX_LAG_SECONDS)
+        
+    def connect(self, read_only=False):
         """
         Establishes connection to the MySQL database.
         Returns connection object if successful, None otherwise.
+        
+        Args:
+            read_only (bool): The caller only reads, so a healthy replica may serve it.
+                Other connections count as writes and pin this session's reads
+                to the primary until replicas can have caught up.
         """
         # Close any existing connection first
         self.close()
         
-        try:
-            self.connection = mysql.connector.connect(**self.config)
-            if self.connection.is_connected():
+        if read_only and self.replicas and not self._reads_need_primary():
+            replica_config = self.replicas.pick()
+            if replica_config:
+                try:
+                    self.connection = self._open(replica_config)
+                    return self.connection
+                except Error:
+                    self.replicas.mark_unhealthy(replica_config)
+        if not read_only:
+            self.last_write_at = time.monotonic()
+        
+        # Fail fast while the database is known to be down
+        if not self.circuit_breaker.allow_request():
+            print(DB_CIRCUIT_OPEN)
+            return None
+        
+        warm_connection = self._take_warm()
+        if warm_connection:
+            self.connection = warm_connection
+            self.circuit_breaker.record_success()
+            return self.connection
+        
+        for attempt in range(self.retries + 1):
+            try:
+                self.connection = self._open()
+                self.circuit_breaker.record_success()
                 return self.connection
+            except Error as e:
+                self.close()
+                if attempt < self.retries and is_transient_error(e):
+                    time.sleep(self._backoff_delay(attempt))
+                    continue
+                print(f"Error connecting to MySQL: {e}")
+                break
+        
+        self.circuit_breaker.record_failure()
+        return None
+    
+    @staticmethod
+    def _backoff_delay(attempt):
+        """
+        Exponential backoff with full jitter so clients don't retry in lockstep
+        """
+        return random.uniform(0, min(DB_RETRY_MAX_DELAY, DB_RETRY_BASE_DELAY * 2 ** attempt))
+    
+    def open_dedicated(self, read_only=False):
+        """
+        Opens a connection that connect() and close() never touch, for long
+        streams that must survive other calls made on the same thread. The
+        statement time cap is lifted on it. The caller closes it.
+        Returns the connection, or None if none could be opened.
+        
+        Args:
+            read_only (bool): A healthy replica may serve it, as with connect().
+        """
+        config = None
+        if read_only and self.replicas and not self._reads_need_primary():
+            config = self.replicas.pick()
+        if not config and not self.circuit_breaker.allow_request():
+            print(DB_CIRCUIT_OPEN)
+            return None
+        try:
+            connection = self._open(config, overrides={"MAX_EXECUTION_TIME": 0})
         except Error as e:
             print(f"Error connecting to MySQL: {e}")
+            if not config:
+                self.circuit_breaker.record_failure()
+            return None
+        if not config:
+            self.circuit_breaker.record_success()
+        return connection
+    
+    def warm(self):
+        """
+        Opens a primary connection ahead of time for the next connect() on any thread.
+        Returns True if a warm connection is waiting.
+        """
+        with self._warm_lock:
+            if self._warm_connection:
+                return True
+        if not self.circuit_breaker.allow_request():
+            return False
+        try:
+            connection = self._open()
+        except Error:
+            self.circuit_breaker.record_failure()
+            return False
+        self.circuit_breaker.record_success()
+        with self._warm_lock:
+            if self._warm_connection:
+                connection.close()
+            else:
+                self._warm_connection = connection
+        return True
+    
+    def _take_warm(self):
+        """
+        Hands out the warm connection if it is still alive
+        """
+        with self._warm_lock:
+            connection, self._warm_connection = self._warm_connection, None
+        if connection is None:
+            return None
+        try:
+            # The server may have dropped it while it sat idle
+            if connection.is_connected():
+                return connection
+            connection.close()
+        except Error:
+            pass
         return None
     
+    def release_warm(self):
+        """
+        Closes the warm connection if nobody took it
+        """
+        with self._warm_lock:
+            connection, self._warm_connection = self._warm_connection, None
+        if connection:
+            try:
+                connection.close()
+            except Error:
+                pass
+    
+    def health_check(self):
+        """
+        Probes the database with a trivial query, bypassing the circuit breaker.
+        Returns True and closes the circuit if the database answers.
+        """
+        try:
+            connection = mysql.connector.connect(**self._connection_params())
+            cursor = connection.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            cursor.close()
+            connection.close()
+        except Error:
+            self.circuit_breaker.record_failure()
+            return False
+        self.circuit_breaker.record_success()
+        return True
+    
     def close(self):
         """
         Closes the database connection if it's open
         """
-        if self.connection and self.connection.is_connected():
-            self.connection.close()
+        if self.connection:
+            try:
+                self.connection.close()
+            except Error:
+                # The server is already gone, nothing left to release
+                pass
             self.connection = None
             
     def __del__(self):
@@ -56,7 +566,8 @@ class DatabaseManager:
                 "host": self.config["host"],
                 "port": self.config.get("port", 3306),
                 "user": self.config["user"],
-                "password": self.config["password"]
+                "password": self.config["password"],
+                "connection_timeout": self.connect_timeout
             }
             
             temp_connection = mysql.connector.connect(**connection_params)
@@ -81,17 +592,9 @@ class DatabaseManager:
             try:
                 cursor = connection.cursor()
                 
-                # SQL query to create the tasks table
-                create_table_query = """
-                CREATE TABLE IF NOT EXISTS tasks (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    name VARCHAR(255) NOT NULL,
-                    description TEXT NOT NULL,
-                    status VARCHAR(20) NOT NULL DEFAULT 'Not started',
-                    created_at DATETIME NOT NULL
-                )
-                """
-                cursor.execute(create_table_query)
+                # SQL queries to create the tasks table and its companion tables
+                for create_table_query in TABLE_DEFINITIONS:
+                    cursor.execute(create_table_query)
                 connection.commit()
                 print(DB_TABLE_CREATED_OR_EXISTS)
                 cursor.close()
@@ -100,4 +603,127 @@ class DatabaseManager:
             except Error as e:
                 print(f"Error creating table: {e}")
                 self.close()
-                return False
\ No newline at end of file
+                return False
+
+
+class ShardedDatabaseManager:
+    """
+    Manages several databases (shards) that together hold the tasks table.
+    
+    Each shard hands out auto-increment IDs from its own residue class
+    ((id - 1) % shard_count == shard_index), so IDs are unique across shards
+    and any task can be located from its ID alone. New tasks
+    are placed by a hash of their owner, or spread evenly with the "id" strategy.
+    """
+    STRATEGY_OWNER = "owner"
+    STRATEGY_ID = "id"
+    
+    def __init__(self, shard_configs, strategy=DB_SHARD_STRATEGY, replica_configs=None, **manager_options):
+        """
+        Initialize one DatabaseManager per shard.
+        
+        Args:
+            shard_configs (list): Database configuration dictionary for each shard.
+            strategy (str): "owner" to keep each owner on one shard, "id" to spread tasks.
+            replica_configs (list, optional): Read replica configurations of each shard,
+                in shard order, None for a shard without replicas.
+            **manager_options: Extra arguments passed to every DatabaseManager.
+        """
+        if strategy not in (self.STRATEGY_OWNER, self.STRATEGY_ID):
+            raise ValueError(f"Unknown shard strategy '{strategy}'")
+        self.strategy = strategy
+        self.shards = []
+        shard_count = len(shard_configs)
+        replica_configs = list(replica_configs or [])
+        if len(replica_configs) > shard_count:
+            raise ValueError("More replica configurations than shards")
+        replica_configs += [None] * (shard_count - len(replica_configs))
+        for index, config in enumerate(shard_configs):
+            session_variables = {
+                "auto_increment_increment": shard_count,
+                "auto_increment_offset": index + 1,
+            }
+            self.shards.append(DatabaseManager(config, session_variables=session_variables,
+                                               replica_configs=replica_configs[index], **manager_options))
+        self._next_shard = 0
+        self._lock = threading.Lock()
+    
+    def shard_for_id(self, task_id):
+        """
+        Returns the index of the shard that stores the task with this ID
+        """
+        return (task_id - 1) % len(self.shards)
+    
+    def shard_for_owner(self, owner_id):
+        """
+        Returns the index of the shard that stores this owner's tasks
+        """
+        return zlib.crc32(str(owner_id).encode()) % len(self.shards)
+    
+    def shard_for_new_task(self, owner_id, idempotency_key=None):
+        """
+        Returns the index of the shard a new task should be inserted into.
+        Tasks with an idempotency key always map to the same shard, so the
+        unique index catches a retried insert.
+        """
+        if self.strategy == self.STRATEGY_OWNER:
+            return self.shard_for_owner(owner_id)
+        if idempotency_key is not None:
+            return zlib.crc32(f"{owner_id}:{idempotency_key}".encode()) % len(self.shards)
+        with self._lock:
+            index = self._next_shard
+            self._next_shard = (index + 1) % len(self.shards)
+        return index
+    
+    def create_database(self):
+        """
+        Creates the database on every shard
+        """
+        return all([shard.create_database() for shard in self.shards])
+    
+    def create_table(self):
+        """
+        Creates the tables on every shard
+        """
+        return all([shard.create_table() for shard in self.shards])
+    
+    def health_check(self):
+        """
+        Probes every shard, see DatabaseManager.health_check
+        """
+        return all([shard.health_check() for shard in self.shards])
+    
+    def warm(self):
+        """
+        Opens a warm primary connection on every shard
+        """
+        return all([shard.warm() for shard in self.shards])
+    
+    def release_warm(self):
+        """
+        Closes the warm connections of every shard
+        """
+        for shard in self.shards:
+            shard.release_warm()
+    
+    def close(self):
+        """
+        Closes the connections of every shard
+        """
+        for shard in self.shards:
+            shard.close()
+
+
+def create_db_manager(db_config, replica_configs=None, **manager_options):
+    """
+    Returns the manager for a db_config.py configuration: a ShardedDatabaseManager
+    when it lists several shards, otherwise a DatabaseManager
+
+    Args:
+        db_config (dict or list): Database configuration, or one per shard.
+        replica_configs (list, optional): Read replicas, per shard when sharded.
+        **manager_options: Extra arguments passed to every DatabaseManager.
+    """
+    if isinstance(db_config, (list, tuple)):
+        return ShardedDatabaseManager(db_config, replica_configs=replica_configs, **manager_options)
+    return DatabaseManager(db_config, replica_configs=replica_configs, **manager_options)
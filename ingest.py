@@ -0,0 +1,196 @@
+import argparse
+import csv
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from constants import TASK_STATE_NOT_STARTED, DEFAULT_PRIORITY, INGEST_BATCH_SIZE, INGEST_QUEUE_SIZE
+from constants import MAX_IDEMPOTENCY_KEY_LENGTH
+from models import Task
+from db_manager import create_db_manager
+from repository import create_task_repository
+from utils import validate_task_fields, text_field
+
+
+def read_records(path):
+    """
+    Streams raw task records: CSV rows as dictionaries, JSON lines as strings
+    so that parsing happens in the worker processes
+    """
+    with open(path, newline="", encoding="utf-8") as input_file:
+        if path.endswith(".csv"):
+            yield from csv.DictReader(input_file)
+        else:
+            for line in input_file:
+                if line.strip():
+                    yield line
+
+
+def read_chunks(records, batch_size):
+    """
+    Groups raw records into lists of at most batch_size items
+    """
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= batch_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def build_batch(chunk):
+    """
+    Parses and validates a chunk of raw records in a worker process
+
+    Returns:
+        tuple: (list of valid Task objects, number of rejected records)
+    """
+    tasks = []
+    rejected = 0
+    for record in chunk:
+        try:
+            if isinstance(record, str):
+                record = json.loads(record)
+            name = text_field(record, "name")
+            description = text_field(record, "description")
+            status = text_field(record, "status") or TASK_STATE_NOT_STARTED
+            priority = record.get("priority")
+            priority = int(priority) if priority not in (None, "") else DEFAULT_PRIORITY
+            created_at = text_field(record, "created_at")
+            created_at = datetime.fromisoformat(created_at) if created_at else None
+            due_at = text_field(record, "due_at")
+            due_at = datetime.fromisoformat(due_at) if due_at else None
+            idempotency_key = text_field(record, "idempotency_key") or None
+            if validate_task_fields(name, description, status, priority):
+                raise ValueError("Invalid task fields")
+            if idempotency_key and len(idempotency_key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+                raise ValueError("Idempotency key too long")
+        except (ValueError, TypeError, AttributeError):
+            rejected += 1
+            continue
+
+        tasks.append(Task(name=name, description=description, status=status, created_at=created_at,
+                          priority=priority, due_at=due_at, idempotency_key=idempotency_key))
+    return tasks, rejected
+
+
+class IngestionPipeline:
+    """
+    Loads a task dump with parallel validation and parallel inserts.
+    The reader feeds a process pool that builds Task batches, and writer
+    threads with their own connections insert the batches. Both hand-offs
+    are bounded so a slow stage throttles the ones before it.
+    """
+    def __init__(self, db_config, workers=None, writers=4,
+                 batch_size=INGEST_BATCH_SIZE, queue_size=INGEST_QUEUE_SIZE):
+        """
+        Initialize the pipeline.
+
+        Args:
+            db_config (dict): Database configuration used by every writer.
+            workers (int, optional): Validation processes, defaults to the CPU count.
+            writers (int): Concurrent writer connections.
+            batch_size (int): Records per validation chunk and per INSERT.
+            queue_size (int): Maximum batches waiting between stages.
+        """
+        self.db_config = db_config
+        self.workers = workers or os.cpu_count() or 1
+        self.writers = writers
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.inserted = 0
+        self.failed = 0
+        self.rejected = 0
+        self.read = 0
+        self._lock = threading.Lock()
+
+    def run(self, path):
+        """
+        Ingests the file and returns a summary dictionary
+        """
+        start = time.perf_counter()
+        batches = queue.Queue(maxsize=self.queue_size)
+        writer_threads = [
+            threading.Thread(target=self._writer_loop, args=(batches,), daemon=True)
+            for _ in range(self.writers)
+        ]
+        for thread in writer_threads:
+            thread.start()
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            pending = []
+            for chunk in read_chunks(read_records(path), self.batch_size):
+                self.read += len(chunk)
+                pending.append(executor.submit(build_batch, chunk))
+                # Bound the work handed to the pool, collecting results in order
+                while len(pending) >= self.queue_size:
+                    self._forward(pending.pop(0), batches)
+            for future in pending:
+                self._forward(future, batches)
+
+        for _ in writer_threads:
+            batches.put(None)
+        for thread in writer_threads:
+            thread.join()
+
+        elapsed = time.perf_counter() - start
+        return {
+            "read": self.read,
+            "inserted": self.inserted,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "elapsed": elapsed,
+            "throughput": self.inserted / elapsed if elapsed else 0.0,
+        }
+
+    def _forward(self, future, batches):
+        tasks, rejected = future.result()
+        with self._lock:
+            self.rejected += rejected
+        if tasks:
+            # Blocks when writers fall behind, which stops the reader too
+            batches.put(tasks)
+
+    def _writer_loop(self, batches):
+        repository = create_task_repository(create_db_manager(self.db_config))
+        while True:
+            tasks = batches.get()
+            if tasks is None:
+                return
+            inserted = repository.add_many(tasks)
+            with self._lock:
+                self.inserted += inserted
+                self.failed += len(tasks) - inserted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk load tasks from a JSON lines or CSV file")
+    parser.add_argument("path", help="input file (.jsonl or .csv) with name, description, status, "
+                        "priority, due_at, idempotency_key, created_at")
+    parser.add_argument("--workers", type=int, default=None, help="validation processes (default: CPU count)")
+    parser.add_argument("--writers", type=int, default=4, help="parallel writer connections")
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE, help="records per INSERT")
+    args = parser.parse_args()
+
+    from db_config import DB_CONFIG
+
+    pipeline = IngestionPipeline(
+        DB_CONFIG,
+        workers=args.workers,
+        writers=args.writers,
+        batch_size=args.batch_size,
+    )
+    summary = pipeline.run(args.path)
+    print(f"Read {summary['read']} records, inserted {summary['inserted']}, "
+          f"rejected {summary['rejected']}, failed {summary['failed']}")
+    print(f"Throughput: {summary['throughput']:.0f} tasks/s over {summary['elapsed']:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,388 @@
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from datetime import datetime
+
+from mysql.connector import Error
+
+from constants import TASK_STATE_NOT_STARTED, TASK_STATE_IN_PROGRESS, TASK_STATE_COMPLETED
+from models import Task
+from db_manager import create_db_manager
+from repository import create_task_repository
+
+DEFAULT_MIX = "add=20,get_all=20,get_by_id=40,update_status=15,delete=5"
+OPERATIONS = ("add", "get_all", "get_by_id", "update_status", "delete")
+STATUSES = (TASK_STATE_NOT_STARTED, TASK_STATE_IN_PROGRESS, TASK_STATE_COMPLETED)
+
+
+def parse_mix(mix):
+    """
+    Parses an operation mix such as "add=20,get_all=80" into a weights dict
+    """
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation '{name}'. Choose from {', '.join(OPERATIONS)}.")
+        weights[name] = float(weight) if weight else 1.0
+    return weights
+
+
+def percentile(sorted_values, pct):
+    """
+    Returns the nearest-rank percentile of an already sorted list
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class TaskPool:
+    """
+    Thread-safe pool of task IDs shared by the simulated clients
+    """
+    def __init__(self, task_ids=None):
+        self.task_ids = list(task_ids or [])
+        self._lock = threading.Lock()
+
+    def add(self, task_id):
+        with self._lock:
+            self.task_ids.append(task_id)
+
+    def pick(self):
+        with self._lock:
+            return random.choice(self.task_ids) if self.task_ids else None
+
+    def take(self):
+        with self._lock:
+            if not self.task_ids:
+                return None
+            index = random.randrange(len(self.task_ids))
+            self.task_ids[index], self.task_ids[-1] = self.task_ids[-1], self.task_ids[index]
+            return self.task_ids.pop()
+
+
+class ErrorFlag:
+    """
+    Set when a database call of one simulated client failed. The repository
+    reports errors only by printing them and returning an empty result, which
+    the load generator cannot tell from a task another client removed.
+    """
+    def __init__(self):
+        self.failed = False
+
+
+class _CheckedCursor:
+    """
+    Cursor proxy that sets an ErrorFlag when a statement or fetch fails
+    """
+    def __init__(self, cursor, flag):
+        self._cursor = cursor
+        self._flag = flag
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def _call(self, method, *args, **kwargs):
+        try:
+            return method(*args, **kwargs)
+        except Error:
+            self._flag.failed = True
+            raise
+
+    def execute(self, *args, **kwargs):
+        return self._call(self._cursor.execute, *args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        return self._call(self._cursor.executemany, *args, **kwargs)
+
+    def fetchone(self):
+        return self._call(self._cursor.fetchone)
+
+    def fetchmany(self, *args, **kwargs):
+        return self._call(self._cursor.fetchmany, *args, **kwargs)
+
+    def fetchall(self):
+        return self._call(self._cursor.fetchall)
+
+
+class _CheckedConnection:
+    """
+    Connection proxy that hands out checked cursors and checks commits
+    """
+    def __init__(self, connection, flag):
+        self._connection = connection
+        self._flag = flag
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def cursor(self, *args, **kwargs):
+        return _CheckedCursor(self._connection.cursor(*args, **kwargs), self._flag)
+
+    def commit(self):
+        try:
+            return self._connection.commit()
+        except Error:
+            self._flag.failed = True
+            raise
+
+
+def check_database_errors(db_manager):
+    """
+    Makes the connections of a (sharded) database manager report failed
+    connects, statements and commits
+
+    Returns:
+        ErrorFlag: Flag to clear before and read after each operation.
+    """
+    flag = ErrorFlag()
+    for manager in getattr(db_manager, "shards", [db_manager]):
+        connect = manager.connect
+
+        def checked_connect(read_only=False, connect=connect):
+            connection = connect(read_only=read_only)
+            if not connection:
+                flag.failed = True
+                return connection
+            return _CheckedConnection(connection, flag)
+
+        manager.connect = checked_connect
+    return flag
+
+
+class LoadGenerator:
+    """
+    Simulates concurrent operators issuing a mix of repository calls
+    """
+    def __init__(self, db_config, clients=4, duration=30, ramp_up=0, rate=None,
+                 mix=DEFAULT_MIX, seed_tasks=100):
+        """
+        Initialize the load generator.
+
+        Args:
+            db_config (dict): Database configuration for every simulated client.
+            clients (int): Number of concurrent clients.
+            duration (float): Seconds to run after the first client starts.
+            ramp_up (float): Seconds over which client start times are spread.
+            rate (float, optional): Target total operations per second, unlimited if None.
+            mix (str): Operation weights, e.g. "add=20,get_by_id=80".
+            seed_tasks (int): Tasks inserted before the run so reads have data.
+        """
+        self.db_config = db_config
+        self.clients = clients
+        self.duration = duration
+        self.ramp_up = ramp_up
+        self.rate = rate
+        self.weights = parse_mix(mix) if isinstance(mix, str) else dict(mix)
+        self.seed_tasks = seed_tasks
+        self.pool = TaskPool()
+        self.latencies = {name: [] for name in self.weights}
+        self.errors = {name: 0 for name in self.weights}
+        self._lock = threading.Lock()
+
+    def run(self):
+        """
+        Runs the load test and returns the report dictionary
+        """
+        self._seed()
+
+        threads = []
+        start = time.perf_counter()
+        end = start + self.duration
+        for index in range(self.clients):
+            delay = self.ramp_up * index / self.clients if self.clients else 0
+            thread = threading.Thread(target=self._client_loop, args=(start + delay, end), daemon=True)
+            threads.append(thread)
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return self.report(time.perf_counter() - start)
+
+    def report(self, elapsed):
+        """
+        Builds the report with throughput, latency percentiles and error rates
+        """
+        operations = {}
+        total = 0
+        for name, latencies in self.latencies.items():
+            latencies = sorted(latencies)
+            count = len(latencies)
+            total += count
+            operations[name] = {
+                "count": count,
+                "errors": self.errors[name],
+                "error_rate": self.errors[name] / count if count else 0.0,
+                "throughput": count / elapsed if elapsed else 0.0,
+                "p50_ms": _to_ms(percentile(latencies, 50)),
+                "p95_ms": _to_ms(percentile(latencies, 95)),
+                "p99_ms": _to_ms(percentile(latencies, 99)),
+            }
+        return {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "config": {
+                "clients": self.clients,
+                "duration": self.duration,
+                "ramp_up": self.ramp_up,
+                "rate": self.rate,
+                "mix": self.weights,
+            },
+            "elapsed": elapsed,
+            "total_operations": total,
+            "throughput": total / elapsed if elapsed else 0.0,
+            "operations": operations,
+        }
+
+    def _seed(self):
+        repository = create_task_repository(create_db_manager(self.db_config))
+        for index in range(self.seed_tasks):
+            task = Task(name=f"Load task {index}", description="Seeded by load generator")
+            if repository.add(task):
+                self.pool.add(task.id)
+
+    def _client_loop(self, start_at, end_at):
+        db_manager = create_db_manager(self.db_config)
+        errors = check_database_errors(db_manager)
+        repository = create_task_repository(db_manager)
+        names = list(self.weights)
+        weights = [self.weights[name] for name in names]
+        interval = self.clients / self.rate if self.rate else 0
+
+        now = time.perf_counter()
+        if start_at > now:
+            time.sleep(start_at - now)
+        next_at = time.perf_counter()
+
+        while next_at < end_at:
+            name = random.choices(names, weights)[0]
+            began = time.perf_counter()
+            errors.failed = False
+            try:
+                ok = self._execute(repository, name) and not errors.failed
+            except Exception:
+                ok = False
+            latency = time.perf_counter() - began
+
+            with self._lock:
+                self.latencies[name].append(latency)
+                if not ok:
+                    self.errors[name] += 1
+
+            if interval:
+                next_at += interval
+                delay = next_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            else:
+                next_at = time.perf_counter()
+
+    def _execute(self, repository, name):
+        """
+        Runs one operation, returns False when it failed.
+        A missing task on get_by_id or an unchanged status on update_status
+        can be a benign race between clients, so those calls fail only through
+        the database error flag checked by the caller.
+        """
+        if name == "add":
+            task = Task(name="Load task", description="Added by load generator")
+            if not repository.add(task):
+                return False
+            self.pool.add(task.id)
+            return True
+        if name == "get_all":
+            return repository.get_all() is not None
+        if name == "get_by_id":
+            task_id = self.pool.pick()
+            if task_id is not None:
+                repository.get_by_id(task_id)
+            return True
+        if name == "update_status":
+            task_id = self.pool.pick()
+            if task_id is not None:
+                repository.update_status(task_id, random.choice(STATUSES))
+            return True
+        if name == "delete":
+            task_id = self.pool.take()
+            return task_id is None or repository.delete(task_id)
+        raise ValueError(f"Unknown operation '{name}'")
+
+
+def _to_ms(seconds):
+    return None if seconds is None else seconds * 1000
+
+
+def print_report(report, baseline=None):
+    """
+    Prints a report table, with changes against a baseline report if given
+    """
+    print(f"Throughput: {report['throughput']:.1f} ops/s over {report['elapsed']:.1f}s "
+          f"({report['total_operations']} operations)")
+    print(f"{'Operation':<15}{'Count':>8}{'Errors':>8}{'Ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, stats in report["operations"].items():
+        print(f"{name:<15}{stats['count']:>8}{stats['error_rate']:>8.1%}{stats['throughput']:>10.1f}"
+              f"{_format_ms(stats['p50_ms'])}{_format_ms(stats['p95_ms'])}{_format_ms(stats['p99_ms'])}")
+        previous = baseline["operations"].get(name) if baseline else None
+        if previous:
+            print(f"{'  vs baseline':<15}{'':>8}{'':>8}{_format_change(stats['throughput'], previous['throughput'])}"
+                  f"{_format_change(stats['p50_ms'], previous['p50_ms'])}"
+                  f"{_format_change(stats['p95_ms'], previous['p95_ms'])}"
+                  f"{_format_change(stats['p99_ms'], previous['p99_ms'])}")
+
+
+def _format_ms(value):
+    return f"{'-':>10}" if value is None else f"{value:>10.2f}"
+
+
+def _format_change(current, previous):
+    if current is None or not previous:
+        return f"{'-':>10}"
+    return f"{(current - previous) / previous:>+10.1%}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate concurrent Task Manager clients")
+    parser.add_argument("--clients", type=int, default=4, help="number of concurrent clients")
+    parser.add_argument("--duration", type=float, default=30, help="run time in seconds")
+    parser.add_argument("--ramp-up", type=float, default=0, help="seconds to start all clients")
+    parser.add_argument("--rate", type=float, default=None, help="target total operations per second")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"operation weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--seed-tasks", type=int, default=100, help="tasks inserted before the run")
+    parser.add_argument("--report", default="load_report.json", help="file to write the JSON report to")
+    parser.add_argument("--compare", help="previous report to compare against")
+    args = parser.parse_args()
+
+    from db_config import DB_CONFIG
+
+    generator = LoadGenerator(
+        DB_CONFIG,
+        clients=args.clients,
+        duration=args.duration,
+        ramp_up=args.ramp_up,
+        rate=args.rate,
+        mix=args.mix,
+        seed_tasks=args.seed_tasks,
+    )
+    report = generator.run()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+    print_report(report, baseline)
+
+    with open(args.report, "w") as report_file:
+        json.dump(report, report_file, indent=2)
+    print(f"Report written to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
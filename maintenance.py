@@ -0,0 +1,174 @@
+import argparse
+import threading
+import time
+from datetime import datetime, timedelta
+
+from constants import PURGE_RETENTION_DAYS, PURGE_INTERVAL_SECONDS, REQUEUE_INTERVAL_SECONDS
+from constants import TASK_STATES, BULK_TRANSITION_CHUNK_SIZE
+from db_manager import create_db_manager
+from repository import create_task_repository
+
+
+class BackgroundPurger:
+    """
+    Periodically purges soft-deleted tasks in a background thread
+    """
+    def __init__(self, task_repository, retention_days=PURGE_RETENTION_DAYS,
+                 interval=PURGE_INTERVAL_SECONDS):
+        """
+        Initialize the purger.
+        
+        Args:
+            task_repository (TaskRepository): Repository used to purge tasks.
+            retention_days (float): Keep deleted tasks restorable for this many days.
+            interval (float): Seconds between purge passes.
+        """
+        self.task_repository = task_repository
+        self.retention_days = retention_days
+        self.interval = interval
+        self.purged = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+    
+    def purge_once(self):
+        """
+        Runs one throttled purge pass and returns the number of purged tasks
+        """
+        older_than = datetime.now() - timedelta(days=self.retention_days)
+        purged = self.task_repository.purge_deleted(older_than)
+        self.purged += purged
+        return purged
+    
+    def start(self):
+        """
+        Starts purging in a background thread
+        """
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._purge_loop, daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """
+        Stops the background thread after the current pass
+        """
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+    
+    def wait(self):
+        """
+        Blocks until the background thread stops
+        """
+        while self._thread and self._thread.is_alive():
+            self._thread.join(timeout=1)
+    
+    def _purge_loop(self):
+        while not self._stop_event.is_set():
+            self.purge_once()
+            self._stop_event.wait(self.interval)
+
+
+def rebuild_counters(task_repository):
+    """
+    Rebuilds the status counters table from the tasks table
+    """
+    counts = task_repository.rebuild_counters()
+    if counts is None:
+        print("Failed to rebuild task counters.")
+        return False
+    print("Task counters rebuilt:")
+    for status, count in sorted(counts.items()):
+        print(f"  {status}: {count}")
+    return True
+
+
+def requeue_claims(task_repository, watch=False, interval=REQUEUE_INTERVAL_SECONDS):
+    """
+    Returns tasks with expired work claims to the queue, once or until interrupted
+    """
+    while True:
+        requeued = task_repository.requeue_expired_claims()
+        print(f"Requeued {requeued} tasks with expired claims.")
+        if not watch:
+            return
+        time.sleep(interval)
+
+
+def bulk_transition(task_repository, from_status, to_status, older_than_days=None,
+                    dry_run=False, chunk_size=BULK_TRANSITION_CHUNK_SIZE):
+    """
+    Moves tasks with from_status, optionally created more than older_than_days
+    ago, to to_status and prints progress
+    """
+    task_filter = {"status": from_status}
+    if older_than_days is not None:
+        task_filter["created_before"] = datetime.now() - timedelta(days=older_than_days)
+    
+    if dry_run:
+        count = task_repository.bulk_transition(task_filter, to_status, dry_run=True)
+        print(f"{count} tasks would move from '{from_status}' to '{to_status}'.")
+        return count
+    
+    def report(affected, last_id):
+        print(f"  {affected} tasks changed, walked up to ID {last_id}")
+    
+    affected = task_repository.bulk_transition(task_filter, to_status, chunk_size=chunk_size, progress=report)
+    print(f"Moved {affected} tasks from '{from_status}' to '{to_status}'.")
+    return affected
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Task Manager maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("rebuild-counters", help="recompute the per-status task counters")
+    purge_parser = subparsers.add_parser("purge-deleted", help="physically remove soft-deleted tasks")
+    purge_parser.add_argument("--older-than-days", type=float, default=PURGE_RETENTION_DAYS,
+                              help=f"only purge tasks deleted this long ago (default: {PURGE_RETENTION_DAYS})")
+    purge_parser.add_argument("--watch", action="store_true",
+                              help=f"keep purging every {PURGE_INTERVAL_SECONDS} seconds")
+    requeue_parser = subparsers.add_parser("requeue-claims", help="requeue tasks whose work claim expired")
+    requeue_parser.add_argument("--watch", action="store_true",
+                                help=f"keep requeueing every {REQUEUE_INTERVAL_SECONDS} seconds")
+    transition_parser = subparsers.add_parser("bulk-transition", help="change the status of many tasks")
+    transition_parser.add_argument("--from-status", required=True, choices=TASK_STATES)
+    transition_parser.add_argument("--to-status", required=True, choices=TASK_STATES)
+    transition_parser.add_argument("--older-than-days", type=float, default=None,
+                                   help="only tasks created this long ago")
+    transition_parser.add_argument("--chunk-size", type=int, default=BULK_TRANSITION_CHUNK_SIZE,
+                                   help="primary key rows walked per transaction")
+    transition_parser.add_argument("--dry-run", action="store_true", help="only count matching tasks")
+    args = parser.parse_args()
+
+    from db_config import DB_CONFIG
+
+    task_repository = create_task_repository(create_db_manager(DB_CONFIG))
+    ok = True
+    if args.command == "rebuild-counters":
+        ok = rebuild_counters(task_repository)
+    elif args.command == "purge-deleted":
+        purger = BackgroundPurger(task_repository, retention_days=args.older_than_days)
+        if args.watch:
+            purger.start()
+            try:
+                purger.wait()
+            except KeyboardInterrupt:
+                purger.stop()
+        else:
+            purger.purge_once()
+        print(f"Purged {purger.purged} deleted tasks.")
+    elif args.command == "bulk-transition":
+        bulk_transition(task_repository, args.from_status, args.to_status, args.older_than_days,
+                        args.dry_run, args.chunk_size)
+    elif args.command == "requeue-claims":
+        try:
+            requeue_claims(task_repository, watch=args.watch)
+        except KeyboardInterrupt:
+            pass
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
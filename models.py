@@ -1,17 +1,58 @@
 from datetime import datetime
-from constants import TASK_STATE_NOT_STARTED
+from constants import TASK_STATE_NOT_STARTED, DEFAULT_PRIORITY
+
+# Marks a description that was left out of a projected query
+NOT_LOADED = object()
 
 class Task:
     """
     Class representing a Task entity
     """
     def __init__(self, id=None, name="", description="", 
-                 status=TASK_STATE_NOT_STARTED, created_at=None):
+                 status=TASK_STATE_NOT_STARTED, created_at=None, updated_at=None,
+                 owner_id=None, description_loader=None, priority=DEFAULT_PRIORITY, due_at=None,
+                 idempotency_key=None):
+        """
+        Args:
+            description_loader (callable, optional): Called with the task ID to fetch
+                the description on first access when description is NOT_LOADED.
+            idempotency_key (str, optional): Client request key. Adding a task whose
+                key the owner already used returns the existing task instead.
+        """
         self.id = id
         self.name = name
         self.description = description
         self.status = status
+        self.priority = priority
+        self.due_at = due_at
+        self.idempotency_key = idempotency_key
         self.created_at = created_at if created_at else datetime.now()
+        # Set by the database on every write, None until the task is loaded
+        self.updated_at = updated_at
+        # Set from the repository's owner when the task is stored
+        self.owner_id = owner_id
+        self.description_loader = description_loader
+    
+    @property
+    def description(self):
+        if self._description is NOT_LOADED:
+            description = self.description_loader(self.id) if self.description_loader else None
+            # Not cached when the load failed, so the next access retries
+            if description is None:
+                return ""
+            self._description = description
+        return self._description
+    
+    @description.setter
+    def description(self, value):
+        self._description = value
+    
+    def next_up_key(self):
+        """
+        Sort key of the "Next up" order: highest priority, then earliest due date
+        (tasks without one last), then lowest ID
+        """
+        return (-self.priority, self.due_at or datetime.max, self.id)
     
     def __str__(self):
         return f"Task {self.id}: {self.name} - Status: {self.status}"
@@ -24,5 +65,8 @@ class Task:
         if include_description:
             output.append(f"   Description: {self.description}")
         output.append(f"   Status: {self.status}")
+        output.append(f"   Priority: {self.priority}")
+        if self.due_at:
+            output.append(f"   Due: {self.due_at}")
         output.append(f"   Created at: {self.created_at}")
         return "\n".join(output)
\ No newline at end of file
@@ -0,0 +1,348 @@
+import argparse
+import json
+import os
+import socket
+import socketserver
+import stat
+import threading
+import time
+from collections import defaultdict
+
+from constants import NOTIFY_BATCH_INTERVAL_SECONDS, NOTIFY_MAX_BATCH_EVENTS
+from constants import NOTIFY_SOCKET_PATH, NOTIFY_CLIENT_MAX_PENDING, NOTIFY_SOCKET_MODE
+from constants import ERROR_NOTIFY_SOCKET_IN_USE, ERROR_NOTIFY_PATH_NOT_SOCKET
+
+# Event types, the first three match the keys of TaskRepository.changes_since
+EVENT_INSERTED = "inserted"
+EVENT_UPDATED = "updated"
+EVENT_DELETED = "deleted"
+EVENT_RESTORED = "restored"
+
+
+def change_event(event_type, task_id, owner_id, status, from_status=None):
+    """
+    Returns a compact change event. Events carry only what the writer already
+    knows, so delivering them never reads from the database.
+    """
+    return {"type": event_type, "id": task_id, "owner_id": owner_id,
+            "status": status, "from_status": from_status}
+
+
+def coalesce(previous, event):
+    """
+    Merges two events for the same task into one, or None if they cancel out
+    """
+    if previous["type"] == EVENT_INSERTED:
+        if event["type"] == EVENT_DELETED:
+            return None
+        return dict(event, type=EVENT_INSERTED, from_status=None)
+    if event["type"] == EVENT_UPDATED and previous["type"] in (EVENT_UPDATED, EVENT_RESTORED):
+        return dict(event, type=previous["type"], from_status=previous["from_status"])
+    return event
+
+
+class Subscription:
+    """
+    A subscriber callback and the owners and statuses it wants to hear about
+    """
+    def __init__(self, callback, statuses=None, owners=None):
+        self.callback = callback
+        self.statuses = frozenset(statuses) if statuses else None
+        self.owners = frozenset(owners) if owners else None
+
+    def matches_status(self, event):
+        # A task leaving a status is news for subscribers of that status too
+        return (self.statuses is None or event["status"] in self.statuses
+                or event["from_status"] in self.statuses)
+
+
+class NotificationBus:
+    """
+    In-process publish/subscribe for task change events.
+
+    publish() only queues events. A delivery thread collects them for up to
+    batch_interval seconds, coalesces repeated changes to one task into a
+    single event and calls every matching subscriber once per batch with a
+    list of events, so a bulk operation or thousands of subscribers cost one
+    pass over the batch rather than one callback per change.
+    """
+    def __init__(self, batch_interval=NOTIFY_BATCH_INTERVAL_SECONDS, max_batch=NOTIFY_MAX_BATCH_EVENTS):
+        """
+        Initialize the bus.
+
+        Args:
+            batch_interval (float): Seconds events are collected before delivery.
+            max_batch (int): Deliver early once this many distinct tasks changed.
+        """
+        self.batch_interval = batch_interval
+        self.max_batch = max_batch
+        self._pending = {}
+        self._by_owner = defaultdict(set)
+        self._any_owner = set()
+        self._condition = threading.Condition()
+        self._subscribers_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def subscribe(self, callback, statuses=None, owners=None):
+        """
+        Registers a callback that receives lists of change events
+
+        Args:
+            callback (callable): Called on the delivery thread with a list of events.
+            statuses (iterable, optional): Only events for tasks entering or leaving these statuses.
+            owners (iterable, optional): Only events for tasks of these owners.
+
+        Returns:
+            Subscription: Handle for unsubscribe.
+        """
+        subscription = Subscription(callback, statuses, owners)
+        with self._subscribers_lock:
+            if subscription.owners is None:
+                self._any_owner.add(subscription)
+            for owner_id in subscription.owners or ():
+                self._by_owner[owner_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._subscribers_lock:
+            self._any_owner.discard(subscription)
+            for owner_id in subscription.owners or ():
+                self._by_owner[owner_id].discard(subscription)
+                if not self._by_owner[owner_id]:
+                    del self._by_owner[owner_id]
+
+    def publish(self, events):
+        """
+        Queues committed change events for the next batch
+        """
+        if not events:
+            return
+        with self._condition:
+            for event in events:
+                previous = self._pending.pop(event["id"], None)
+                merged = coalesce(previous, event) if previous else event
+                if merged:
+                    self._pending[event["id"]] = merged
+            if len(self._pending) >= self.max_batch:
+                self._condition.notify()
+
+    def flush(self):
+        """
+        Delivers the queued events now, on the calling thread
+        """
+        with self._condition:
+            events, self._pending = list(self._pending.values()), {}
+        if events:
+            self._deliver(events)
+
+    def _deliver(self, events):
+        by_owner = defaultdict(list)
+        for event in events:
+            by_owner[event["owner_id"]].append(event)
+
+        batches = defaultdict(list)
+        with self._subscribers_lock:
+            for subscription in self._any_owner:
+                batches[subscription] = events
+            for owner_id, owner_events in by_owner.items():
+                for subscription in self._by_owner.get(owner_id, ()):
+                    batches[subscription].extend(owner_events)
+
+        for subscription, batch in batches.items():
+            if subscription.statuses is not None:
+                batch = [event for event in batch if subscription.matches_status(event)]
+            if not batch:
+                continue
+            try:
+                subscription.callback(batch)
+            except Exception as e:
+                print(f"Error delivering change events: {e}")
+
+    def start(self):
+        """
+        Starts the delivery thread
+        """
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._delivery_loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops the delivery thread after delivering what is queued
+        """
+        self._stop_event.set()
+        with self._condition:
+            self._condition.notify()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _delivery_loop(self):
+        while not self._stop_event.is_set():
+            with self._condition:
+                if not self._pending:
+                    self._condition.wait(self.batch_interval)
+                    continue
+            # Let changes accumulate for one interval unless the batch is full
+            deadline = time.monotonic() + self.batch_interval
+            with self._condition:
+                while (len(self._pending) < self.max_batch and not self._stop_event.is_set()
+                       and time.monotonic() < deadline):
+                    self._condition.wait(deadline - time.monotonic())
+            self.flush()
+
+
+class _SubscriberHandler(socketserver.StreamRequestHandler):
+    """
+    Serves one socket subscriber: reads a JSON line with optional "statuses"
+    and "owners" filters, then writes one JSON line per batch.
+
+    Batches wait in a bounded list so a slow reader never holds up the bus.
+    If the reader falls too far behind, its backlog is replaced by a single
+    {"overflow": true} line and it should resynchronize with changes_since.
+    """
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline() or b"{}")
+        except ValueError:
+            return
+        pending = []
+        condition = threading.Condition()
+
+        def deliver(events):
+            with condition:
+                if len(pending) >= NOTIFY_CLIENT_MAX_PENDING:
+                    pending[:] = [{"overflow": True}]
+                else:
+                    pending.append({"events": events})
+                condition.notify()
+
+        bus = self.server.bus
+        subscription = bus.subscribe(deliver, request.get("statuses"), request.get("owners"))
+        try:
+            while not self.server.stopping.is_set():
+                with condition:
+                    if not pending:
+                        condition.wait(NOTIFY_BATCH_INTERVAL_SECONDS)
+                    messages, pending[:] = list(pending), []
+                for message in messages:
+                    self.wfile.write(json.dumps(message).encode("utf-8") + b"\n")
+                self.wfile.flush()
+        except OSError:
+            # The subscriber went away
+            pass
+        finally:
+            bus.unsubscribe(subscription)
+
+
+class _OwnerOnlyUnixServer(socketserver.ThreadingUnixStreamServer):
+    """
+    Unix socket server whose socket only the current user can connect to
+    """
+    def server_bind(self):
+        super().server_bind()
+        # Still before listen(), so nobody can connect under the default mode
+        os.chmod(self.server_address, NOTIFY_SOCKET_MODE)
+
+
+class NotificationServer:
+    """
+    Exposes a NotificationBus to other processes on this host through a Unix socket
+    """
+    def __init__(self, bus, path=NOTIFY_SOCKET_PATH):
+        """
+        Initialize the server.
+
+        Args:
+            bus (NotificationBus): Bus whose events are forwarded.
+            path (str): Filesystem path of the socket.
+        """
+        self.bus = bus
+        self.path = path
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        """
+        Starts serving subscribers on a socket only the current user can connect to
+
+        Raises:
+            OSError: If the path is not a socket or another process is serving on it.
+        """
+        self._remove_stale_socket()
+        self._server = _OwnerOnlyUnixServer(self.path, _SubscriberHandler)
+        self._server.daemon_threads = True
+        self._server.bus = self.bus
+        self._server.stopping = threading.Event()
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def _remove_stale_socket(self):
+        """
+        Removes a socket left behind by a process that did not shut down cleanly
+        """
+        try:
+            mode = os.lstat(self.path).st_mode
+        except FileNotFoundError:
+            return
+        if not stat.S_ISSOCK(mode):
+            raise OSError(ERROR_NOTIFY_PATH_NOT_SOCKET.format(self.path))
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(self.path)
+            except ConnectionRefusedError:
+                # Nobody is listening any more
+                os.remove(self.path)
+                return
+        raise OSError(ERROR_NOTIFY_SOCKET_IN_USE.format(self.path))
+
+    def stop(self):
+        if not self._server:
+            return
+        self._server.stopping.set()
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+        self._server = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def listen(path=NOTIFY_SOCKET_PATH, statuses=None, owners=None):
+    """
+    Subscribes through a NotificationServer socket
+
+    Yields:
+        dict: {"events": [...]} per batch, or {"overflow": True} when events were dropped.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(path)
+        request = {"statuses": list(statuses) if statuses else None,
+                   "owners": list(owners) if owners else None}
+        client.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        with client.makefile("rb") as stream:
+            for line in stream:
+                yield json.loads(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print task change events as they are published")
+    parser.add_argument("--socket", default=NOTIFY_SOCKET_PATH, help="socket of the publishing process")
+    parser.add_argument("--status", action="append", help="only tasks entering or leaving this status")
+    parser.add_argument("--owner", type=int, action="append", help="only tasks of this owner")
+    args = parser.parse_args()
+
+    for message in listen(args.socket, args.status, args.owner):
+        if message.get("overflow"):
+            print("Events were dropped, resynchronize with the change feed")
+            continue
+        for event in message["events"]:
+            print(json.dumps(event))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import statistics
+import threading
+import time
+
+from constants import PREFETCH_MAX_AGE_SECONDS
+
+
+class Prefetcher:
+    """
+    Runs the queries of the next likely action while the operator reads the menu.
+
+    Each start() begins a new generation of results. invalidate() ends the
+    current generation, so a result that was being fetched while a write
+    happened is dropped instead of being served after the write.
+    """
+    def __init__(self, loaders, db_manager=None, max_age=PREFETCH_MAX_AGE_SECONDS):
+        """
+        Initialize the prefetcher.
+
+        Args:
+            loaders (dict): Result key to the function that loads it.
+            db_manager (DatabaseManager, optional): Manager to open a warm connection on
+                once the results are in, for the query or write the action makes next.
+            max_age (float): Seconds a prefetched result may be served after it was loaded.
+        """
+        self.loaders = loaders
+        self.db_manager = db_manager
+        self.max_age = max_age
+        self._results = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        # Action to (seconds waited, served from prefetch) per data fetch
+        self.waits = {}
+
+    def start(self):
+        """
+        Starts a new round of prefetching in a worker thread.
+        A round still running from before stops at its next query.
+        """
+        with self._lock:
+            self._generation += 1
+            self._results = {}
+            generation = self._generation
+        self._thread = threading.Thread(target=self._prefetch, args=(generation,), daemon=True)
+        self._thread.start()
+
+    def wait(self, timeout=None):
+        """
+        Waits for the current round to finish
+        """
+        if self._thread:
+            self._thread.join(timeout)
+
+    def stop(self):
+        """
+        Drops the results and closes the warm connection
+        """
+        self.invalidate()
+        self.wait()
+        if self.db_manager:
+            self.db_manager.release_warm()
+
+    def invalidate(self):
+        """
+        Discards every result, including the ones still being fetched
+        """
+        with self._lock:
+            self._generation += 1
+            self._results = {}
+
+    def _prefetch(self, generation):
+        for key, loader in self.loaders.items():
+            with self._lock:
+                if generation != self._generation:
+                    return
+            result = loader()
+            if result is None:
+                continue
+            with self._lock:
+                if generation != self._generation:
+                    return
+                self._results[key] = (result, time.monotonic())
+        if self.db_manager:
+            self.db_manager.warm()
+
+    def take(self, key):
+        """
+        Returns a prefetched result once, or None if there is no fresh one
+        """
+        with self._lock:
+            entry = self._results.pop(key, None)
+        if entry is None or time.monotonic() - entry[1] > self.max_age:
+            return None
+        return entry[0]
+
+    def get(self, action, key):
+        """
+        Returns a result for an action, from the prefetch when possible, and
+        records how long the operator waited for it
+        """
+        start = time.perf_counter()
+        result = self.take(key)
+        hit = result is not None
+        if not hit:
+            result = self.loaders[key]()
+        self.waits.setdefault(action, []).append((time.perf_counter() - start, hit))
+        return result
+
+    def report(self):
+        """
+        Returns one line per action comparing the median wait with and without a prefetch hit
+        """
+        lines = []
+        for action, waits in sorted(self.waits.items()):
+            hits = [seconds * 1000 for seconds, hit in waits if hit]
+            misses = [seconds * 1000 for seconds, hit in waits if not hit]
+            line = f"{action}: {len(hits)} prefetched, {len(misses)} fetched on demand"
+            if hits:
+                line += f", median wait {statistics.median(hits):.2f} ms prefetched"
+            if misses:
+                line += f", {statistics.median(misses):.2f} ms on demand"
+            lines.append(line)
+        return lines
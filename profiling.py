@@ -0,0 +1,169 @@
+import cProfile
+import functools
+import inspect
+import io
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+from constants import PROFILE_ENV_VAR, PROFILE_DEFAULT_DIR, PROFILE_TOP_FUNCTIONS
+
+# Menu actions wrapped by install_profiling, along with every public method of the repository
+PROFILED_ACTIONS = ("add_task", "show_tasks", "update_task", "delete_task")
+
+# Frames from these modules count as time spent in the database driver,
+# including the socket reads and writes it makes while waiting on the server
+DRIVER_PACKAGES = (os.sep + "mysql" + os.sep, "socket.py", "ssl.py")
+DRIVER_BUILTINS = ("_socket.socket", "_ssl._SSLSocket")
+
+
+def public_methods(obj):
+    """
+    Returns the names of the public methods of an object's class, so that
+    methods added to the repository are covered without being listed.
+    Generator methods are left out: they return before doing any work.
+    """
+    return tuple(
+        name for name, member in inspect.getmembers(type(obj), callable)
+        if not name.startswith("_") and not inspect.isgeneratorfunction(member)
+    )
+
+
+def profile_dir_from_env():
+    """
+    Returns the report directory requested through the environment, or None
+    """
+    value = os.environ.get(PROFILE_ENV_VAR, "").strip()
+    if not value or value == "0":
+        return None
+    return PROFILE_DEFAULT_DIR if value == "1" else value
+
+
+class Profiler:
+    """
+    Captures cProfile and tracemalloc reports for individual calls
+    """
+    def __init__(self, output_dir=PROFILE_DEFAULT_DIR, top=PROFILE_TOP_FUNCTIONS):
+        """
+        Initialize the profiler.
+
+        Args:
+            output_dir (str): Directory for the per-call reports.
+            top (int): Number of functions and allocation sites listed in a report.
+        """
+        self.output_dir = output_dir
+        self.top = top
+        # cProfile can only run one profiler per process on newer Pythons, so
+        # reports are taken one at a time
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # Labels of calls that ran unprofiled because another thread held the profiler
+        self.skipped = []
+        os.makedirs(output_dir, exist_ok=True)
+
+    def wrap(self, func, label, wait=False):
+        """
+        Returns func wrapped so that each outermost call writes a report.
+        Nested profiled calls (a repository method inside a menu action)
+        show up in the enclosing report instead of starting a second profiler.
+
+        Args:
+            wait (bool): Wait for a report running on another thread, for menu
+                actions. Otherwise the call runs unprofiled and is recorded in
+                skipped and skipped.log, as background work such as prefetching
+                should not be held up.
+        """
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if getattr(self._local, "active", False):
+                return func(*args, **kwargs)
+            if not self._lock.acquire(blocking=wait):
+                self._record_skip(label)
+                return func(*args, **kwargs)
+            self._local.active = True
+            try:
+                return self._profile_call(func, label, args, kwargs)
+            finally:
+                self._local.active = False
+                self._lock.release()
+        return wrapper
+
+    def _record_skip(self, label):
+        # Background threads must not write over the menu prompt, so skips
+        # go next to the reports instead of to stdout
+        self.skipped.append(label)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        with open(os.path.join(self.output_dir, "skipped.log"), "a") as log:
+            log.write(f"{stamp} {label} ran unprofiled, profiler busy on another thread\n")
+
+    def _profile_call(self, func, label, args, kwargs):
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        profile = cProfile.Profile()
+        start = time.perf_counter()
+        try:
+            profile.enable()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profile.disable()
+        finally:
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            if started_tracing:
+                tracemalloc.stop()
+            self._write_report(label, elapsed, profile, peak, snapshot)
+
+    def _write_report(self, label, elapsed, profile, peak, snapshot):
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        base_path = os.path.join(self.output_dir, f"{stamp}-{label}")
+        # Raw stats can be opened later with pstats or snakeviz
+        profile.dump_stats(base_path + ".prof")
+
+        stats = pstats.Stats(profile)
+        driver_time = sum(
+            entry[2] for (filename, _, function), entry in stats.stats.items()
+            if any(package in filename for package in DRIVER_PACKAGES)
+            or any(builtin in function for builtin in DRIVER_BUILTINS)
+        )
+        python_time = max(stats.total_tt - driver_time, 0.0)
+
+        top_functions = io.StringIO()
+        pstats.Stats(profile, stream=top_functions).sort_stats("cumulative").print_stats(self.top)
+
+        snapshot = snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ))
+        allocations = snapshot.statistics("lineno")[:self.top]
+
+        with open(base_path + ".txt", "w") as report:
+            report.write(f"Action: {label}\n")
+            report.write(f"Wall time: {elapsed * 1000:.2f} ms\n")
+            report.write(f"Time in database driver: {driver_time * 1000:.2f} ms\n")
+            report.write(f"Time in Python code: {python_time * 1000:.2f} ms\n")
+            report.write(f"Allocation peak: {peak / 1024:.1f} KiB\n")
+            report.write("\nTop allocation sites:\n")
+            for stat in allocations:
+                report.write(f"  {stat}\n")
+            report.write("\nTop functions by cumulative time:\n")
+            report.write(top_functions.getvalue())
+
+
+def install_profiling(task_manager, output_dir=PROFILE_DEFAULT_DIR):
+    """
+    Wraps the menu actions of a TaskManager and the methods of its repository
+    """
+    profiler = Profiler(output_dir)
+    for name in PROFILED_ACTIONS:
+        setattr(task_manager, name, profiler.wrap(getattr(task_manager, name), name, wait=True))
+    repository = task_manager.task_repository
+    for name in public_methods(repository):
+        setattr(repository, name, profiler.wrap(getattr(repository, name), f"repository.{name}"))
+    return profiler
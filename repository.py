@@ -1,16 +1,194 @@
+import heapq
+import itertools
+import random
+import time
+import zlib
+from collections import Counter
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
 from mysql.connector import Error
-from models import Task
+from models import Task, NOT_LOADED
+from columnar import COLUMNS, StatusEncoder, build_chunk
+from constants import COLUMNAR_CHUNK_SIZE, COUNTER_SLOTS, PURGE_CHUNK_SIZE, PURGE_PAUSE_SECONDS
+from constants import DEFAULT_OWNER_ID, TASK_FIELDS, DESCRIPTION_COMPRESS_THRESHOLD
+from constants import TASK_STATE_NOT_STARTED, TASK_STATE_IN_PROGRESS, TASK_STATE_COMPLETED
+from constants import NEXT_UP_LIMIT, CLAIM_LEASE_SECONDS, TAG_PROBE_LIMIT, TAG_INDEX_FETCH_CHUNK_SIZE
+from constants import BULK_TRANSITION_CHUNK_SIZE, BULK_TRANSITION_PAUSE_SECONDS, CHANGE_FEED_OVERLAP_SECONDS
+from constants import ERROR_INVALID_COMMIT_EVERY
+from utils import normalize_tag, tag_groups
+from notifications import change_event, EVENT_INSERTED, EVENT_UPDATED, EVENT_DELETED, EVENT_RESTORED
+from tag_index import TagBitmapIndex
+
+# Keys accepted in a bulk_transition filter and the condition each adds
+TRANSITION_FILTERS = {
+    "created_before": "created_at < %s",
+    "created_after": "created_at >= %s",
+    "updated_before": "updated_at < %s",
+    "updated_after": "updated_at >= %s",
+}
+
+INSERT_TASK_QUERY = """
+INSERT INTO tasks (owner_id, name, description, description_compressed, status,
+                   priority, due_at, idempotency_key, created_at)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
 
 class TaskRepository:
     """
     Repository class for Task CRUD operations
     """
-    def __init__(self, db_manager):
+    def __init__(self, db_manager, owner_id=None, compress_descriptions=False, notification_bus=None,
+                 tag_index=False):
+        """
+        Initialize the repository.
+        
+        Args:
+            db_manager (DatabaseManager): Database manager used for connections.
+            owner_id (int, optional): Restrict every query and write to this owner's
+                tasks. None gives unscoped access for maintenance tools.
+            compress_descriptions (bool): Store descriptions longer than
+                DESCRIPTION_COMPRESS_THRESHOLD bytes zlib-compressed.
+            notification_bus (NotificationBus, optional): Bus that committed task
+                changes are published to.
+            tag_index (bool): Answer find_by_tags from an in-memory TagBitmapIndex,
+                loaded on first use and kept current with this repository's writes.
+        """
         self.db_manager = db_manager
+        self.owner_id = owner_id
+        self.compress_descriptions = compress_descriptions
+        self.notification_bus = notification_bus
+        self.tag_index = TagBitmapIndex(self) if tag_index else None
+    
+    def _owner_condition(self):
+        """
+        Returns the SQL condition and parameters scoping a query to the owner
+        """
+        if self.owner_id is None:
+            return "", []
+        return " AND owner_id = %s", [self.owner_id]
+    
+    def _owner_for(self, task):
+        """
+        Returns the owner a new task is stored under
+        """
+        if self.owner_id is not None:
+            return self.owner_id
+        return task.owner_id if task.owner_id is not None else DEFAULT_OWNER_ID
+    
+    @staticmethod
+    def _select_list(fields, required=("id",)):
+        """
+        Returns the SELECT column list for a projection, "*" when fields is None
+        
+        Args:
+            fields (tuple, optional): Column names from TASK_FIELDS.
+            required (tuple): Columns always fetched, e.g. the ones results are ordered by.
+        """
+        if fields is None:
+            return "*"
+        unknown = [field for field in fields if field not in TASK_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        columns = list(required) + [field for field in fields if field not in required]
+        if "description" in columns:
+            columns.append("description_compressed")
+        return ", ".join(columns)
+    
+    def _encode_description(self, description):
+        """
+        Returns the (description, description_compressed) column values to store
+        """
+        if self.compress_descriptions:
+            encoded = description.encode("utf-8")
+            if len(encoded) > DESCRIPTION_COMPRESS_THRESHOLD:
+                return "", zlib.compress(encoded)
+        return description, None
+    
+    @staticmethod
+    def _decode_description(description, compressed):
+        return zlib.decompress(compressed).decode("utf-8") if compressed else description
+    
+    def _row_to_task(self, row):
+        """
+        Builds a Task from a dictionary cursor row.
+        Columns left out of a projection keep the Task defaults, except the
+        description, which is loaded from the database on first access.
+        """
+        if 'description' in row:
+            description = self._decode_description(row['description'], row.get('description_compressed'))
+        else:
+            description = NOT_LOADED
+        columns = {
+            key: row[key]
+            for key in ('name', 'status', 'priority', 'due_at', 'created_at', 'updated_at', 'owner_id',
+                        'idempotency_key')
+            if key in row
+        }
+        return Task(id=row['id'], description=description,
+                    description_loader=self.get_description, **columns)
+    
+    @staticmethod
+    def _adjust_counter(cursor, owner_id, status, delta):
+        """
+        Adds delta to the owner's status counter inside the caller's transaction
+        """
+        query = """
+        INSERT INTO task_counters (owner_id, status, slot, task_count) VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE task_count = task_count + %s
+        """
+        cursor.execute(query, (owner_id, status, random.randrange(COUNTER_SLOTS), delta, delta))
+    
+    @staticmethod
+    def _record_transitions(cursor, transitions):
+        """
+        Appends (task_id, owner_id, from_status, to_status) rows to the status
+        history inside the caller's transaction
+        """
+        query = """
+        INSERT INTO task_status_history (task_id, owner_id, from_status, to_status)
+        VALUES (%s, %s, %s, %s)
+        """
+        cursor.executemany(query, transitions)
+    
+    def _publish(self, events):
+        """
+        Publishes change events once the transaction that made them has committed
+        """
+        if self.tag_index and events:
+            self.tag_index.apply_events(events)
+        if self.notification_bus and events:
+            self.notification_bus.publish(events)
+    
+    def _insert_values(self, task):
+        return (task.owner_id, task.name, *self._encode_description(task.description), task.status,
+                task.priority, task.due_at, task.idempotency_key, task.created_at)
+    
+    @staticmethod
+    def _ids_by_key(cursor, tasks, lock=False):
+        """
+        Returns {(owner_id, idempotency_key): id} for the keys of the given tasks
+        
+        Without lock the read comes from the transaction's snapshot, which
+        shows rows committed before it was taken plus this transaction's own
+        inserts. With lock the latest committed rows are read.
+        """
+        owners = sorted({task.owner_id for task in tasks})
+        keys = sorted({task.idempotency_key for task in tasks})
+        query = f"""
+        SELECT owner_id, idempotency_key, id FROM tasks
+        WHERE owner_id IN ({', '.join(['%s'] * len(owners))})
+        AND idempotency_key IN ({', '.join(['%s'] * len(keys))})
+        """
+        cursor.execute(query + (" FOR SHARE" if lock else ""), owners + keys)
+        return {(owner_id, key): task_id for owner_id, key, task_id in cursor.fetchall()}
     
     def add(self, task):
         """
         Adds a task to the database
+        
+        If the owner already has a task with the task's idempotency key, no
+        task is inserted and task.id is set to the existing task. A retried
+        add therefore never creates a duplicate.
         """
         connection = self.db_manager.connect()
         if not connection:
@@ -18,16 +196,10 @@ class TaskRepository:
         
         try:
             cursor = connection.cursor()
-            query = """
-            INSERT INTO tasks (name, description, status, created_at)
-            VALUES (%s, %s, %s, %s)
-            """
-            values = (task.name, task.description, task.status, task.created_at)
-            cursor.execute(query, values)
+            events = []
+            self._add_on(cursor, task, events)
             connection.commit()
-            
-            # Get the ID of the newly inserted task
-            task.id = cursor.lastrowid
+            self._publish(events)
             
             cursor.close()
             return True
@@ -37,36 +209,132 @@ class TaskRepository:
         finally:
             self.db_manager.close()
     
-    def get_all(self, filter_status=None):
+    def _add_on(self, cursor, task, events):
         """
-        Retrieves all tasks, optionally filtered by status
+        Inserts a task within the caller's transaction, see add.
+        Change events to publish after the commit are appended to events.
+        """
+        task.owner_id = self._owner_for(task)
+        # On a repeated key LAST_INSERT_ID(id) reports the existing row in the same statement
+        cursor.execute(INSERT_TASK_QUERY + " ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id)",
+                       self._insert_values(task))
+        
+        # Get the ID of the newly inserted (or already existing) task
+        task.id = cursor.lastrowid
+        
+        # No affected rows means the idempotency key matched an existing task
+        if cursor.rowcount == 1:
+            self._adjust_counter(cursor, task.owner_id, task.status, 1)
+            self._record_transitions(cursor, [(task.id, task.owner_id, None, task.status)])
+            events.append(change_event(EVENT_INSERTED, task.id, task.owner_id, task.status))
+        return True
+    
+    def add_many(self, tasks):
         """
+        Adds several tasks in a single transaction, setting the ID of every task
+        
+        Tasks without an idempotency key go into one multi-row INSERT. Tasks
+        with a key go into one multi-row upsert, and a task whose key the owner
+        already used gets the existing task's ID instead of a new row, so a
+        retried batch is safe.
+        
+        Returns:
+            int: Number of tasks inserted or found under their idempotency key, 0 on error.
+        """
+        if not tasks:
+            return 0
+        
         connection = self.db_manager.connect()
+        if not connection:
+            return 0
+        
+        try:
+            cursor = connection.cursor()
+            for task in tasks:
+                task.owner_id = self._owner_for(task)
+            plain = [task for task in tasks if task.idempotency_key is None]
+            keyed = [task for task in tasks if task.idempotency_key is not None]
+            inserted = []
+            
+            # Keys used before this batch. The first read also fixes the snapshot used below.
+            existing = self._ids_by_key(cursor, keyed) if keyed else {}
+            
+            if plain:
+                # The driver rewrites executemany of an INSERT into one multi-row statement
+                cursor.executemany(INSERT_TASK_QUERY, [self._insert_values(task) for task in plain])
+                
+                # A multi-row INSERT gets consecutive IDs and reports the first one
+                first_id = cursor.lastrowid
+                cursor.execute("SELECT @@auto_increment_increment")
+                increment = cursor.fetchone()[0]
+                for index, task in enumerate(plain):
+                    task.id = first_id + index * increment
+                inserted.extend(plain)
+            
+            if keyed:
+                cursor.executemany(INSERT_TASK_QUERY + " ON DUPLICATE KEY UPDATE id = id",
+                                   [self._insert_values(task) for task in keyed])
+                # The snapshot shows the rows found above plus the ones just inserted
+                visible = self._ids_by_key(cursor, keyed)
+                unseen = [task for task in keyed if (task.owner_id, task.idempotency_key) not in visible]
+                # Keys another transaction committed after the snapshot was taken
+                committed = self._ids_by_key(cursor, unseen, lock=True) if unseen else {}
+                new_keys = set(visible) - set(existing)
+                for task in keyed:
+                    key = (task.owner_id, task.idempotency_key)
+                    task.id = visible.get(key, committed.get(key))
+                    if key in new_keys:
+                        # A key repeated inside the batch is stored once
+                        new_keys.discard(key)
+                        inserted.append(task)
+            
+            for (owner_id, status), count in Counter((task.owner_id, task.status) for task in inserted).items():
+                self._adjust_counter(cursor, owner_id, status, count)
+            if inserted:
+                self._record_transitions(cursor, [(task.id, task.owner_id, None, task.status) for task in inserted])
+            connection.commit()
+            self._publish([change_event(EVENT_INSERTED, task.id, task.owner_id, task.status) for task in inserted])
+            
+            cursor.close()
+            return sum(1 for task in tasks if task.id is not None)
+        except Error as e:
+            print(f"Error adding tasks: {e}")
+            return 0
+        finally:
+            self.db_manager.close()
+    
+    def get_all(self, filter_status=None, limit=None, fields=None):
+        """
+        Retrieves all tasks, optionally filtered by status
+        
+        Args:
+            filter_status (tuple, optional): Statuses to include.
+            limit (int, optional): Maximum number of tasks, lowest IDs first.
+            fields (tuple, optional): Columns to fetch, all when None. The ID is
+                always fetched and a skipped description loads on first access.
+        """
+        connection = self.db_manager.connect(read_only=True)
         if not connection:
             return []
         
         try:
             cursor = connection.cursor(dictionary=True)
             
+            owner_condition, params = self._owner_condition()
+            query = f"SELECT {self._select_list(fields)} FROM tasks WHERE deleted_at IS NULL" + owner_condition
             if filter_status:
-                query = "SELECT * FROM tasks WHERE status IN (%s, %s)"
-                cursor.execute(query, filter_status)
-            else:
-                query = "SELECT * FROM tasks"
-                cursor.execute(query)
+                query += f" AND status IN ({', '.join(['%s'] * len(filter_status))})"
+                params.extend(filter_status)
+            if limit:
+                query += " ORDER BY id LIMIT %s"
+                params.append(limit)
+            cursor.execute(query, params)
                 
             result = cursor.fetchall()
             tasks = []
             
             for row in result:
-                task = Task(
-                    id=row['id'],
-                    name=row['name'],
-                    description=row['description'],
-                    status=row['status'],
-                    created_at=row['created_at']
-                )
-                tasks.append(task)
+                tasks.append(self._row_to_task(row))
                 
             cursor.close()
             return tasks
@@ -76,30 +344,93 @@ class TaskRepository:
         finally:
             self.db_manager.close()
     
-    def get_by_id(self, task_id):
+    def fetch_columns(self, columns=("id", "status", "created_at"), filter_status=None,
+                      chunk_size=COLUMNAR_CHUNK_SIZE):
+        """
+        Streams the selected columns in chunks of contiguous arrays
+        
+        Rows are read as plain tuples and never turned into Task objects, which
+        keeps aggregate scripts over large tables cheap. Statuses are
+        dictionary-encoded, see columnar.build_chunk for the chunk layout.
+        
+        Args:
+            columns (tuple): Column names to fetch, from columnar.COLUMNS.
+            filter_status (tuple, optional): Statuses to include.
+            chunk_size (int): Maximum rows per chunk.
+            
+        Yields:
+            dict: Column name to array for each chunk of rows
+        """
+        unknown = [column for column in columns if column not in COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+        
+        # A connection of its own: the stream outlives other repository calls
+        # made between chunks, and the scan may run past the statement time cap
+        connection = self.db_manager.open_dedicated(read_only=True)
+        if not connection:
+            return
+        
+        try:
+            # Unbuffered cursor, rows are pulled from the server chunk by chunk
+            cursor = connection.cursor()
+            owner_condition, params = self._owner_condition()
+            select_columns = list(columns)
+            if "description" in columns:
+                select_columns.append("description_compressed")
+            query = f"SELECT {', '.join(select_columns)} FROM tasks WHERE deleted_at IS NULL" + owner_condition
+            if filter_status:
+                query += f" AND status IN ({', '.join(['%s'] * len(filter_status))})"
+                params.extend(filter_status)
+            query += " ORDER BY id"
+            cursor.execute(query, params)
+            
+            status_encoder = StatusEncoder()
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                if "description" in columns:
+                    # The trailing compressed column is ignored by build_chunk
+                    index = columns.index("description")
+                    rows = [
+                        row[:index] + (self._decode_description(row[index], row[-1]),) + row[index + 1:]
+                        for row in rows
+                    ]
+                yield build_chunk(columns, rows, status_encoder)
+            cursor.close()
+        except Error as e:
+            print(f"Error fetching task columns: {e}")
+        finally:
+            try:
+                connection.close()
+            except Error:
+                # The server is already gone, nothing left to release
+                pass
+    
+    def get_by_id(self, task_id, fields=None):
         """
         Retrieves a task by its ID
+        
+        Args:
+            task_id (int): ID of the task.
+            fields (tuple, optional): Columns to fetch, see get_all.
         """
-        connection = self.db_manager.connect()
+        connection = self.db_manager.connect(read_only=True)
         if not connection:
             return None
         
         try:
             cursor = connection.cursor(dictionary=True)
-            query = "SELECT * FROM tasks WHERE id = %s"
-            cursor.execute(query, (task_id,))
+            owner_condition, owner_params = self._owner_condition()
+            query = f"SELECT {self._select_list(fields)} FROM tasks WHERE id = %s AND deleted_at IS NULL"
+            cursor.execute(query + owner_condition, [task_id] + owner_params)
             
             row = cursor.fetchone()
             if not row:
                 return None
                 
-            task = Task(
-                id=row['id'],
-                name=row['name'],
-                description=row['description'],
-                status=row['status'],
-                created_at=row['created_at']
-            )
+            task = self._row_to_task(row)
                 
             cursor.close()
             return task
@@ -109,6 +440,117 @@ class TaskRepository:
         finally:
             self.db_manager.close()
     
+    def search_by_name(self, prefix, filter_status=None, limit=20, fields=None):
+        """
+        Retrieves tasks whose name starts with the given prefix
+        
+        Uses the name index, so the cost depends on the number of matches
+        returned rather than on the size of the table.
+        
+        Args:
+            prefix (str): Beginning of the task name.
+            filter_status (tuple, optional): Statuses to include.
+            limit (int): Maximum number of tasks to return.
+            fields (tuple, optional): Columns to fetch, see get_all. The name is
+                always fetched since results are ordered by it.
+        """
+        connection = self.db_manager.connect(read_only=True)
+        if not connection:
+            return []
+        
+        try:
+            cursor = connection.cursor(dictionary=True)
+            
+            # Escape LIKE wildcards so the prefix is matched literally
+            pattern = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            owner_condition, owner_params = self._owner_condition()
+            select_list = self._select_list(fields, required=("id", "name"))
+            query = f"SELECT {select_list} FROM tasks WHERE name LIKE %s AND deleted_at IS NULL" + owner_condition
+            params = [pattern] + owner_params
+            if filter_status:
+                query += f" AND status IN ({', '.join(['%s'] * len(filter_status))})"
+                params.extend(filter_status)
+            query += " ORDER BY name, id LIMIT %s"
+            params.append(limit)
+            cursor.execute(query, params)
+            
+            tasks = [self._row_to_task(row) for row in cursor.fetchall()]
+            cursor.close()
+            return tasks
+        except Error as e:
+            print(f"Error searching tasks: {e}")
+            return []
+        finally:
+            self.db_manager.close()
+
+    def next_tasks(self, n=NEXT_UP_LIMIT, fields=None):
+        """
+        Retrieves the open tasks to work on next: highest priority first, then
+        earliest due date, tasks without a due date last
+        
+        Each open status is read as a range of idx_tasks_owner_next that is
+        already in this order, so at most n index entries are read per status
+        and only those rows are sorted.
+        
+        Args:
+            n (int): Maximum number of tasks to return.
+            fields (tuple, optional): Columns to fetch, see get_all.
+        """
+        connection = self.db_manager.connect(read_only=True)
+        if not connection:
+            return []
+        
+        try:
+            cursor = connection.cursor(dictionary=True)
+            owner_condition, owner_params = self._owner_condition()
+            select_list = self._select_list(fields, required=("id", "priority", "due_at"))
+            if fields is not None:
+                select_list += ", due_order"
+            order = " ORDER BY priority DESC, due_order, id LIMIT %s"
+            branch = (f"(SELECT {select_list} FROM tasks WHERE status = %s AND deleted_at IS NULL"
+                      f"{owner_condition}{order})")
+            open_statuses = (TASK_STATE_NOT_STARTED, TASK_STATE_IN_PROGRESS)
+            query = " UNION ALL ".join([branch] * len(open_statuses)) + order
+            params = []
+            for status in open_statuses:
+                params += [status] + owner_params + [n]
+            params.append(n)
+            cursor.execute(query, params)
+            
+            tasks = [self._row_to_task(row) for row in cursor.fetchall()]
+            cursor.close()
+            return tasks
+        except Error as e:
+            print(f"Error retrieving next tasks: {e}")
+            return []
+        finally:
+            self.db_manager.close()
+    
+    def get_description(self, task_id):
+        """
+        Retrieves only the description of a task, used by lazily loaded tasks
+
+        Returns:
+            str: The description, or None if the task was not found or on error
+        """
+        connection = self.db_manager.connect(read_only=True)
+        if not connection:
+            return None
+
+        try:
+            cursor = connection.cursor()
+            owner_condition, owner_params = self._owner_condition()
+            query = "SELECT description, description_compressed FROM tasks WHERE id = %s AND deleted_at IS NULL"
+            cursor.execute(query + owner_condition, [task_id] + owner_params)
+            row = cursor.fetchone()
+            cursor.close()
+            return self._decode_description(*row) if row else None
+        except Error as e:
+            print(f"Error retrieving task description: {e}")
+            return None
+        finally:
+            self.db_manager.close()
+
     def update_status(self, task_id, new_status):
         """
         Updates the status of a task
@@ -119,22 +561,362 @@ class TaskRepository:
         
         try:
             cursor = connection.cursor()
-            query = "UPDATE tasks SET status = %s WHERE id = %s"
-            cursor.execute(query, (new_status, task_id))
+            events = []
+            updated = self._update_status_on(cursor, task_id, new_status, events=events)
+            connection.commit()
+            self._publish(events)
+            
+            cursor.close()
+            return updated
+        except Error as e:
+            print(f"Error updating task: {e}")
+            return False
+        finally:
+            self.db_manager.close()
+    
+    def _update_status_on(self, cursor, task_id, new_status, from_status=None, events=None):
+        """
+        Updates the status of a task within the caller's transaction
+        
+        Args:
+            from_status (tuple, optional): Only update a task currently in one of these statuses.
+            events (list, optional): Change events to publish after the commit are appended here.
+        """
+        # Lock the row so the counters move from the status it really had
+        owner_condition, owner_params = self._owner_condition()
+        query = "SELECT owner_id, status FROM tasks WHERE id = %s AND deleted_at IS NULL"
+        cursor.execute(query + owner_condition + " FOR UPDATE", [task_id] + owner_params)
+        row = cursor.fetchone()
+        if row is None or (from_status and row[1] not in from_status):
+            return False
+        
+        # A manual status change ends any work claim on the task
+        query = """
+        UPDATE tasks SET status = %s, claimed_by = NULL, claim_expires_at = NULL
+        WHERE id = %s AND deleted_at IS NULL
+        """
+        cursor.execute(query + owner_condition, [new_status, task_id] + owner_params)
+        affected_rows = cursor.rowcount
+        
+        if affected_rows > 0:
+            self._adjust_counter(cursor, row[0], row[1], -1)
+            self._adjust_counter(cursor, row[0], new_status, 1)
+            if row[1] != new_status:
+                self._record_transitions(cursor, [(task_id, row[0], row[1], new_status)])
+                if events is not None:
+                    events.append(change_event(EVENT_UPDATED, task_id, row[0], new_status, row[1]))
+        return affected_rows > 0
+    
+    @staticmethod
+    def _transition_filter(filter):
+        """
+        Builds the SQL conditions of a bulk_transition filter
+        """
+        conditions, params = "", []
+        for key, value in filter.items():
+            if key == "status":
+                statuses = [value] if isinstance(value, str) else list(value)
+                conditions += f" AND status IN ({', '.join(['%s'] * len(statuses))})"
+                params.extend(statuses)
+            elif key in TRANSITION_FILTERS:
+                conditions += f" AND {TRANSITION_FILTERS[key]}"
+                params.append(value)
+            else:
+                raise ValueError(f"Unknown filter '{key}'. Use status or {', '.join(TRANSITION_FILTERS)}.")
+        return conditions, params
+    
+    def bulk_transition(self, filter, new_status, chunk_size=BULK_TRANSITION_CHUNK_SIZE,
+                        pause=BULK_TRANSITION_PAUSE_SECONDS, dry_run=False, progress=None):
+        """
+        Moves every live task matching the filter to new_status inside the database
+        
+        The primary key is walked in chunks of chunk_size rows. Each chunk finds
+        its matching rows with a plain read, then locks only those by primary
+        key, re-checking the filter, and updates them in a short transaction
+        with counters and status history kept in step. A locking read of the
+        whole range would lock every row it scans under REPEATABLE READ. A
+        pause follows before the next chunk so interactive writers are not starved.
+        
+        Args:
+            filter (dict): Conditions that must all hold: "status" (a status or
+                tuple of statuses) and datetimes for "created_before",
+                "created_after", "updated_before" and "updated_after".
+            new_status (str): Status to move the matching tasks to.
+            chunk_size (int): Primary key rows walked per transaction.
+            pause (float): Seconds to sleep between chunks.
+            dry_run (bool): Only count the tasks that would change.
+            progress (callable, optional): Called after every chunk with the
+                number of tasks changed so far and the last ID walked.
+            
+        Returns:
+            int: Number of tasks changed, or that would change on a dry run
+        """
+        conditions, filter_params = self._transition_filter(filter)
+        owner_condition, owner_params = self._owner_condition()
+        conditions += " AND status <> %s" + owner_condition
+        filter_params += [new_status] + owner_params
+        
+        if dry_run:
+            connection = self.db_manager.connect(read_only=True)
+            if not connection:
+                return 0
+            try:
+                cursor = connection.cursor()
+                cursor.execute("SELECT COUNT(*) FROM tasks WHERE deleted_at IS NULL" + conditions, filter_params)
+                count = cursor.fetchone()[0]
+                cursor.close()
+                return count
+            except Error as e:
+                print(f"Error counting tasks to transition: {e}")
+                return 0
+            finally:
+                self.db_manager.close()
+        
+        affected = 0
+        last_id = 0
+        while True:
+            connection = self.db_manager.connect()
+            if not connection:
+                break
+            
+            try:
+                cursor = connection.cursor()
+                # Upper bound of this chunk, None once fewer than chunk_size rows remain
+                cursor.execute("SELECT id FROM tasks WHERE id > %s ORDER BY id LIMIT 1 OFFSET %s",
+                               (last_id, chunk_size - 1))
+                row = cursor.fetchone()
+                upper_id = row[0] if row else None
+                
+                range_condition = "id > %s" + (" AND id <= %s" if upper_id else "")
+                range_params = [last_id] + ([upper_id] if upper_id else [])
+                query = f"SELECT id FROM tasks WHERE {range_condition} AND deleted_at IS NULL"
+                cursor.execute(query + conditions, range_params + filter_params)
+                candidate_ids = [row[0] for row in cursor.fetchall()]
+                
+                rows = []
+                if candidate_ids:
+                    # The filter is checked again on the locked rows, which may have changed since the plain read
+                    query = f"""
+                    SELECT id, owner_id, status FROM tasks
+                    WHERE id IN ({', '.join(['%s'] * len(candidate_ids))}) AND deleted_at IS NULL
+                    """
+                    cursor.execute(query + conditions + " FOR UPDATE", candidate_ids + filter_params)
+                    rows = cursor.fetchall()
+                
+                if rows:
+                    query = f"""
+                    UPDATE tasks SET status = %s, claimed_by = NULL, claim_expires_at = NULL
+                    WHERE id IN ({', '.join(['%s'] * len(rows))})
+                    """
+                    cursor.execute(query, [new_status] + [row[0] for row in rows])
+                    for (owner_id, status), count in Counter((row[1], row[2]) for row in rows).items():
+                        self._adjust_counter(cursor, owner_id, status, -count)
+                        self._adjust_counter(cursor, owner_id, new_status, count)
+                    self._record_transitions(cursor, [(row[0], row[1], row[2], new_status) for row in rows])
+                connection.commit()
+                self._publish([change_event(EVENT_UPDATED, row[0], row[1], new_status, row[2]) for row in rows])
+                cursor.close()
+            except Error as e:
+                print(f"Error transitioning tasks: {e}")
+                break
+            finally:
+                self.db_manager.close()
+            
+            affected += len(rows)
+            last_id = upper_id if upper_id else (max(row[0] for row in rows) if rows else last_id)
+            if progress:
+                progress(affected, last_id)
+            if upper_id is None:
+                break
+            time.sleep(pause)
+        return affected
+    
+    def claim(self, n, worker_id, lease_seconds=CLAIM_LEASE_SECONDS):
+        """
+        Atomically moves up to n "Not started" tasks to "In progress" for a worker
+        
+        Candidates are taken in "Next up" order with FOR UPDATE SKIP LOCKED, so
+        concurrent workers never wait on each other's rows and never claim the
+        same task twice. The claim is a lease: renew_claim extends it and
+        requeue_expired_claims returns tasks whose lease ran out to the queue.
+        
+        Args:
+            n (int): Maximum number of tasks to claim.
+            worker_id (str): Identifies the claiming worker.
+            lease_seconds (float): How long the claim lasts without renewal.
+            
+        Returns:
+            list: The claimed Task objects, empty if none were available or on error
+        """
+        connection = self.db_manager.connect()
+        if not connection:
+            return []
+        
+        try:
+            cursor = connection.cursor(dictionary=True)
+            owner_condition, owner_params = self._owner_condition()
+            query = f"""
+            SELECT * FROM tasks WHERE status = %s AND deleted_at IS NULL{owner_condition}
+            ORDER BY priority DESC, due_order, id LIMIT %s FOR UPDATE SKIP LOCKED
+            """
+            cursor.execute(query, [TASK_STATE_NOT_STARTED] + owner_params + [n])
+            tasks = [self._row_to_task(row) for row in cursor.fetchall()]
+            
+            if tasks:
+                query = f"""
+                UPDATE tasks SET status = %s, claimed_by = %s,
+                    claim_expires_at = NOW(6) + INTERVAL %s MICROSECOND
+                WHERE id IN ({', '.join(['%s'] * len(tasks))})
+                """
+                cursor.execute(query, [TASK_STATE_IN_PROGRESS, worker_id, int(lease_seconds * 1000000)]
+                               + [task.id for task in tasks])
+                for owner_id, count in Counter(task.owner_id for task in tasks).items():
+                    self._adjust_counter(cursor, owner_id, TASK_STATE_NOT_STARTED, -count)
+                    self._adjust_counter(cursor, owner_id, TASK_STATE_IN_PROGRESS, count)
+                self._record_transitions(cursor, [
+                    (task.id, task.owner_id, TASK_STATE_NOT_STARTED, TASK_STATE_IN_PROGRESS) for task in tasks
+                ])
             connection.commit()
+            self._publish([
+                change_event(EVENT_UPDATED, task.id, task.owner_id, TASK_STATE_IN_PROGRESS, TASK_STATE_NOT_STARTED)
+                for task in tasks
+            ])
             
+            cursor.close()
+            for task in tasks:
+                task.status = TASK_STATE_IN_PROGRESS
+            return tasks
+        except Error as e:
+            print(f"Error claiming tasks: {e}")
+            return []
+        finally:
+            self.db_manager.close()
+    
+    def renew_claim(self, task_id, worker_id, lease_seconds=CLAIM_LEASE_SECONDS):
+        """
+        Extends the lease of a task claimed by the worker
+        
+        Returns:
+            bool: False when the worker no longer holds the claim
+        """
+        connection = self.db_manager.connect()
+        if not connection:
+            return False
+        
+        try:
+            cursor = connection.cursor()
+            owner_condition, owner_params = self._owner_condition()
+            query = """
+            UPDATE tasks SET claim_expires_at = NOW(6) + INTERVAL %s MICROSECOND
+            WHERE id = %s AND claimed_by = %s AND status = %s AND deleted_at IS NULL
+            """
+            params = [int(lease_seconds * 1000000), task_id, worker_id, TASK_STATE_IN_PROGRESS]
+            cursor.execute(query + owner_condition, params + owner_params)
             affected_rows = cursor.rowcount
+            connection.commit()
+            
             cursor.close()
             return affected_rows > 0
         except Error as e:
-            print(f"Error updating task: {e}")
+            print(f"Error renewing claim: {e}")
+            return False
+        finally:
+            self.db_manager.close()
+    
+    def finish_claim(self, task_id, worker_id, new_status=TASK_STATE_COMPLETED):
+        """
+        Sets the final status of a task claimed by the worker and releases the claim
+        
+        Returns:
+            bool: False when the worker no longer holds the claim, e.g. because
+                the lease expired and the task was requeued
+        """
+        connection = self.db_manager.connect()
+        if not connection:
+            return False
+        
+        try:
+            cursor = connection.cursor()
+            owner_condition, owner_params = self._owner_condition()
+            query = "SELECT owner_id FROM tasks WHERE id = %s AND claimed_by = %s AND status = %s"
+            query += " AND deleted_at IS NULL" + owner_condition + " FOR UPDATE"
+            cursor.execute(query, [task_id, worker_id, TASK_STATE_IN_PROGRESS] + owner_params)
+            row = cursor.fetchone()
+            
+            if row:
+                query = "UPDATE tasks SET status = %s, claimed_by = NULL, claim_expires_at = NULL WHERE id = %s"
+                cursor.execute(query, (new_status, task_id))
+                self._adjust_counter(cursor, row[0], TASK_STATE_IN_PROGRESS, -1)
+                self._adjust_counter(cursor, row[0], new_status, 1)
+                if new_status != TASK_STATE_IN_PROGRESS:
+                    self._record_transitions(cursor, [(task_id, row[0], TASK_STATE_IN_PROGRESS, new_status)])
+            connection.commit()
+            if row and new_status != TASK_STATE_IN_PROGRESS:
+                self._publish([change_event(EVENT_UPDATED, task_id, row[0], new_status, TASK_STATE_IN_PROGRESS)])
+            
+            cursor.close()
+            return row is not None
+        except Error as e:
+            print(f"Error finishing claim: {e}")
             return False
         finally:
             self.db_manager.close()
     
+    def requeue_expired_claims(self):
+        """
+        Returns claimed tasks whose lease expired to "Not started"
+        
+        Returns:
+            int: Number of requeued tasks
+        """
+        connection = self.db_manager.connect()
+        if not connection:
+            return 0
+        
+        try:
+            cursor = connection.cursor()
+            owner_condition, owner_params = self._owner_condition()
+            # Rows locked by a worker finishing its claim right now are left alone
+            query = """
+            SELECT id, owner_id FROM tasks
+            WHERE claim_expires_at < NOW(6) AND status = %s AND deleted_at IS NULL
+            """
+            cursor.execute(query + owner_condition + " FOR UPDATE SKIP LOCKED",
+                           [TASK_STATE_IN_PROGRESS] + owner_params)
+            rows = cursor.fetchall()
+            
+            if rows:
+                query = f"""
+                UPDATE tasks SET status = %s, claimed_by = NULL, claim_expires_at = NULL
+                WHERE id IN ({', '.join(['%s'] * len(rows))})
+                """
+                cursor.execute(query, [TASK_STATE_NOT_STARTED] + [row[0] for row in rows])
+                for owner_id, count in Counter(row[1] for row in rows).items():
+                    self._adjust_counter(cursor, owner_id, TASK_STATE_IN_PROGRESS, -count)
+                    self._adjust_counter(cursor, owner_id, TASK_STATE_NOT_STARTED, count)
+                self._record_transitions(cursor, [
+                    (row[0], row[1], TASK_STATE_IN_PROGRESS, TASK_STATE_NOT_STARTED) for row in rows
+                ])
+            connection.commit()
+            self._publish([
+                change_event(EVENT_UPDATED, row[0], row[1], TASK_STATE_NOT_STARTED, TASK_STATE_IN_PROGRESS)
+                for row in rows
+            ])
+            
+            cursor.close()
+            return len(rows)
+        except Error as e:
+            print(f"Error requeueing expired claims: {e}")
+            return 0
+        finally:
+            self.db_manager.close()
+    
     def delete(self, task_id):
         """
-        Deletes a task by its ID
+        Soft-deletes a task by its ID
+        
+        The row only gets a deleted_at timestamp; purge_deleted removes it
+        physically later and undelete can bring it back until then.
         """
         connection = self.db_manager.connect()
         if not connection:
@@ -142,15 +924,998 @@ class TaskRepository:
         
         try:
             cursor = connection.cursor()
-            query = "DELETE FROM tasks WHERE id = %s"
-            cursor.execute(query, (task_id,))
+            events = []
+            deleted = self._delete_on(cursor, task_id, events)
             connection.commit()
+            self._publish(events)
             
-            affected_rows = cursor.rowcount
             cursor.close()
-            return affected_rows > 0
+            return deleted
         except Error as e:
             print(f"Error deleting task: {e}")
             return False
         finally:
-            self.db_manager.close()
\ No newline at end of file
+            self.db_manager.close()
+    
+    def _delete_on(self, cursor, task_id, events):
+        """
+        Soft-deletes a task within the caller's transaction, see delete.
+        Change events to publish after the commit are appended to events.
+        """
+        owner_condition, owner_params = self._owner_condition()
+        query = "SELECT owner_id, status FROM tasks WHERE id = %s AND deleted_at IS NULL"
+        cursor.execute(query + owner_condition + " FOR UPDATE", [task_id] + owner_params)
+        row = cursor.fetchone()
+        
+        query = "UPDATE tasks SET deleted_at = NOW(6) WHERE id = %s AND deleted_at IS NULL" + owner_condition
+        cursor.execute(query, [task_id] + owner_params)
+        affected_rows = cursor.rowcount
+        
+        # Record a tombstone in the same transaction for the change feed
+        if affected_rows > 0:
+            cursor.execute(
+                "REPLACE INTO task_tombstones (task_id, owner_id) VALUES (%s, %s)",
+                (task_id, row[0])
+            )
+            self._adjust_counter(cursor, row[0], row[1], -1)
+            events.append(change_event(EVENT_DELETED, task_id, row[0], row[1]))
+        return affected_rows > 0
+    
+    def apply_operations(self, operations, commit_every=None):
+        """
+        Runs add, update and delete operations in order on one connection
+        
+        Args:
+            operations (iterable): (action, argument) pairs: ("add", Task),
+                ("update", (task_id, new_status, from_status)) or ("delete", task_id).
+            commit_every (int, optional): Commit after every this many operations and
+                carry on past operations that find no task. None runs everything in
+                one transaction that stops at the first failure and commits nothing.
+                
+        Returns:
+            tuple: (list with True or False per operation attempted, list telling per
+                operation attempted whether its transaction was committed). Operations
+                after a database error are not attempted.
+                
+        Raises:
+            ValueError: If commit_every is below 1.
+        """
+        if commit_every is not None and commit_every < 1:
+            raise ValueError(ERROR_INVALID_COMMIT_EVERY.format(commit_every))
+        results = []
+        committed = 0
+        connection = self.db_manager.connect()
+        if not connection:
+            return results, []
+        
+        try:
+            cursor = connection.cursor()
+            # Events of the operations since the last commit
+            events = []
+            for action, argument in operations:
+                if action == "add":
+                    ok = self._add_on(cursor, argument, events)
+                elif action == "update":
+                    ok = self._update_status_on(cursor, *argument, events=events)
+                elif action == "delete":
+                    ok = self._delete_on(cursor, argument, events)
+                else:
+                    raise ValueError(f"Unknown operation: {action}")
+                results.append(ok)
+                
+                if commit_every is None:
+                    if not ok:
+                        # Closing without a commit discards the whole transaction
+                        break
+                elif len(results) % commit_every == 0:
+                    connection.commit()
+                    committed = len(results)
+                    self._publish(events)
+                    events = []
+            else:
+                connection.commit()
+                committed = len(results)
+                self._publish(events)
+            
+            cursor.close()
+        except Error as e:
+            print(f"Error applying operations: {e}")
+            results.append(False)
+        finally:
+            self.db_manager.close()
+        return results, [index < committed for index in range(len(results))]
+    
+    def undelete(self, task_id):
+        """
+        Restores a soft-deleted task that has not been purged yet
+        """
+        connection = self.db_manager.connect()
+        if not connection:
+            return False
+        
+        try:
+            cursor = connection.cursor()
+            owner_condition, owner_params = self._owner_condition()
+            query = "SELECT owner_id, status FROM tasks WHERE id = %s AND deleted_at IS NOT NULL"
+            cursor.execute(query + owner_condition + " FOR UPDATE", [task_id] + owner_params)
+            row = cursor.fetchone()
+            
+            query = "UPDATE tasks SET deleted_at = NULL WHERE id = %s AND deleted_at IS NOT NULL" + owner_condition
+            cursor.execute(query, [task_id] + owner_params)
+            affected_rows = cursor.rowcount
+            
+            if affected_rows > 0:
+                cursor.execute("DELETE FROM task_tombstones WHERE task_id = %s", (task_id,))
+                self._adjust_counter(cursor, row[0], row[1], 1)
+            connection.commit()
+            if affected_rows > 0:
+                self._publish([change_event(EVENT_RESTORED, task_id, row[0], row[1])])
+            
+            cursor.close()
+            return affected_rows > 0
+        except Error as e:
+            print(f"Error restoring task: {e}")
+            return False
+        finally:
+            self.db_manager.close()
+    
+    def purge_deleted(self, older_than, chunk_size=PURGE_CHUNK_SIZE, pause=PURGE_PAUSE_SECONDS,
+                      max_chunks=None):
+        """
+        Physically removes tasks soft-deleted before the given time, with their
+        tags and status history, and tombstones recorded before that time
+        
+        Rows are removed in small chunks, each in its own short transaction,
+        with a pause in between so the purge does not hold locks for long
+        or starve interactive writers. A change feed cursor older than the
+        purged tombstones no longer sees those deletes and should start over.
+        
+        Args:
+            older_than (datetime): Purge tasks deleted before this time.
+            chunk_size (int): Rows removed per transaction.
+            pause (float): Seconds to sleep between chunks.
+            max_chunks (int, optional): Stop after this many chunks.
+            
+        Returns:
+            int: Number of purged tasks.
+        """
+        purged = 0
+        chunks = 0
+        while max_chunks is None or chunks < max_chunks:
+            connection = self.db_manager.connect()
+            if not connection:
+                break
+            
+            try:
+                cursor = connection.cursor()
+                query = """
+                SELECT id FROM tasks
+                WHERE deleted_at IS NOT NULL AND deleted_at < %s{}
+                ORDER BY deleted_at
+                LIMIT %s
+                FOR UPDATE
+                """
+                owner_condition, owner_params = self._owner_condition()
+                cursor.execute(query.format(owner_condition), [older_than] + owner_params + [chunk_size])
+                task_ids = [row[0] for row in cursor.fetchall()]
+                affected_rows = 0
+                if task_ids:
+                    placeholders = ', '.join(['%s'] * len(task_ids))
+                    cursor.execute(f"DELETE FROM tasks WHERE id IN ({placeholders})", task_ids)
+                    affected_rows = cursor.rowcount
+                    cursor.execute(f"DELETE FROM task_tags WHERE task_id IN ({placeholders})", task_ids)
+                    cursor.execute(f"DELETE FROM task_status_history WHERE task_id IN ({placeholders})", task_ids)
+                
+                query = """
+                DELETE FROM task_tombstones
+                WHERE deleted_at < %s{}
+                ORDER BY deleted_at
+                LIMIT %s
+                """
+                cursor.execute(query.format(owner_condition), [older_than] + owner_params + [chunk_size])
+                tombstones = cursor.rowcount
+                connection.commit()
+                cursor.close()
+            except Error as e:
+                print(f"Error purging deleted tasks: {e}")
+                break
+            finally:
+                self.db_manager.close()
+            
+            purged += affected_rows
+            chunks += 1
+            if affected_rows < chunk_size and tombstones < chunk_size:
+                break
+            time.sleep(pause)
+        return purged
+    
+    def _feed_filter(self, time_column, since):
+        """
+        Builds the WHERE conditions of a change feed query
+        """
+        conditions, params = [], []
+        if self.owner_id is not None:
+            conditions.append("owner_id = %s")
+            params.append(self.owner_id)
+        if since is not None:
+            conditions.append(f"{time_column} > %s")
+            params.append(since)
+        return conditions, params
+    
+    def changes_since(self, cursor_value=None, fields=None, filter_status=None):
+        """
+        Retrieves tasks inserted, updated or deleted after the given cursor
+        
+        Each call re-reads the last CHANGE_FEED_OVERLAP_SECONDS before the
+        cursor, because a transaction stamps its rows when it writes them but
+        they only become visible when it commits. Changes already returned are
+        remembered in the cursor by (task ID, timestamp) and skipped.
+        
+        Args:
+            cursor_value (tuple, optional): Cursor returned by a previous call,
+                None to fetch everything.
+            fields (tuple, optional): Columns to fetch, see get_all.
+            filter_status (tuple, optional): Statuses the initial fetch is limited to.
+                Later calls return every change, so tasks leaving them are seen.
+            
+        Returns:
+            dict: "inserted" and "updated" lists of Task objects, "deleted" list
+                of task IDs and "cursor" to pass to the next call, or None on error.
+        """
+        high_water, seen = cursor_value if cursor_value is not None else (None, frozenset())
+        since = high_water - timedelta(seconds=CHANGE_FEED_OVERLAP_SECONDS) if high_water else None
+        
+        connection = self.db_manager.connect(read_only=True)
+        if not connection:
+            return None
+        
+        try:
+            cursor = connection.cursor(dictionary=True)
+            
+            # Soft-deleted rows are reported through their tombstone
+            conditions, params = self._feed_filter("updated_at", since)
+            conditions.append("deleted_at IS NULL")
+            if cursor_value is None and filter_status:
+                conditions.append(f"status IN ({', '.join(['%s'] * len(filter_status))})")
+                params.extend(filter_status)
+            columns = self._select_list(fields, required=("id", "updated_at"))
+            cursor.execute(f"SELECT {columns} FROM tasks WHERE {' AND '.join(conditions)} "
+                           f"ORDER BY updated_at, id", params)
+            rows = [row for row in cursor.fetchall() if ("task", row['id'], row['updated_at']) not in seen]
+            
+            conditions, params = self._feed_filter("deleted_at", since)
+            where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+            cursor.execute(f"SELECT task_id, deleted_at FROM task_tombstones{where} ORDER BY deleted_at", params)
+            tombstones = [row for row in cursor.fetchall()
+                          if ("deleted", row['task_id'], row['deleted_at']) not in seen]
+            
+            # A task is new to the client if it was created inside the window
+            # read by this call and not returned before, judged by the server
+            # clock of its first history row rather than the client's created_at
+            created = None
+            if since is not None:
+                returned = {key[1] for key in seen if key[0] == "task"}
+                ids = [row['id'] for row in rows if row['id'] not in returned]
+                created = set()
+                if ids:
+                    cursor.execute(f"""
+                    SELECT DISTINCT task_id FROM task_status_history
+                    WHERE task_id IN ({', '.join(['%s'] * len(ids))}) AND from_status IS NULL AND at > %s
+                    """, ids + [since])
+                    created = {row['task_id'] for row in cursor.fetchall()}
+            cursor.close()
+            
+            changes = {"inserted": [], "updated": [], "deleted": []}
+            delivered = set(seen)
+            for row in rows:
+                task = self._row_to_task(row)
+                high_water = max(high_water, task.updated_at) if high_water else task.updated_at
+                delivered.add(("task", task.id, task.updated_at))
+                if created is None or task.id in created:
+                    changes["inserted"].append(task)
+                else:
+                    changes["updated"].append(task)
+            
+            for row in tombstones:
+                changes["deleted"].append(row['task_id'])
+                high_water = max(high_water, row['deleted_at']) if high_water else row['deleted_at']
+                delivered.add(("deleted", row['task_id'], row['deleted_at']))
+            
+            if high_water is None:
+                changes["cursor"] = None
+            else:
+                window_start = high_water - timedelta(seconds=CHANGE_FEED_OVERLAP_SECONDS)
+                changes["cursor"] = (high_water, frozenset(key for key in delivered if key[2] > window_start))
+            return changes
+        except Error as e:
+            print(f"Error retrieving task changes: {e}")
+            return None
+        finally:
+            self.db_manager.close()
+    
+    def tag(self, task_id, *tags):
+        """
+        Adds tags to a task, creating tags the owner has not used yet
+        
+        Returns:
+            bool: False if the task was not found or on error
+        
+        Raises:
+            ValueError: If a tag is empty or too long
+        """
+        names = sorted({normalize_tag(tag) for tag in tags})
+        if not names:
+            return False
+        
+        connection = self.db_manager.connect()
+        if not connection:
+            return False
+        
+        try:
+            cursor = connection.cursor()
+            owner_condition, owner_params = self._owner_condition()
+            query = "SELECT owner_id, status FROM tasks WHERE id = %s AND deleted_at IS NULL"
+            cursor.execute(query + owner_condition, [task_id] + owner_params)
+            row = cursor.fetchone()
+            if not row:
+                return False
+            
+            cursor.executemany("INSERT IGNORE INTO tags (owner_id, name) VALUES (%s, %s)",
+                               [(row[0], name) for name in names])
+            query = f"SELECT id FROM tags WHERE owner_id = %s AND name IN ({', '.join(['%s'] * len(names))})"
+            cursor.execute(query, [row[0]] + names)
+            tag_ids = [tag_row[0] for tag_row in cursor.fetchall()]
+            cursor.executemany("INSERT IGNORE INTO task_tags (tag_id, task_id) VALUES (%s, %s)",
+                               [(tag_id, task_id) for tag_id in tag_ids])
+            connection.commit()
+            if self.tag_index:
+                for name in names:
+                    self.tag_index.add(task_id, name, row[1])
+            
+            cursor.close()
+            return True
+        except Error as e:
+            print(f"Error tagging task: {e}")
+            return False
+        finally:
+            self.db_manager.close()
+    
+    def untag(self, task_id, *tags):
+        """
+        Removes tags from a task
+        
+        Returns:
+            int: Number of removed tags
+        """
+        names = sorted({normalize_tag(tag) for tag in tags})
+        if not names:
+            return 0
+        
+        connection = self.db_manager.connect()
+        if not connection:
+            return 0
+        
+        try:
+            cursor = connection.cursor()
+            owner_condition, owner_params = self._owner_condition()
+            query = f"""
+            DELETE task_tags FROM task_tags JOIN tags ON tags.id = task_tags.tag_id
+            WHERE task_tags.task_id = %s AND tags.name IN ({', '.join(['%s'] * len(names))}){owner_condition}
+            """
+            cursor.execute(query, [task_id] + names + owner_params)
+            affected_rows = cursor.rowcount
+            connection.commit()
+            if self.tag_index:
+                for name in names:
+                    self.tag_index.remove(task_id, name)
+            
+            cursor.close()
+            return affected_rows
+        except Error as e:
+            print(f"Error untagging task: {e}")
+            return 0
+        finally:
+            self.db_manager.close()
+    
+    def get_tags(self, task_id):
+        """
+        Returns the sorted tags of a task, or None on error
+        """
+        connection = self.db_manager.connect(read_only=True)
+        if not connection:
+            return None
+        
+        try:
+            cursor = connection.cursor()
+            owner_condition, owner_params = self._owner_condition()
+            query = """
+            SELECT tags.name FROM task_tags JOIN tags ON tags.id = task_tags.tag_id
+            WHERE task_tags.task_id = %s
+            """
+            cursor.execute(query + owner_condition + " ORDER BY tags.name", [task_id] + owner_params)
+            tags = [row[0] for row in cursor.fetchall()]
+            cursor.close()
+            return tags
+        except Error as e:
+            print(f"Error retrieving task tags: {e}")
+            return None
+        finally:
+            self.db_manager.close()
+    
+    def find_by_tags(self, expression, filter_status=None, limit=None, fields=None):
+        """
+        Retrieves tasks matching a tag expression, optionally filtered by status
+        
+        The query is driven by the most selective group: its tag rows are read
+        as primary key ranges and every other group is checked with primary key
+        lookups on (tag_id, task_id). Selectivity is estimated by reading at
+        most TAG_PROBE_LIMIT rows per group, so planning stays cheap for tags
+        on millions of tasks.
+        
+        Args:
+            expression (list): Tag expression, see utils.tag_groups.
+            filter_status (tuple, optional): Statuses to include.
+            limit (int, optional): Maximum number of tasks, lowest IDs first.
+            fields (tuple, optional): Columns to fetch, see get_all.
+        """
+        groups = tag_groups(expression)
+        if self.tag_index and (self.tag_index.loaded or self.tag_index.load()):
+            return self._get_many(self.tag_index.query(expression, filter_status, limit), fields)
+        
+        connection = self.db_manager.connect(read_only=True)
+        if not connection:
+            return []
+        
+        try:
+            cursor = connection.cursor()
+            owner_condition, owner_params = self._owner_condition()
+            names = sorted({name for group in groups for name in group})
+            query = f"SELECT id, name FROM tags WHERE name IN ({', '.join(['%s'] * len(names))})"
+            cursor.execute(query + owner_condition, names + owner_params)
+            ids_by_name = {}
+            for tag_id, name in cursor.fetchall():
+                ids_by_name.setdefault(name, []).append(tag_id)
+            
+            group_ids = [[tag_id for name in group for tag_id in ids_by_name.get(name, [])] for group in groups]
+            if not all(group_ids):
+                cursor.close()
+                return []
+            
+            # Probe each group with a bounded range read to find the smallest one
+            probe = " UNION ALL ".join(
+                f"(SELECT {index}, COUNT(*) FROM (SELECT 1 FROM task_tags "
+                f"WHERE tag_id IN ({', '.join(['%s'] * len(ids))}) LIMIT %s) AS probe{index})"
+                for index, ids in enumerate(group_ids)
+            )
+            probe_params = []
+            for ids in group_ids:
+                probe_params += ids + [TAG_PROBE_LIMIT]
+            cursor.execute(probe, probe_params)
+            sizes = dict(cursor.fetchall())
+            cursor.close()
+            
+            order = sorted(range(len(group_ids)), key=lambda index: sizes[index])
+            driving_ids = group_ids[order[0]]
+            other_groups = [group_ids[index] for index in order[1:]]
+            select_list = "tasks.*" if fields is None else self._select_list(fields)
+            query = f"""
+            SELECT {select_list} FROM (
+                SELECT DISTINCT task_id FROM task_tags WHERE tag_id IN ({', '.join(['%s'] * len(driving_ids))})
+            ) AS candidates
+            JOIN tasks ON tasks.id = candidates.task_id
+            WHERE tasks.deleted_at IS NULL{owner_condition}
+            """
+            params = list(driving_ids) + owner_params
+            for ids in other_groups:
+                query += f"""
+                AND EXISTS (SELECT 1 FROM task_tags matched
+                            WHERE matched.task_id = candidates.task_id
+                            AND matched.tag_id IN ({', '.join(['%s'] * len(ids))}))
+                """
+                params.extend(ids)
+            if filter_status:
+                query += f" AND status IN ({', '.join(['%s'] * len(filter_status))})"
+                params.extend(filter_status)
+            query += " ORDER BY tasks.id"
+            if limit:
+                query += " LIMIT %s"
+                params.append(limit)
+            
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute(query, params)
+            tasks = [self._row_to_task(row) for row in cursor.fetchall()]
+            cursor.close()
+            return tasks
+        except Error as e:
+            print(f"Error retrieving tasks by tags: {e}")
+            return []
+        finally:
+            self.db_manager.close()
+    
+    def _get_many(self, task_ids, fields=None):
+        """
+        Retrieves live tasks by ID in ID order, skipping IDs that are gone
+        
+        IDs are looked up TAG_INDEX_FETCH_CHUNK_SIZE at a time, so a common tag
+        never turns into one statement with an unbounded IN list.
+        """
+        if not task_ids:
+            return []
+        
+        connection = self.db_manager.connect(read_only=True)
+        if not connection:
+            return []
+        
+        try:
+            cursor = connection.cursor(dictionary=True)
+            owner_condition, owner_params = self._owner_condition()
+            task_ids = sorted(task_ids)
+            tasks = []
+            for start in range(0, len(task_ids), TAG_INDEX_FETCH_CHUNK_SIZE):
+                chunk = task_ids[start:start + TAG_INDEX_FETCH_CHUNK_SIZE]
+                query = f"""
+                SELECT {self._select_list(fields)} FROM tasks
+                WHERE id IN ({', '.join(['%s'] * len(chunk))}) AND deleted_at IS NULL{owner_condition}
+                ORDER BY id
+                """
+                cursor.execute(query, chunk + owner_params)
+                tasks.extend(self._row_to_task(row) for row in cursor.fetchall())
+            cursor.close()
+            return tasks
+        except Error as e:
+            print(f"Error retrieving tasks by tags: {e}")
+            return []
+        finally:
+            self.db_manager.close()
+    
+    def get_tag_assignments(self):
+        """
+        Returns (task_id, tag, status) for every tag on a live task, used to
+        build an in-memory tag index
+        """
+        connection = self.db_manager.connect(read_only=True)
+        if not connection:
+            return None
+        
+        try:
+            cursor = connection.cursor()
+            owner_condition, owner_params = self._owner_condition()
+            query = """
+            SELECT task_tags.task_id, tags.name, tasks.status FROM task_tags
+            JOIN tags ON tags.id = task_tags.tag_id
+            JOIN tasks ON tasks.id = task_tags.task_id
+            WHERE tasks.deleted_at IS NULL
+            """
+            cursor.execute(query + owner_condition.replace("owner_id", "tasks.owner_id"), owner_params)
+            assignments = cursor.fetchall()
+            cursor.close()
+            return assignments
+        except Error as e:
+            print(f"Error retrieving tag assignments: {e}")
+            return None
+        finally:
+            self.db_manager.close()
+    
+    def status_timeline(self, task_id):
+        """
+        Returns the status transitions of a task, oldest first
+        
+        Returns:
+            list: Dictionaries with from_status (None for creation), to_status
+                and at, or None on error
+        """
+        connection = self.db_manager.connect(read_only=True)
+        if not connection:
+            return None
+        
+        try:
+            cursor = connection.cursor(dictionary=True)
+            owner_condition, owner_params = self._owner_condition()
+            query = "SELECT from_status, to_status, at FROM task_status_history WHERE task_id = %s"
+            cursor.execute(query + owner_condition + " ORDER BY at, id", [task_id] + owner_params)
+            timeline = cursor.fetchall()
+            cursor.close()
+            return timeline
+        except Error as e:
+            print(f"Error retrieving status timeline: {e}")
+            return None
+        finally:
+            self.db_manager.close()
+    
+    def _duration_stats(self, started_at_query, condition, condition_params, start, end):
+        """
+        Aggregates durations that end with a history row inside [start, end)
+        
+        Args:
+            started_at_query (str): Correlated subquery returning when the
+                duration began for the history row h.
+            condition (str): Extra filter on h.
+            condition_params (list): Parameters of condition.
+            start (datetime): Beginning of the window.
+            end (datetime): End of the window, exclusive.
+            
+        Returns:
+            dict: count, avg_seconds, min_seconds and max_seconds, or None on error
+        """
+        connection = self.db_manager.connect(read_only=True)
+        if not connection:
+            return None
+        
+        try:
+            cursor = connection.cursor()
+            owner_condition, owner_params = self._owner_condition()
+            query = f"""
+            SELECT COUNT(*), AVG(seconds), MIN(seconds), MAX(seconds) FROM (
+                SELECT TIMESTAMPDIFF(MICROSECOND, ({started_at_query}), h.at) / 1000000 AS seconds
+                FROM task_status_history h
+                WHERE h.at >= %s AND h.at < %s AND {condition}{owner_condition}
+            ) AS durations
+            """
+            cursor.execute(query, [start, end] + condition_params + owner_params)
+            count, avg_seconds, min_seconds, max_seconds = cursor.fetchone()
+            cursor.close()
+            return {
+                "count": count,
+                "avg_seconds": None if avg_seconds is None else float(avg_seconds),
+                "min_seconds": None if min_seconds is None else float(min_seconds),
+                "max_seconds": None if max_seconds is None else float(max_seconds),
+            }
+        except Error as e:
+            print(f"Error computing duration statistics: {e}")
+            return None
+        finally:
+            self.db_manager.close()
+    
+    def time_in_status_stats(self, status, start, end):
+        """
+        Statistics of how long tasks stayed in a status, for stays that ended
+        in the window. Each stay is measured from the previous transition of
+        the task, found through the (task_id, at) index.
+        """
+        started_at_query = """
+        SELECT MAX(p.at) FROM task_status_history p WHERE p.task_id = h.task_id AND p.at < h.at
+        """
+        return self._duration_stats(started_at_query, "h.from_status = %s", [status], start, end)
+    
+    def cycle_time_stats(self, start, end):
+        """
+        Statistics of the time from creation to completion, for tasks
+        completed in the window
+        """
+        started_at_query = "SELECT MIN(p.at) FROM task_status_history p WHERE p.task_id = h.task_id"
+        return self._duration_stats(
+            started_at_query, "h.to_status = %s AND h.from_status IS NOT NULL",
+            [TASK_STATE_COMPLETED], start, end
+        )
+    
+    def count_by_status(self):
+        """
+        Returns the number of tasks per status from the counters table
+        
+        Returns:
+            dict: Status to task count, or None on error.
+        """
+        connection = self.db_manager.connect(read_only=True)
+        if not connection:
+            return None
+        
+        try:
+            cursor = connection.cursor()
+            query = "SELECT status, SUM(task_count) FROM task_counters"
+            params = []
+            if self.owner_id is not None:
+                query += " WHERE owner_id = %s"
+                params.append(self.owner_id)
+            cursor.execute(query + " GROUP BY status", params)
+            counts = {status: int(count) for status, count in cursor.fetchall() if count}
+            cursor.close()
+            return counts
+        except Error as e:
+            print(f"Error counting tasks: {e}")
+            return None
+        finally:
+            self.db_manager.close()
+    
+    def rebuild_counters(self):
+        """
+        Recomputes the status counters from the tasks table
+        
+        Returns:
+            dict: The rebuilt status counts, or None on error.
+        """
+        connection = self.db_manager.connect()
+        if not connection:
+            return None
+        
+        try:
+            cursor = connection.cursor()
+            owner_condition, params = self._owner_condition()
+            cursor.execute("DELETE FROM task_counters WHERE TRUE" + owner_condition, params)
+            query = """
+            INSERT INTO task_counters (owner_id, status, slot, task_count)
+            SELECT owner_id, status, 0, COUNT(*) FROM tasks
+            WHERE deleted_at IS NULL{}
+            GROUP BY owner_id, status
+            """
+            cursor.execute(query.format(owner_condition), params)
+            connection.commit()
+            
+            query = "SELECT status, SUM(task_count) FROM task_counters WHERE TRUE{} GROUP BY status"
+            cursor.execute(query.format(owner_condition), params)
+            counts = {status: int(count) for status, count in cursor.fetchall()}
+            cursor.close()
+            return counts
+        except Error as e:
+            print(f"Error rebuilding task counters: {e}")
+            return None
+        finally:
+            self.db_manager.close()
+
+
+class ShardedTaskRepository:
+    """
+    Task repository spread over the shards of a ShardedDatabaseManager.
+    
+    Calls that name a task ID go straight to the shard that owns it. Listings
+    and searches run on every shard in parallel and the per-shard results are
+    merged back into ID (or name) order. With the "owner" strategy an
+    owner-scoped repository only ever touches that owner's shard.
+    """
+    def __init__(self, db_manager, owner_id=None, compress_descriptions=False, notification_bus=None,
+                 tag_index=False):
+        """
+        Initialize a repository per shard.
+        
+        Args:
+            db_manager (ShardedDatabaseManager): Manager of the shards.
+            owner_id (int, optional): Restrict every query and write to this owner's tasks.
+            compress_descriptions (bool): Store long descriptions compressed, see TaskRepository.
+            notification_bus (NotificationBus, optional): Bus every shard publishes its changes to.
+            tag_index (bool): Keep an in-memory tag index per shard, see TaskRepository.
+        """
+        self.db_manager = db_manager
+        self.owner_id = owner_id
+        self.notification_bus = notification_bus
+        self.shards = [
+            TaskRepository(shard, owner_id=owner_id, compress_descriptions=compress_descriptions,
+                           notification_bus=notification_bus, tag_index=tag_index)
+            for shard in db_manager.shards
+        ]
+        self._executor = ThreadPoolExecutor(max_workers=len(self.shards))
+    
+    def _shard_for_id(self, task_id):
+        return self.shards[self.db_manager.shard_for_id(task_id)]
+    
+    def _read_indexes(self):
+        """
+        Returns the indexes of the shards that can hold tasks visible to this repository
+        """
+        if self.owner_id is not None and self.db_manager.strategy == self.db_manager.STRATEGY_OWNER:
+            return [self.db_manager.shard_for_owner(self.owner_id)]
+        return list(range(len(self.shards)))
+    
+    def _shard_for_new_task(self, task):
+        # Every shard repository resolves owners the same way
+        owner_id = self.shards[0]._owner_for(task)
+        return self.db_manager.shard_for_new_task(owner_id, task.idempotency_key)
+    
+    def _scatter(self, method, *args, **kwargs):
+        """
+        Calls a repository method on every readable shard in parallel
+        """
+        shards = [self.shards[index] for index in self._read_indexes()]
+        if len(shards) == 1:
+            return [getattr(shards[0], method)(*args, **kwargs)]
+        futures = [self._executor.submit(getattr(shard, method), *args, **kwargs) for shard in shards]
+        return [future.result() for future in futures]
+    
+    def add(self, task):
+        return self.shards[self._shard_for_new_task(task)].add(task)
+    
+    def add_many(self, tasks):
+        batches = {}
+        for task in tasks:
+            batches.setdefault(self._shard_for_new_task(task), []).append(task)
+        futures = [self._executor.submit(self.shards[index].add_many, batch) for index, batch in batches.items()]
+        return sum(future.result() for future in futures)
+    
+    def apply_operations(self, operations, commit_every=None):
+        """
+        Runs each shard's share of the operations on that shard, in their original order.
+        
+        Without commit_every a shard commits all of its operations or none of them,
+        but shards commit independently: a failure on one shard does not undo the
+        operations another shard committed. Results are in the order of the
+        operations, with None for an operation that was not attempted.
+        """
+        if commit_every is not None and commit_every < 1:
+            raise ValueError(ERROR_INVALID_COMMIT_EVERY.format(commit_every))
+        batches = {}
+        for position, (action, argument) in enumerate(operations):
+            if action == "add":
+                index = self._shard_for_new_task(argument)
+            elif action == "update":
+                index = self.db_manager.shard_for_id(argument[0])
+            else:
+                index = self.db_manager.shard_for_id(argument)
+            positions, shard_operations = batches.setdefault(index, ([], []))
+            positions.append(position)
+            shard_operations.append((action, argument))
+        
+        futures = {
+            index: self._executor.submit(self.shards[index].apply_operations, shard_operations, commit_every)
+            for index, (_, shard_operations) in batches.items()
+        }
+        count = sum(len(positions) for positions, _ in batches.values())
+        results, committed = [None] * count, [False] * count
+        for index, future in futures.items():
+            shard_results, shard_committed = future.result()
+            for position, ok, done in zip(batches[index][0], shard_results, shard_committed):
+                results[position] = ok
+                committed[position] = done
+        return results, committed
+    
+    def get_all(self, filter_status=None, limit=None, fields=None):
+        results = self._scatter("get_all", filter_status, limit=limit, fields=fields)
+        tasks = sorted((task for shard_tasks in results for task in shard_tasks), key=lambda task: task.id)
+        return tasks[:limit] if limit else tasks
+    
+    def fetch_columns(self, columns=("id", "status", "created_at"), filter_status=None,
+                      chunk_size=COLUMNAR_CHUNK_SIZE):
+        # Chunks are streamed shard by shard; each carries its own status_categories
+        for index in self._read_indexes():
+            yield from self.shards[index].fetch_columns(columns, filter_status, chunk_size)
+    
+    def get_by_id(self, task_id, fields=None):
+        return self._shard_for_id(task_id).get_by_id(task_id, fields=fields)
+    
+    def next_tasks(self, n=NEXT_UP_LIMIT, fields=None):
+        results = self._scatter("next_tasks", n, fields=fields)
+        merged = heapq.merge(*results, key=lambda task: task.next_up_key())
+        return list(itertools.islice(merged, n))
+    
+    def get_description(self, task_id):
+        return self._shard_for_id(task_id).get_description(task_id)
+    
+    def search_by_name(self, prefix, filter_status=None, limit=20, fields=None):
+        results = self._scatter("search_by_name", prefix, filter_status, limit=limit, fields=fields)
+        merged = heapq.merge(*results, key=lambda task: (task.name, task.id))
+        return list(itertools.islice(merged, limit))
+    
+    def update_status(self, task_id, new_status):
+        return self._shard_for_id(task_id).update_status(task_id, new_status)
+    
+    def claim(self, n, worker_id, lease_seconds=CLAIM_LEASE_SECONDS):
+        """
+        Claims from the shards in random order until n tasks are claimed
+        """
+        indexes = self._read_indexes()
+        random.shuffle(indexes)
+        tasks = []
+        for index in indexes:
+            if len(tasks) >= n:
+                break
+            tasks.extend(self.shards[index].claim(n - len(tasks), worker_id, lease_seconds))
+        return tasks
+    
+    def bulk_transition(self, filter, new_status, chunk_size=BULK_TRANSITION_CHUNK_SIZE,
+                        pause=BULK_TRANSITION_PAUSE_SECONDS, dry_run=False, progress=None):
+        return sum(
+            shard.bulk_transition(filter, new_status, chunk_size, pause, dry_run, progress)
+            for shard in self.shards
+        )
+    
+    def renew_claim(self, task_id, worker_id, lease_seconds=CLAIM_LEASE_SECONDS):
+        return self._shard_for_id(task_id).renew_claim(task_id, worker_id, lease_seconds)
+    
+    def finish_claim(self, task_id, worker_id, new_status=TASK_STATE_COMPLETED):
+        return self._shard_for_id(task_id).finish_claim(task_id, worker_id, new_status)
+    
+    def requeue_expired_claims(self):
+        return sum(shard.requeue_expired_claims() for shard in self.shards)
+    
+    def delete(self, task_id):
+        return self._shard_for_id(task_id).delete(task_id)
+    
+    def undelete(self, task_id):
+        return self._shard_for_id(task_id).undelete(task_id)
+    
+    def purge_deleted(self, older_than, chunk_size=PURGE_CHUNK_SIZE, pause=PURGE_PAUSE_SECONDS,
+                      max_chunks=None):
+        return sum(shard.purge_deleted(older_than, chunk_size, pause, max_chunks) for shard in self.shards)
+    
+    def changes_since(self, cursor_value=None, fields=None, filter_status=None):
+        """
+        Merged change feed; the cursor holds one position per shard
+        """
+        cursor_value = cursor_value or {}
+        futures = {
+            index: self._executor.submit(self.shards[index].changes_since, cursor_value.get(index),
+                                         fields, filter_status)
+            for index in self._read_indexes()
+        }
+        changes = {"inserted": [], "updated": [], "deleted": [], "cursor": dict(cursor_value)}
+        for index, future in futures.items():
+            shard_changes = future.result()
+            if shard_changes is None:
+                return None
+            changes["inserted"].extend(shard_changes["inserted"])
+            changes["updated"].extend(shard_changes["updated"])
+            changes["deleted"].extend(shard_changes["deleted"])
+            changes["cursor"][index] = shard_changes["cursor"]
+        return changes
+    
+    def tag(self, task_id, *tags):
+        return self._shard_for_id(task_id).tag(task_id, *tags)
+    
+    def untag(self, task_id, *tags):
+        return self._shard_for_id(task_id).untag(task_id, *tags)
+    
+    def get_tags(self, task_id):
+        return self._shard_for_id(task_id).get_tags(task_id)
+    
+    def find_by_tags(self, expression, filter_status=None, limit=None, fields=None):
+        results = self._scatter("find_by_tags", expression, filter_status, limit=limit, fields=fields)
+        merged = heapq.merge(*results, key=lambda task: task.id)
+        return list(itertools.islice(merged, limit)) if limit else list(merged)
+    
+    def get_tag_assignments(self):
+        results = self._scatter("get_tag_assignments")
+        if any(assignments is None for assignments in results):
+            return None
+        return [assignment for assignments in results for assignment in assignments]
+    
+    def status_timeline(self, task_id):
+        return self._shard_for_id(task_id).status_timeline(task_id)
+    
+    @staticmethod
+    def _merge_duration_stats(results):
+        if any(stats is None for stats in results):
+            return None
+        results = [stats for stats in results if stats["count"]]
+        count = sum(stats["count"] for stats in results)
+        if not count:
+            return {"count": 0, "avg_seconds": None, "min_seconds": None, "max_seconds": None}
+        return {
+            "count": count,
+            "avg_seconds": sum(stats["avg_seconds"] * stats["count"] for stats in results) / count,
+            "min_seconds": min(stats["min_seconds"] for stats in results),
+            "max_seconds": max(stats["max_seconds"] for stats in results),
+        }
+    
+    def time_in_status_stats(self, status, start, end):
+        return self._merge_duration_stats(self._scatter("time_in_status_stats", status, start, end))
+    
+    def cycle_time_stats(self, start, end):
+        return self._merge_duration_stats(self._scatter("cycle_time_stats", start, end))
+    
+    def count_by_status(self):
+        results = self._scatter("count_by_status")
+        if any(counts is None for counts in results):
+            return None
+        totals = Counter()
+        for counts in results:
+            totals.update(counts)
+        return dict(totals)
+    
+    def rebuild_counters(self):
+        results = [shard.rebuild_counters() for shard in self.shards]
+        if any(counts is None for counts in results):
+            return None
+        totals = Counter()
+        for counts in results:
+            totals.update(counts)
+        return dict(totals)
+
+
+def create_task_repository(db_manager, **repository_options):
+    """
+    Returns a ShardedTaskRepository for a ShardedDatabaseManager, otherwise a TaskRepository
+
+    Args:
+        db_manager (DatabaseManager or ShardedDatabaseManager): Manager from create_db_manager.
+        **repository_options: owner_id, compress_descriptions and notification_bus.
+    """
+    if hasattr(db_manager, "shards"):
+        return ShardedTaskRepository(db_manager, **repository_options)
+    return TaskRepository(db_manager, **repository_options)
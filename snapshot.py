@@ -0,0 +1,403 @@
+import argparse
+import json
+import re
+import struct
+import sys
+import time
+import zlib
+from array import array
+from datetime import datetime, timedelta
+
+from mysql.connector import Error
+
+from constants import SNAPSHOT_TABLES, SNAPSHOT_CHUNK_SIZE, SNAPSHOT_INSERT_BATCH_SIZE, SNAPSHOT_COMPRESS_LEVEL
+from db_manager import DatabaseManager
+
+# File layout: MAGIC, then frames of (type byte, payload length, CRC32 of the
+# payload) followed by the payload. Each table starts with a TABLE frame
+# (JSON with its columns), followed by CHUNK frames of zlib-compressed
+# column data, and the file ends with an END frame holding the row count
+# per table, so a truncated file is detected too.
+MAGIC = b"TASKSNAP\x01"
+FRAME_HEADER = struct.Struct("<cII")
+FRAME_TABLE = b"T"
+FRAME_CHUNK = b"C"
+FRAME_END = b"E"
+
+# How column values are stored in a chunk, by MySQL data type
+KIND_BY_TYPE = {
+    "tinyint": "int", "smallint": "int", "int": "int", "bigint": "int",
+    "datetime": "datetime", "timestamp": "datetime",
+    "char": "text", "varchar": "text", "text": "text", "mediumtext": "text",
+    "blob": "blob", "mediumblob": "blob",
+}
+
+EPOCH = datetime(1, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+SECONDARY_INDEX_PATTERN = re.compile(r"^(?:UNIQUE |FULLTEXT )?KEY `([^`]+)`")
+
+
+def _to_little_endian(values):
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def encode_chunk(kinds, rows):
+    """
+    Encodes rows column by column: a null bitmap, then int64 values for
+    integers and datetimes (microseconds since year 1) or uint32 lengths
+    followed by the bytes for text and blobs. The result is zlib-compressed.
+    """
+    parts = [struct.pack("<I", len(rows))]
+    for index, kind in enumerate(kinds):
+        values = [row[index] for row in rows]
+        nulls = bytearray((len(rows) + 7) // 8)
+        for position, value in enumerate(values):
+            if value is None:
+                nulls[position >> 3] |= 1 << (position & 7)
+        if kind == "int":
+            data = _to_little_endian(array("q", [0 if value is None else value for value in values])).tobytes()
+        elif kind == "datetime":
+            data = _to_little_endian(array("q", [
+                0 if value is None else (value - EPOCH) // MICROSECOND for value in values
+            ])).tobytes()
+        else:
+            encoded = [
+                b"" if value is None else value.encode("utf-8") if isinstance(value, str) else bytes(value)
+                for value in values
+            ]
+            lengths = _to_little_endian(array("I", [len(value) for value in encoded]))
+            data = lengths.tobytes() + b"".join(encoded)
+        parts.append(bytes(nulls))
+        parts.append(struct.pack("<Q", len(data)))
+        parts.append(data)
+    return zlib.compress(b"".join(parts), SNAPSHOT_COMPRESS_LEVEL)
+
+
+def decode_chunk(kinds, payload):
+    """
+    Returns the rows of a chunk written by encode_chunk as tuples
+    """
+    data = zlib.decompress(payload)
+    (count,), offset = struct.unpack_from("<I", data), 4
+    columns = []
+    for kind in kinds:
+        nulls = data[offset:offset + (count + 7) // 8]
+        offset += len(nulls)
+        (size,) = struct.unpack_from("<Q", data, offset)
+        offset += 8
+        column_data = data[offset:offset + size]
+        offset += size
+        if kind in ("int", "datetime"):
+            values = array("q")
+            values.frombytes(column_data)
+            values = list(_to_little_endian(values))
+            if kind == "datetime":
+                values = [EPOCH + value * MICROSECOND for value in values]
+        else:
+            lengths = array("I")
+            lengths.frombytes(column_data[:count * 4])
+            position = count * 4
+            values = []
+            for length in _to_little_endian(lengths):
+                value = column_data[position:position + length]
+                values.append(value.decode("utf-8") if kind == "text" else bytes(value))
+                position += length
+        for position in range(count):
+            if nulls[position >> 3] & (1 << (position & 7)):
+                values[position] = None
+        columns.append(values)
+    return list(zip(*columns))
+
+
+def _write_frame(output_file, frame_type, payload):
+    output_file.write(FRAME_HEADER.pack(frame_type, len(payload), zlib.crc32(payload)))
+    output_file.write(payload)
+
+
+def read_frames(path):
+    """
+    Yields (frame type, payload) from a snapshot file, checking every checksum
+
+    Raises:
+        ValueError: The file is not a snapshot, is truncated or a frame is corrupt.
+    """
+    with open(path, "rb") as input_file:
+        if input_file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a task snapshot")
+        frame_number = 0
+        while True:
+            header = input_file.read(FRAME_HEADER.size)
+            if not header:
+                raise ValueError(f"Snapshot {path} is truncated")
+            frame_type, length, checksum = FRAME_HEADER.unpack(header)
+            payload = input_file.read(length)
+            frame_number += 1
+            if len(payload) != length:
+                raise ValueError(f"Snapshot {path} is truncated")
+            if zlib.crc32(payload) != checksum:
+                raise ValueError(f"Checksum mismatch in frame {frame_number} of {path}")
+            yield frame_type, payload
+            if frame_type == FRAME_END:
+                return
+
+
+def read_tables(path):
+    """
+    Yields (table, columns, rows) for every chunk of a snapshot file
+    """
+    table = columns = kinds = None
+    row_counts = {}
+    for frame_type, payload in read_frames(path):
+        if frame_type == FRAME_TABLE:
+            header = json.loads(payload)
+            table, columns, kinds = header["table"], header["columns"], header["kinds"]
+            row_counts[table] = 0
+        elif frame_type == FRAME_CHUNK:
+            rows = decode_chunk(kinds, payload)
+            row_counts[table] += len(rows)
+            yield table, columns, rows
+        elif frame_type == FRAME_END:
+            if json.loads(payload)["rows"] != row_counts:
+                raise ValueError(f"Row counts in {path} do not match its chunks")
+
+
+def verify_snapshot(path):
+    """
+    Reads a snapshot end to end without touching the database
+
+    Returns:
+        dict: Row count per table.
+    """
+    row_counts = {}
+    for table, _, rows in read_tables(path):
+        row_counts[table] = row_counts.get(table, 0) + len(rows)
+    return row_counts
+
+
+def _table_columns(cursor, table):
+    """
+    Returns the stored (not generated) columns of a table and their kinds
+    """
+    cursor.execute("""
+    SELECT COLUMN_NAME, DATA_TYPE FROM information_schema.COLUMNS
+    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND GENERATION_EXPRESSION = ''
+    ORDER BY ORDINAL_POSITION
+    """, (table,))
+    columns = cursor.fetchall()
+    return [name for name, _ in columns], [KIND_BY_TYPE[data_type] for _, data_type in columns]
+
+
+def export_snapshot(db_manager, path, chunk_size=SNAPSHOT_CHUNK_SIZE, tables=SNAPSHOT_TABLES, progress=None):
+    """
+    Streams the task tables into a snapshot file from one consistent read view
+
+    Args:
+        db_manager (DatabaseManager): Database to export.
+        path (str): Snapshot file to write.
+        chunk_size (int): Rows per chunk.
+        tables (tuple): Tables to export.
+        progress (callable, optional): Called with (table, rows, seconds) after each table.
+
+    Returns:
+        dict: Row count per table, None on error.
+    """
+    connection = db_manager.connect(read_only=True)
+    if not connection:
+        return None
+
+    try:
+        cursor = connection.cursor()
+        # The full scans run far longer than the cap meant for interactive queries
+        cursor.execute("SET SESSION MAX_EXECUTION_TIME = 0")
+        cursor.execute("SET SESSION TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+        # Every table is read from the same point in time
+        cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+        row_counts = {}
+        with open(path, "wb") as output_file:
+            output_file.write(MAGIC)
+            for table in tables:
+                start = time.perf_counter()
+                columns, kinds = _table_columns(cursor, table)
+                header = {"table": table, "columns": columns, "kinds": kinds}
+                _write_frame(output_file, FRAME_TABLE, json.dumps(header).encode("utf-8"))
+
+                # A full scan returns InnoDB rows in primary key order, which
+                # is also the cheapest order to load them back in
+                cursor.execute(f"SELECT {', '.join(columns)} FROM {table}")
+                row_counts[table] = 0
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    _write_frame(output_file, FRAME_CHUNK, encode_chunk(kinds, rows))
+                    row_counts[table] += len(rows)
+                if progress:
+                    progress(table, row_counts[table], time.perf_counter() - start)
+            _write_frame(output_file, FRAME_END, json.dumps({"rows": row_counts}).encode("utf-8"))
+        connection.commit()
+
+        cursor.close()
+        return row_counts
+    except Error as e:
+        print(f"Error exporting snapshot: {e}")
+        return None
+    finally:
+        db_manager.close()
+
+
+def _secondary_indexes(cursor, table):
+    """
+    Returns the secondary index definitions of a table as (name, definition)
+    """
+    cursor.execute(f"SHOW CREATE TABLE {table}")
+    create_statement = cursor.fetchone()[1]
+    indexes = []
+    for line in create_statement.splitlines():
+        line = line.strip().rstrip(",")
+        match = SECONDARY_INDEX_PATTERN.match(line)
+        if match:
+            indexes.append((match.group(1), line))
+    return indexes
+
+
+def restore_snapshot(db_manager, path, batch_size=SNAPSHOT_INSERT_BATCH_SIZE, verify=True, progress=None):
+    """
+    Loads a snapshot into empty task tables
+
+    Secondary indexes are dropped before the load and built once afterwards,
+    which is much faster than maintaining them row by row. Unique checks are
+    off during the load since the rows come from a database that enforced them.
+
+    Args:
+        db_manager (DatabaseManager): Database to restore into. The tables are
+            created if missing and must be empty.
+        path (str): Snapshot file to read.
+        batch_size (int): Rows per INSERT statement.
+        verify (bool): Check every checksum before loading anything.
+        progress (callable, optional): Called with (phase, rows, seconds) after each table
+            and after the indexes are built.
+
+    Returns:
+        dict: Row count per table, None on error.
+
+    Raises:
+        ValueError: The snapshot is corrupt or truncated.
+    """
+    if verify:
+        verify_snapshot(path)
+    if not db_manager.create_table():
+        return None
+
+    connection = db_manager.connect()
+    if not connection:
+        return None
+
+    dropped = {}
+    try:
+        cursor = connection.cursor()
+        for table in SNAPSHOT_TABLES:
+            cursor.execute(f"SELECT 1 FROM {table} LIMIT 1")
+            if cursor.fetchall():
+                print(f"Error restoring snapshot: table {table} is not empty")
+                return None
+
+        cursor.execute("SET SESSION unique_checks = 0")
+        cursor.execute("SET SESSION foreign_key_checks = 0")
+        row_counts = {}
+        table = start = None
+        for chunk_table, columns, rows in read_tables(path):
+            if chunk_table != table:
+                if table and progress:
+                    progress(table, row_counts[table], time.perf_counter() - start)
+                table, start = chunk_table, time.perf_counter()
+                row_counts[table] = 0
+                indexes = _secondary_indexes(cursor, table)
+                if indexes:
+                    cursor.execute(f"ALTER TABLE {table} " + ", ".join(f"DROP INDEX `{name}`" for name, _ in indexes))
+                    dropped[table] = indexes
+                query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+            for offset in range(0, len(rows), batch_size):
+                cursor.executemany(query, rows[offset:offset + batch_size])
+            connection.commit()
+            row_counts[table] += len(rows)
+        if table and progress:
+            progress(table, row_counts[table], time.perf_counter() - start)
+
+        start = time.perf_counter()
+        _add_indexes(cursor, dropped)
+        if progress:
+            progress("indexes", sum(row_counts.values()), time.perf_counter() - start)
+
+        cursor.close()
+        return row_counts
+    except Error as e:
+        print(f"Error restoring snapshot: {e}")
+        return None
+    finally:
+        if dropped:
+            # Put back the indexes of a load that stopped half way
+            try:
+                _add_indexes(connection.cursor(), dropped)
+            except Error as e:
+                print(f"Error rebuilding indexes: {e}")
+        db_manager.close()
+
+
+def _add_indexes(cursor, dropped):
+    """
+    Builds the dropped indexes, one ALTER TABLE per table
+    """
+    for table, indexes in list(dropped.items()):
+        cursor.execute(f"ALTER TABLE {table} " + ", ".join(f"ADD {definition}" for _, definition in indexes))
+        del dropped[table]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or restore a binary snapshot of the task tables")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="write the task tables to a snapshot file")
+    export_parser.add_argument("path", help="snapshot file to write")
+    export_parser.add_argument("--chunk-size", type=int, default=SNAPSHOT_CHUNK_SIZE, help="rows per chunk")
+
+    restore_parser = subparsers.add_parser("restore", help="load a snapshot file into empty tables")
+    restore_parser.add_argument("path", help="snapshot file to read")
+    restore_parser.add_argument("--batch-size", type=int, default=SNAPSHOT_INSERT_BATCH_SIZE,
+                                help="rows per INSERT")
+    restore_parser.add_argument("--skip-verify", action="store_true",
+                                help="load without checking every checksum first")
+
+    verify_parser = subparsers.add_parser("verify", help="check the checksums of a snapshot file")
+    verify_parser.add_argument("path", help="snapshot file to check")
+    args = parser.parse_args()
+
+    def report(phase, rows, seconds):
+        rate = rows / seconds if seconds else 0
+        print(f"{phase}: {rows} rows in {seconds:.1f}s ({rate:.0f} rows/s)")
+
+    if args.command == "verify":
+        for table, rows in verify_snapshot(args.path).items():
+            print(f"{table}: {rows} rows")
+        return
+
+    from db_config import DB_CONFIG
+
+    if isinstance(DB_CONFIG, (list, tuple)):
+        # Restoring one shard's rows into another would break its ID residue class
+        parser.error("DB_CONFIG lists several shards; snapshots are taken per database, "
+                     "run this with a single shard's configuration")
+    db_manager = DatabaseManager(DB_CONFIG)
+    start = time.perf_counter()
+    if args.command == "export":
+        row_counts = export_snapshot(db_manager, args.path, args.chunk_size, progress=report)
+    else:
+        row_counts = restore_snapshot(db_manager, args.path, args.batch_size,
+                                      verify=not args.skip_verify, progress=report)
+    if row_counts is not None:
+        print(f"Total: {sum(row_counts.values())} rows in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
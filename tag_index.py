@@ -0,0 +1,220 @@
+import threading
+from utils import normalize_tag, tag_groups
+from notifications import EVENT_UPDATED, EVENT_DELETED, EVENT_RESTORED
+
+# Task IDs are split into a chunk number (the high bits) and a position in
+# the chunk's bitmap (the low bits), so a set costs memory per occupied chunk
+# instead of per ID up to the highest one
+CHUNK_BITS = 16
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+
+
+def bitmap_to_ids(bitmap, base=0):
+    """
+    Returns base plus the positions of the set bits of an integer in ascending order
+    """
+    bits = bin(bitmap)[:1:-1]
+    ids = []
+    position = bits.find("1")
+    while position != -1:
+        ids.append(base + position)
+        position = bits.find("1", position + 1)
+    return ids
+
+
+class ChunkedBitmap:
+    """
+    Set of task IDs stored as one bitmap per chunk of 65536 IDs.
+    Operations touch only the chunks that hold IDs, so their cost follows
+    the number and spread of IDs in the set, not the highest ID.
+    """
+    __slots__ = ("chunks",)
+
+    def __init__(self, chunks=None):
+        self.chunks = chunks if chunks is not None else {}
+
+    def add(self, task_id):
+        chunk = task_id >> CHUNK_BITS
+        self.chunks[chunk] = self.chunks.get(chunk, 0) | (1 << (task_id & CHUNK_MASK))
+
+    def discard(self, task_id):
+        chunk = task_id >> CHUNK_BITS
+        bits = self.chunks.get(chunk, 0) & ~(1 << (task_id & CHUNK_MASK))
+        if bits:
+            self.chunks[chunk] = bits
+        else:
+            self.chunks.pop(chunk, None)
+
+    def __or__(self, other):
+        chunks = dict(self.chunks)
+        for chunk, bits in other.chunks.items():
+            chunks[chunk] = chunks.get(chunk, 0) | bits
+        return ChunkedBitmap(chunks)
+
+    def __and__(self, other):
+        smaller, larger = sorted((self.chunks, other.chunks), key=len)
+        chunks = {}
+        for chunk, bits in smaller.items():
+            bits &= larger.get(chunk, 0)
+            if bits:
+                chunks[chunk] = bits
+        return ChunkedBitmap(chunks)
+
+    def __bool__(self):
+        return bool(self.chunks)
+
+    def __len__(self):
+        return sum(bin(bits).count("1") for bits in self.chunks.values())
+
+    def ids(self, limit=None):
+        """
+        Returns the IDs in ascending order, stopping after limit IDs
+        """
+        ids = []
+        for chunk in sorted(self.chunks):
+            ids.extend(bitmap_to_ids(self.chunks[chunk], chunk << CHUNK_BITS))
+            if limit and len(ids) >= limit:
+                return ids[:limit]
+        return ids
+
+
+class TagBitmapIndex:
+    """
+    In-memory bitmap per tag and per status over the tagged tasks.
+    Tag expressions are evaluated with AND and OR over chunked bitmaps
+    instead of one lookup per task.
+
+    A TaskRepository created with tag_index=True keeps its index current
+    with its own tag, untag, status and delete calls and answers
+    find_by_tags from it. Writes made through other repositories or
+    processes are picked up by the next load().
+    """
+    def __init__(self, task_repository):
+        """
+        Initialize the index on top of a task repository.
+
+        Args:
+            task_repository (TaskRepository): Repository the tags are loaded from.
+        """
+        self.task_repository = task_repository
+        self.by_tag = {}
+        self.by_status = {}
+        self.status_of = {}
+        self.tags_of = {}
+        self.loaded = False
+        self._lock = threading.Lock()
+
+    def load(self):
+        """
+        Loads every tag on a live task
+        """
+        assignments = self.task_repository.get_tag_assignments()
+        if assignments is None:
+            return False
+
+        by_tag, by_status, status_of, tags_of = {}, {}, {}, {}
+        for task_id, tag, status in assignments:
+            by_tag.setdefault(tag, ChunkedBitmap()).add(task_id)
+            tags_of.setdefault(task_id, set()).add(tag)
+            if task_id not in status_of:
+                by_status.setdefault(status, ChunkedBitmap()).add(task_id)
+                status_of[task_id] = status
+
+        with self._lock:
+            self.by_tag, self.by_status = by_tag, by_status
+            self.status_of, self.tags_of = status_of, tags_of
+            self.loaded = True
+        return True
+
+    def add(self, task_id, tag, status):
+        """
+        Records a tag added by this client without reloading
+        """
+        tag = normalize_tag(tag)
+        with self._lock:
+            self.by_tag.setdefault(tag, ChunkedBitmap()).add(task_id)
+            self.tags_of.setdefault(task_id, set()).add(tag)
+            self._set_status(task_id, status)
+
+    def remove(self, task_id, tag):
+        """
+        Records a tag removed by this client without reloading
+        """
+        tag = normalize_tag(tag)
+        with self._lock:
+            if tag in self.by_tag:
+                self.by_tag[tag].discard(task_id)
+            self.tags_of.get(task_id, set()).discard(tag)
+
+    def set_status(self, task_id, status):
+        """
+        Records a status change of a tagged task
+        """
+        with self._lock:
+            if task_id in self.status_of:
+                self._set_status(task_id, status)
+
+    def discard(self, task_id):
+        """
+        Drops a deleted task from the bitmaps of its tags and status
+        """
+        with self._lock:
+            for tag in self.tags_of.pop(task_id, ()):
+                self.by_tag[tag].discard(task_id)
+            status = self.status_of.pop(task_id, None)
+            if status is not None:
+                self.by_status[status].discard(task_id)
+
+    def apply_events(self, events):
+        """
+        Applies committed change events of the repository the index belongs to
+        """
+        for event in events:
+            if event["type"] == EVENT_UPDATED:
+                self.set_status(event["id"], event["status"])
+            elif event["type"] == EVENT_DELETED:
+                self.discard(event["id"])
+            elif event["type"] == EVENT_RESTORED:
+                # The tags of a restored task are only in the database
+                self.loaded = False
+
+    def query(self, expression, filter_status=None, limit=None):
+        """
+        Returns the IDs of tasks matching a tag expression, lowest first
+
+        Args:
+            expression (list): Tag expression, see utils.tag_groups.
+            filter_status (tuple, optional): Statuses to include.
+            limit (int, optional): Maximum number of IDs.
+        """
+        groups = tag_groups(expression)
+        with self._lock:
+            group_bitmaps = []
+            for group in groups:
+                bitmap = ChunkedBitmap()
+                for tag in group:
+                    if tag in self.by_tag:
+                        bitmap = bitmap | self.by_tag[tag]
+                group_bitmaps.append(bitmap)
+            # Intersect the bitmaps spread over the fewest chunks first so the result shrinks early
+            group_bitmaps.sort(key=lambda bitmap: len(bitmap.chunks))
+            result = group_bitmaps[0]
+            for bitmap in group_bitmaps[1:]:
+                if not result:
+                    break
+                result = result & bitmap
+            if filter_status:
+                status_bitmap = ChunkedBitmap()
+                for status in filter_status:
+                    if status in self.by_status:
+                        status_bitmap = status_bitmap | self.by_status[status]
+                result = result & status_bitmap
+
+        return result.ids(limit)
+
+    def _set_status(self, task_id, status):
+        previous = self.status_of.get(task_id)
+        if previous is not None:
+            self.by_status[previous].discard(task_id)
+        self.by_status.setdefault(status, ChunkedBitmap()).add(task_id)
+        self.status_of[task_id] = status
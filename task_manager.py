@@ -1,3 +1,5 @@
+import argparse
+import heapq
 import os
 import sys
 
@@ -7,27 +9,87 @@ try:
 except ImportError:
     raise ImportError("Database configuration file (db_config.py) is missing. Please create this file with your database settings.")
 
+# Read replicas are optional
+try:
+    from db_config import DB_REPLICA_CONFIGS
+except ImportError:
+    DB_REPLICA_CONFIGS = None
+
 # Import our modules
 from constants import *
 from utils import get_input_with_exit, get_numeric_input_with_exit, is_exit_command
 from models import Task
-from db_manager import DatabaseManager
-from repository import TaskRepository
+from db_manager import create_db_manager
+from repository import create_task_repository
+from task_view import ActiveTaskView
+from prefetch import Prefetcher
+from notifications import NotificationBus, NotificationServer
+from profiling import install_profiling, profile_dir_from_env
+from tracing import install_tracing, trace_file_from_env, sample_rate_from_env
 
 
 class TaskManager:
     """
     Main application class that handles user interaction
     """
-    def __init__(self, db_config=None):
+    def __init__(self, db_config=None, use_task_view=False, profile_dir=None, owner_id=None,
+                 replica_configs=None, trace_file=None, trace_sample_rate=None, prefetch=False,
+                 notify_socket=None):
         """
         Initialize the Task Manager with an optional database configuration.
         
         Args:
-            db_config (dict, optional): Database configuration dictionary.
+            db_config (dict or list, optional): Database configuration dictionary,
+                or a list of them to spread tasks over several shards.
+            use_task_view (bool): Serve active task listings and lookups from memory.
+            profile_dir (str, optional): Write a profiling report per action to this
+                directory. Defaults to the TASK_MANAGER_PROFILE environment variable.
+            owner_id (int, optional): Owner whose tasks are managed. Defaults to the
+                TASK_MANAGER_OWNER environment variable, then DEFAULT_OWNER_ID.
+            replica_configs (list, optional): Read replicas of the database. Defaults to
+                DB_REPLICA_CONFIGS from db_config.py when db_config is not given.
+            trace_file (str, optional): Append request traces to this JSONL file.
+                Defaults to the TASK_MANAGER_TRACE environment variable.
+            trace_sample_rate (float, optional): Fraction of actions traced. Defaults to
+                the TASK_MANAGER_TRACE_SAMPLE environment variable, then TRACE_SAMPLE_RATE.
+            prefetch (bool): Load the task listings of the next action while the main
+                menu waits for input.
+            notify_socket (str, optional): Publish task changes to subscribers on this
+                Unix socket path, see notifications.listen.
         """
-        self.db_manager = DatabaseManager(db_config if db_config else DB_CONFIG)
-        self.task_repository = TaskRepository(self.db_manager)
+        if owner_id is None:
+            owner_id = int(os.environ.get(OWNER_ENV_VAR, DEFAULT_OWNER_ID))
+        self.owner_id = owner_id
+        if not db_config:
+            db_config = DB_CONFIG
+            replica_configs = replica_configs if replica_configs else DB_REPLICA_CONFIGS
+        self.notification_bus = NotificationBus() if notify_socket else None
+        self.notification_server = (
+            NotificationServer(self.notification_bus, notify_socket) if notify_socket else None
+        )
+        self.db_manager = create_db_manager(db_config, replica_configs=replica_configs)
+        self.task_repository = create_task_repository(
+            self.db_manager, owner_id=owner_id, compress_descriptions=DESCRIPTION_COMPRESSION,
+            notification_bus=self.notification_bus)
+        self.task_view = ActiveTaskView(self.task_repository) if use_task_view else None
+        
+        # Listings read right after a menu choice, looked up at call time so
+        # that profiling and tracing wrappers apply
+        self.listing_loaders = {
+            "counts": lambda: self.task_repository.count_by_status(),
+            "active": lambda: self.get_active_tasks(),
+            "active_picker": lambda: self.get_active_tasks(limit=PICKER_LIMIT, fields=SUMMARY_FIELDS),
+            "all_picker": lambda: self.task_repository.get_all(limit=PICKER_LIMIT, fields=SUMMARY_FIELDS),
+        }
+        self.prefetcher = Prefetcher(self.listing_loaders, self.db_manager) if prefetch else None
+        
+        trace_file = trace_file if trace_file else trace_file_from_env()
+        if trace_sample_rate is None:
+            trace_sample_rate = sample_rate_from_env()
+        self.tracer = install_tracing(self, trace_file, trace_sample_rate) if trace_file else None
+        
+        profile_dir = profile_dir if profile_dir else profile_dir_from_env()
+        self.profiler = install_profiling(self, profile_dir) if profile_dir else None
     
     def setup_database(self):
         """
@@ -36,10 +98,104 @@ class TaskManager:
         self.db_manager.create_database()
         self.db_manager.create_table()
     
+    def get_active_tasks(self, limit=None, fields=None):
+        """
+        Returns tasks that are not started or in progress
+        
+        Args:
+            limit (int, optional): Maximum number of tasks.
+            fields (tuple, optional): Columns to fetch when reading from the database.
+        """
+        if self.task_view and self.task_view.loaded:
+            return self.task_view.list()[:limit]
+        filter_status = (TASK_STATE_NOT_STARTED, TASK_STATE_IN_PROGRESS)
+        return self.task_repository.get_all(filter_status, limit=limit, fields=fields)
+    
+    def get_next_tasks(self, n=NEXT_UP_LIMIT):
+        """
+        Returns the open tasks to work on next, from memory when the task view is loaded
+        """
+        if self.task_view and self.task_view.loaded:
+            return heapq.nsmallest(n, self.task_view.list(), key=lambda task: task.next_up_key())
+        return self.task_repository.next_tasks(n, fields=SUMMARY_FIELDS)
+    
+    def fetch_listing(self, action, key):
+        """
+        Returns one of the listings in listing_loaders, prefetched when possible
+        """
+        if self.prefetcher:
+            return self.prefetcher.get(action, key)
+        return self.listing_loaders[key]()
+    
+    def invalidate_prefetch(self):
+        """
+        Drops prefetched listings after a write
+        """
+        if self.prefetcher:
+            self.prefetcher.invalidate()
+    
+    def find_task(self, task_id):
+        """
+        Looks up a task by ID, from memory when the task view holds it
+        """
+        if self.task_view and self.task_view.loaded:
+            task = self.task_view.get(task_id)
+            if task:
+                return task
+        return self.task_repository.get_by_id(task_id)
+    
+    def print_task_candidates(self, tasks):
+        """
+        Prints a short list of tasks to pick from
+        """
+        print("Available tasks:")
+        for task in tasks:
+            print(f"ID: {task.id} - {task.name} - Status: {task.status}")
+        if len(tasks) >= PICKER_LIMIT:
+            print(UI_PICKER_MORE_TASKS.format(PICKER_LIMIT))
+    
+    def pick_task(self, action, filter_status=None):
+        """
+        Lets the user choose a task by exact ID or by the start of its name.
+        Digits that match no ID are searched as the start of a name.
+        
+        Args:
+            action (str): Verb shown in the prompt, e.g. "update".
+            filter_status (tuple, optional): Statuses offered by the name search.
+            
+        Returns:
+            Task: The chosen task, or None if the user entered exit command
+        """
+        while True:
+            entry = get_input_with_exit(UI_PICKER_PROMPT.format(action))
+            if entry is None:
+                return None
+            
+            if entry.isdigit():
+                task = self.find_task(int(entry))
+                if task:
+                    return task
+                # Not an ID, but names may start with digits too, e.g. "2024 report"
+            
+            if not entry:
+                print(ERROR_PICKER_EMPTY)
+                continue
+            
+            tasks = self.task_repository.search_by_name(
+                entry, filter_status, limit=PICKER_LIMIT, fields=SUMMARY_FIELDS)
+            if not tasks:
+                print(ERROR_TASK_NOT_FOUND if entry.isdigit() else ERROR_NO_MATCHING_TASKS.format(entry))
+            elif len(tasks) == 1:
+                return tasks[0]
+            else:
+                self.print_task_candidates(tasks)
+    
     def main_menu(self):
         """
         Display the main menu with options and return the user's choice.
         """
+        if self.prefetcher:
+            self.prefetcher.start()
         print(f"\n{UI_HEADER_TASK_MANAGER}")
         print("1. Add task")
         print("2. Show tasks")
@@ -114,6 +270,9 @@ class TaskManager:
         # Create and add the task
         task = Task(name=name, description=description, status=status)
         if self.task_repository.add(task):
+            self.invalidate_prefetch()
+            if self.task_view:
+                self.task_view.apply(task)
             print(SUCCESS_TASK_ADDED.format(name, status))
         else:
             print(FAILURE_ADD_TASK)
@@ -125,17 +284,32 @@ class TaskManager:
         print(f"\n{UI_HEADER_TASK_LIST}")
         print(UI_EXIT_MESSAGE)
         
+        counts = self.fetch_listing("show_tasks", "counts")
+        if counts is not None:
+            print(UI_TASK_COUNTS.format(*(counts.get(status, 0) for status in TASK_STATES)))
+        
         print("1. Show active tasks only (Not started and In progress)")
         print("2. Show all tasks including completed ones")
+        print(f"3. Show next up (top {NEXT_UP_LIMIT} by priority and due date)")
         
-        choice = get_numeric_input_with_exit("\nSelect option (1-2): ", 1, 2)
+        choice = get_numeric_input_with_exit("\nSelect option (1-3): ", 1, 3)
         if choice is None:
             return
+        
+        if choice == 3:
+            tasks = self.get_next_tasks()
+            if not tasks:
+                print(ERROR_NO_TASKS)
+                return
+            print(UI_NEXT_UP)
+            for task in tasks:
+                due = f" - Due: {task.due_at}" if task.due_at else ""
+                print(f"ID: {task.id} - {task.name} - Priority: {task.priority}{due} - Status: {task.status}")
+            return
             
         if choice == 1:
             # Get tasks that are not started or in progress
-            filter_status = (TASK_STATE_NOT_STARTED, TASK_STATE_IN_PROGRESS)
-            tasks = self.task_repository.get_all(filter_status)
+            tasks = self.fetch_listing("show_tasks", "active")
         else:
             # Get all tasks including completed ones
             tasks = self.task_repository.get_all()
@@ -155,32 +329,21 @@ class TaskManager:
         print(f"\n{UI_HEADER_UPDATE_TASK}")
         print(UI_EXIT_MESSAGE)
         
-        # Show all tasks that are not completed
-        filter_status = (TASK_STATE_NOT_STARTED, TASK_STATE_IN_PROGRESS)
-        tasks = self.task_repository.get_all(filter_status)
+        # Show a bounded list of tasks that are not completed
+        tasks = self.fetch_listing("update_task", "active_picker")
         
         if not tasks:
             print(ERROR_NO_TASKS_TO_UPDATE)
             return
         
-        print("Available tasks:")
-        for task in tasks:
-            print(f"ID: {task.id} - {task.name} - Status: {task.status}")
+        self.print_task_candidates(tasks)
         
-        # Get task ID to update
-        task_id = get_numeric_input_with_exit(
-            "\nEnter the ID of the task to update: ", 
-            1, 
-            9999  # Arbitrary large number
-        )
-        if task_id is None:
+        # Get task to update
+        filter_status = (TASK_STATE_NOT_STARTED, TASK_STATE_IN_PROGRESS)
+        task = self.pick_task("update", filter_status)
+        if task is None:
             print(UI_CANCEL_MESSAGE.format("Task update"))
             return
-            
-        task = self.task_repository.get_by_id(task_id)
-        if not task:
-            print(ERROR_TASK_NOT_FOUND)
-            return
         
         # Get new status
         print("\nSelect new status:")
@@ -195,7 +358,11 @@ class TaskManager:
         new_status = TASK_STATE_IN_PROGRESS if status_choice == 1 else TASK_STATE_COMPLETED
         
         # Update the task
-        if self.task_repository.update_status(task_id, new_status):
+        if self.task_repository.update_status(task.id, new_status):
+            self.invalidate_prefetch()
+            if self.task_view:
+                task.status = new_status
+                self.task_view.apply(task)
             print(SUCCESS_TASK_UPDATED.format(task.name, new_status))
         else:
             print(FAILURE_UPDATE_TASK)
@@ -207,31 +374,20 @@ class TaskManager:
         print(f"\n{UI_HEADER_DELETE_TASK}")
         print(UI_EXIT_MESSAGE)
         
-        # Show all tasks
-        tasks = self.task_repository.get_all()
+        # Show a bounded list of tasks
+        tasks = self.fetch_listing("delete_task", "all_picker")
         
         if not tasks:
             print(ERROR_NO_TASKS_TO_DELETE)
             return
         
-        print("Available tasks:")
-        for task in tasks:
-            print(f"ID: {task.id} - {task.name} - Status: {task.status}")
+        self.print_task_candidates(tasks)
         
-        # Get task ID to delete
-        task_id = get_numeric_input_with_exit(
-            "\nEnter the ID of the task to delete: ", 
-            1, 
-            9999  # Arbitrary large number
-        )
-        if task_id is None:
+        # Get task to delete
+        task = self.pick_task("delete")
+        if task is None:
             print(UI_CANCEL_MESSAGE.format("Task deletion"))
             return
-            
-        task = self.task_repository.get_by_id(task_id)
-        if not task:
-            print(ERROR_TASK_NOT_FOUND)
-            return
         
         # Confirm deletion
         confirm = get_input_with_exit(f"Are you sure you want to delete task '{task.name}'? (y/n): ")
@@ -240,7 +396,10 @@ class TaskManager:
             return
         
         # Delete the task
-        if self.task_repository.delete(task_id):
+        if self.task_repository.delete(task.id):
+            self.invalidate_prefetch()
+            if self.task_view:
+                self.task_view.remove(task.id)
             print(SUCCESS_TASK_DELETED.format(task.name))
         else:
             print(FAILURE_DELETE_TASK)
@@ -251,6 +410,12 @@ class TaskManager:
         """
         print("Setting up database...")
         self.setup_database()
+        if self.task_view:
+            self.task_view.load()
+            self.task_view.start()
+        if self.notification_server:
+            self.notification_bus.start()
+            self.notification_server.start()
         print(SUCCESS_SETUP_COMPLETE)
         
         while True:
@@ -267,8 +432,39 @@ class TaskManager:
             elif choice == 5:
                 print("Exiting Task Manager. Goodbye!")
                 break
+        
+        if self.task_view:
+            self.task_view.stop()
+        if self.notification_server:
+            self.notification_server.stop()
+            self.notification_bus.stop()
+        if self.prefetcher:
+            self.prefetcher.stop()
+            if self.prefetcher.waits:
+                print(UI_PREFETCH_REPORT)
+                for line in self.prefetcher.report():
+                    print(line)
 
 
 if __name__ == "__main__":
-    task_manager = TaskManager()
+    parser = argparse.ArgumentParser(description="Interactive Task Manager")
+    parser.add_argument("--task-view", action="store_true", help="keep active tasks in memory")
+    parser.add_argument("--profile", action="store_true", help=f"write profiling reports to {PROFILE_DEFAULT_DIR}/")
+    parser.add_argument("--trace", action="store_true", help=f"append request traces to {TRACE_DEFAULT_FILE}")
+    parser.add_argument("--trace-sample", type=float, default=None, help="fraction of actions traced")
+    parser.add_argument("--prefetch", action="store_true", help="load task listings while the menu waits")
+    parser.add_argument("--notify", action="store_true",
+                        help=f"publish task changes on the {NOTIFY_SOCKET_PATH} socket")
+    parser.add_argument("--owner", type=int, default=None, help="ID of the user whose tasks are managed")
+    args = parser.parse_args()
+    
+    task_manager = TaskManager(
+        use_task_view=args.task_view,
+        profile_dir=PROFILE_DEFAULT_DIR if args.profile else None,
+        owner_id=args.owner,
+        trace_file=TRACE_DEFAULT_FILE if args.trace else None,
+        trace_sample_rate=args.trace_sample,
+        prefetch=args.prefetch,
+        notify_socket=NOTIFY_SOCKET_PATH if args.notify else None
+    )
     task_manager.run()
\ No newline at end of file
@@ -0,0 +1,128 @@
+import threading
+from constants import TASK_STATE_NOT_STARTED, TASK_STATE_IN_PROGRESS, TASK_VIEW_REFRESH_SECONDS, SUMMARY_FIELDS
+
+ACTIVE_STATUSES = (TASK_STATE_NOT_STARTED, TASK_STATE_IN_PROGRESS)
+
+
+class ActiveTaskView:
+    """
+    In-memory index of active tasks, keyed by ID and by status
+    """
+    def __init__(self, task_repository, refresh_interval=TASK_VIEW_REFRESH_SECONDS):
+        """
+        Initialize the view on top of a task repository.
+
+        Args:
+            task_repository (TaskRepository): Repository used to load and refresh tasks.
+            refresh_interval (float): Seconds between background refreshes.
+        """
+        self.task_repository = task_repository
+        self.refresh_interval = refresh_interval
+        self.by_id = {}
+        self.by_status = {status: {} for status in ACTIVE_STATUSES}
+        self.cursor = None
+        self.loaded = False
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def load(self):
+        """
+        Loads all active tasks and remembers the change feed cursor.
+        Descriptions are left out and loaded when a task is displayed.
+        """
+        changes = self.task_repository.changes_since(fields=SUMMARY_FIELDS, filter_status=ACTIVE_STATUSES)
+        if changes is None:
+            return False
+
+        with self._lock:
+            self.by_id = {}
+            self.by_status = {status: {} for status in ACTIVE_STATUSES}
+            for task in changes["inserted"] + changes["updated"]:
+                self._put(task)
+            self.cursor = changes["cursor"]
+            self.loaded = True
+        return True
+
+    def refresh(self):
+        """
+        Applies changes made since the last load or refresh
+        """
+        if not self.loaded:
+            return self.load()
+
+        changes = self.task_repository.changes_since(self.cursor, fields=SUMMARY_FIELDS)
+        if changes is None:
+            return False
+
+        with self._lock:
+            for task in changes["inserted"] + changes["updated"]:
+                self._put(task)
+            for task_id in changes["deleted"]:
+                self._discard(task_id)
+            self.cursor = changes["cursor"]
+        return True
+
+    def apply(self, task):
+        """
+        Records a task written by this client without waiting for a refresh
+        """
+        with self._lock:
+            self._put(task)
+
+    def remove(self, task_id):
+        """
+        Drops a task deleted by this client without waiting for a refresh
+        """
+        with self._lock:
+            self._discard(task_id)
+
+    def get(self, task_id):
+        """
+        Returns the active task with the given ID, or None
+        """
+        with self._lock:
+            return self.by_id.get(task_id)
+
+    def list(self, statuses=ACTIVE_STATUSES):
+        """
+        Returns active tasks with the given statuses ordered by ID
+        """
+        with self._lock:
+            tasks = [task for status in statuses for task in self.by_status.get(status, {}).values()]
+        return sorted(tasks, key=lambda task: task.id)
+
+    def start(self):
+        """
+        Starts refreshing the view in a background thread
+        """
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._refresh_loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops the background refresh thread
+        """
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _refresh_loop(self):
+        while not self._stop_event.wait(self.refresh_interval):
+            self.refresh()
+
+    def _put(self, task):
+        self._discard(task.id)
+        if task.status in self.by_status:
+            self.by_id[task.id] = task
+            self.by_status[task.status][task.id] = task
+
+    def _discard(self, task_id):
+        # Statuses may have been changed in place, so check every bucket
+        if self.by_id.pop(task_id, None):
+            for tasks in self.by_status.values():
+                tasks.pop(task_id, None)
@@ -0,0 +1,82 @@
+import argparse
+import random
+import statistics
+import time
+
+from constants import TASK_STATES, TASK_STATE_NOT_STARTED, TASK_STATE_IN_PROGRESS
+from models import Task
+from db_manager import create_db_manager
+from repository import create_task_repository
+
+ACTIVE_STATUSES = (TASK_STATE_NOT_STARTED, TASK_STATE_IN_PROGRESS)
+
+
+def skewed_sizes(tenants, total_tasks, skew):
+    """
+    Splits total_tasks over tenants following a Zipf-like distribution,
+    so a few tenants own most of the tasks and the long tail owns very few
+    """
+    weights = [1 / (rank ** skew) for rank in range(1, tenants + 1)]
+    scale = total_tasks / sum(weights)
+    return [max(1, int(weight * scale)) for weight in weights]
+
+
+def load_tenants(db_config, sizes, first_owner_id, batch_size):
+    """
+    Inserts sizes[i] tasks for owner first_owner_id + i
+    """
+    for index, size in enumerate(sizes):
+        repository = create_task_repository(create_db_manager(db_config), owner_id=first_owner_id + index)
+        for start in range(0, size, batch_size):
+            batch = [
+                Task(name=f"Tenant task {start + offset}", description="Benchmark task",
+                     status=random.choice(TASK_STATES))
+                for offset in range(min(batch_size, size - start))
+            ]
+            repository.add_many(batch)
+
+
+def time_call(func, repeats):
+    """
+    Returns the median wall time of func in milliseconds
+    """
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-tenant query cost with skewed tenant sizes")
+    parser.add_argument("--tenants", type=int, default=1000, help="number of tenants")
+    parser.add_argument("--total-tasks", type=int, default=200000, help="tasks across all tenants")
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of tenant sizes")
+    parser.add_argument("--first-owner-id", type=int, default=100000, help="owner ID of the first tenant")
+    parser.add_argument("--batch-size", type=int, default=1000, help="tasks per INSERT while loading")
+    parser.add_argument("--repeats", type=int, default=20, help="timed runs per query")
+    parser.add_argument("--skip-load", action="store_true", help="reuse tenants from a previous run")
+    args = parser.parse_args()
+
+    from db_config import DB_CONFIG
+
+    sizes = skewed_sizes(args.tenants, args.total_tasks, args.skew)
+    if not args.skip_load:
+        start = time.perf_counter()
+        load_tenants(DB_CONFIG, sizes, args.first_owner_id, args.batch_size)
+        print(f"Loaded {sum(sizes)} tasks for {args.tenants} tenants in {time.perf_counter() - start:.1f}s")
+
+    # Largest, a few in the middle and the smallest tenant
+    ranks = sorted({0, 1, args.tenants // 10, args.tenants // 2, args.tenants - 1})
+    print(f"{'Tenant':>8}{'Tasks':>10}{'Active list ms':>16}{'Counts ms':>12}{'Name search ms':>16}")
+    for rank in ranks:
+        repository = create_task_repository(create_db_manager(DB_CONFIG), owner_id=args.first_owner_id + rank)
+        list_ms = time_call(lambda: repository.get_all(ACTIVE_STATUSES), args.repeats)
+        count_ms = time_call(repository.count_by_status, args.repeats)
+        search_ms = time_call(lambda: repository.search_by_name("Tenant task 1"), args.repeats)
+        print(f"{rank:>8}{sizes[rank]:>10}{list_ms:>16.2f}{count_ms:>12.2f}{search_ms:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
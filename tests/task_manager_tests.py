@@ -1,7 +1,12 @@
 import pytest
 import sys
 import os
-from datetime import datetime
+import stat
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+import time
+import json
+import threading
 import mysql.connector
 from mysql.connector import Error
 from io import StringIO
@@ -10,11 +15,21 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # Import our modules
 from constants import TASK_STATE_NOT_STARTED, TASK_STATE_IN_PROGRESS, TASK_STATE_COMPLETED
-from constants import MAX_NAME_LENGTH, ERROR_NAME_TOO_LONG
-from models import Task
-from db_manager import DatabaseManager
-from repository import TaskRepository
+from constants import MAX_NAME_LENGTH, ERROR_NAME_TOO_LONG, ERROR_TASK_DESC_REQUIRED
+from models import Task, NOT_LOADED
+from db_manager import DatabaseManager, CircuitBreaker, ShardedDatabaseManager, create_db_manager
+from db_manager import is_transient_error
+from repository import TaskRepository, ShardedTaskRepository, create_task_repository
 from task_manager import TaskManager
+from task_view import ActiveTaskView
+from tag_index import TagBitmapIndex
+from load_generator import LoadGenerator, parse_mix, check_database_errors
+from ingest import IngestionPipeline
+from batch_script import run_script
+from snapshot import export_snapshot, restore_snapshot
+from notifications import NotificationBus, NotificationServer, listen
+from profiling import Profiler
+from utils import get_numeric_input_with_exit
 
 # Import test fixtures
 from test_fixtures import (
@@ -22,6 +37,8 @@ from test_fixtures import (
     clean_database,
     db_manager,
     task_repository,
+    shard_configs,
+    CLEANUP_TABLES,
     DB_CONFIG_TEST
 )
 
@@ -575,4 +592,1327 @@ class TestTaskManager:
             # Check output if needed
             if expected_output:
                 sys.stdout = original_stdout
-                assert expected_output.lower() in output.getvalue().lower()        
\ No newline at end of file
+                assert expected_output.lower() in output.getvalue().lower()        
+    # Tests for the change feed
+    def test_changes_since_positive(self, task_repository):
+        """
+        Positive test for fetching inserts, updates and deletes after a cursor
+        """
+        task1 = Task(name="Feed Task 1", description="Will be updated")
+        task2 = Task(name="Feed Task 2", description="Will be deleted")
+        task_repository.add(task1)
+        task_repository.add(task2)
+        
+        # Initial sync returns every task as inserted
+        changes = task_repository.changes_since()
+        assert len(changes["inserted"]) == 2
+        assert changes["deleted"] == []
+        cursor_value = changes["cursor"]
+        assert cursor_value is not None
+        
+        # Nothing changed since the cursor
+        changes = task_repository.changes_since(cursor_value)
+        assert changes["inserted"] == [] and changes["updated"] == []
+        assert changes["cursor"] == cursor_value
+        
+        task_repository.update_status(task1.id, TASK_STATE_IN_PROGRESS)
+        task_repository.delete(task2.id)
+        
+        changes = task_repository.changes_since(cursor_value)
+        assert [task.id for task in changes["updated"]] == [task1.id]
+        assert changes["updated"][0].status == TASK_STATE_IN_PROGRESS
+        assert changes["deleted"] == [task2.id]
+        assert changes["cursor"] > cursor_value
+    
+    def test_changes_since_sees_late_commits(self, task_repository):
+        """
+        Test that a row stamped before the cursor but committed after it is returned once
+        """
+        task_repository.add(Task(name="Feed Task 1", description="Seen first"))
+        cursor_value = task_repository.changes_since()["cursor"]
+        
+        # Stamp the second task as if its transaction wrote it just before the first one's
+        late_task = Task(name="Feed Task 2", description="Committed late")
+        task_repository.add(late_task)
+        conn = mysql.connector.connect(**DB_CONFIG_TEST)
+        cursor = conn.cursor()
+        cursor.execute("UPDATE tasks SET updated_at = %s WHERE id = %s",
+                       (cursor_value[0] - timedelta(seconds=1), late_task.id))
+        conn.commit()
+        cursor.close()
+        conn.close()
+        
+        changes = task_repository.changes_since(cursor_value)
+        assert [task.id for task in changes["inserted"]] == [late_task.id]
+        assert changes["updated"] == []
+        
+        changes = task_repository.changes_since(changes["cursor"])
+        assert changes["inserted"] == [] and changes["updated"] == []
+    
+    def test_changes_since_negative(self, task_repository, monkeypatch):
+        """
+        Negative test for the change feed - simulate database error
+        """
+        monkeypatch.setattr(task_repository.db_manager, "connect", lambda *args, **kwargs: None)
+        
+        assert task_repository.changes_since() is None
+    
+    # Tests for the in-memory active task view
+    def test_task_view_serves_active_tasks(self, monkeypatch):
+        """
+        Test that the task view answers listings and lookups without the database
+        """
+        task_manager = TaskManager(DB_CONFIG_TEST, use_task_view=True)
+        repo = task_manager.task_repository
+        
+        task1 = Task(name="View Task 1", description="Active", status=TASK_STATE_NOT_STARTED)
+        task2 = Task(name="View Task 2", description="Done", status=TASK_STATE_COMPLETED)
+        repo.add(task1)
+        repo.add(task2)
+        
+        assert task_manager.task_view.load()
+        
+        # Any repository read would now fail the test
+        def fail_get_all(*args, **kwargs):
+            raise AssertionError("get_all should not be called")
+        monkeypatch.setattr(repo, "get_all", fail_get_all)
+        
+        active_tasks = task_manager.get_active_tasks()
+        assert [task.id for task in active_tasks] == [task1.id]
+        assert task_manager.find_task(task1.id).name == "View Task 1"
+    
+    def test_task_view_refresh(self, task_repository):
+        """
+        Test that a refresh applies updates and deletes made by other clients
+        """
+        task1 = Task(name="Refresh Task 1", description="Will complete")
+        task2 = Task(name="Refresh Task 2", description="Will be deleted")
+        task_repository.add(task1)
+        task_repository.add(task2)
+        
+        task_view = ActiveTaskView(task_repository)
+        assert task_view.load()
+        assert len(task_view.list()) == 2
+        
+        task_repository.update_status(task1.id, TASK_STATE_COMPLETED)
+        task_repository.delete(task2.id)
+        task3 = Task(name="Refresh Task 3", description="New", status=TASK_STATE_IN_PROGRESS)
+        task_repository.add(task3)
+        
+        assert task_view.refresh()
+        assert [task.id for task in task_view.list()] == [task3.id]
+        assert task_view.list((TASK_STATE_NOT_STARTED,)) == []
+    
+    # Tests for the load generator
+    def test_load_generator_report(self):
+        """
+        Test that a short load run reports every operation in the mix
+        """
+        generator = LoadGenerator(
+            DB_CONFIG_TEST,
+            clients=2,
+            duration=1,
+            mix="add=1,get_all=1,get_by_id=1,update_status=1,delete=1",
+            seed_tasks=5
+        )
+        report = generator.run()
+        
+        assert report["total_operations"] > 0
+        assert set(report["operations"]) == {"add", "get_all", "get_by_id", "update_status", "delete"}
+        for stats in report["operations"].values():
+            if stats["count"]:
+                assert stats["p50_ms"] <= stats["p95_ms"] <= stats["p99_ms"]
+                assert stats["error_rate"] == 0
+    
+    def test_load_generator_flags_database_errors(self, task_repository):
+        """
+        Test that a failed statement is flagged even though the repository swallows it
+        """
+        errors = check_database_errors(task_repository.db_manager)
+        assert task_repository.get_by_id(999999) is None
+        assert errors.failed == False
+        
+        cursor = task_repository.db_manager.connect().cursor()
+        with pytest.raises(mysql.connector.Error):
+            cursor.execute("SELECT * FROM no_such_table")
+        task_repository.db_manager.close()
+        assert errors.failed == True
+    
+    def test_load_generator_invalid_mix(self):
+        """
+        Negative test for the load generator - unknown operation in the mix
+        """
+        with pytest.raises(ValueError):
+            parse_mix("add=1,truncate=5")
+    
+    # Tests for fail-fast connection handling
+    def test_circuit_breaker_fails_fast(self, monkeypatch):
+        """
+        Test that an open circuit skips the driver until the reset timeout passes
+        """
+        attempts = []
+        
+        def failing_connect(**kwargs):
+            attempts.append(kwargs)
+            raise Error(msg="Can't connect", errno=2003)
+        
+        monkeypatch.setattr(mysql.connector, "connect", failing_connect)
+        monkeypatch.setattr("db_manager.DB_RETRY_BASE_DELAY", 0)
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        db_manager = DatabaseManager(DB_CONFIG_TEST, retries=1, circuit_breaker=breaker)
+        
+        # Each call retries once on the transient error, the second call opens the circuit
+        assert db_manager.connect() is None
+        assert db_manager.connect() is None
+        assert len(attempts) == 4
+        assert breaker.state == CircuitBreaker.OPEN
+        assert attempts[0]["connection_timeout"] == db_manager.connect_timeout
+        
+        # While open, calls fail without touching the driver
+        assert db_manager.connect() is None
+        assert len(attempts) == 4
+        
+        # After the reset timeout a single probe is allowed through
+        breaker.opened_at -= 60
+        assert breaker.allow_request()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert not breaker.allow_request()
+    
+    def test_health_check_closes_circuit(self):
+        """
+        Test that a successful health probe resumes normal connections
+        """
+        breaker = CircuitBreaker(failure_threshold=1)
+        breaker.record_failure()
+        db_manager = DatabaseManager(DB_CONFIG_TEST, circuit_breaker=breaker)
+        assert db_manager.connect() is None
+        
+        assert db_manager.health_check()
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert db_manager.connect() is not None
+        db_manager.close()
+    
+    def test_dedicated_connection_reports_to_circuit(self, monkeypatch):
+        """
+        Test that a dedicated connection probing an open circuit reports its outcome
+        """
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+        db_manager = DatabaseManager(DB_CONFIG_TEST, circuit_breaker=breaker)
+        real_connect = mysql.connector.connect
+        
+        def failing_connect(**kwargs):
+            raise Error(msg="Can't connect", errno=2003)
+        
+        monkeypatch.setattr(mysql.connector, "connect", failing_connect)
+        breaker.record_failure()
+        breaker.opened_at -= 60
+        assert db_manager.open_dedicated() is None
+        assert breaker.state == CircuitBreaker.OPEN
+        
+        monkeypatch.setattr(mysql.connector, "connect", real_connect)
+        breaker.opened_at -= 60
+        connection = db_manager.open_dedicated()
+        assert connection is not None
+        connection.close()
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert db_manager.connect() is not None
+        db_manager.close()
+    
+    def test_session_variables_set_when_opened(self):
+        """
+        Test that session variables arrive in one statement and only connect errors are retried
+        """
+        db_manager = DatabaseManager(DB_CONFIG_TEST, max_execution_time_ms=1234,
+                                     session_variables={"auto_increment_increment": 3})
+        cursor = db_manager.connect().cursor()
+        cursor.execute("SELECT @@SESSION.auto_increment_increment, @@SESSION.MAX_EXECUTION_TIME")
+        assert cursor.fetchone() == (3, 1234)
+        db_manager.close()
+        
+        connection = db_manager.open_dedicated()
+        cursor = connection.cursor()
+        cursor.execute("SELECT @@SESSION.auto_increment_increment, @@SESSION.MAX_EXECUTION_TIME")
+        assert cursor.fetchone() == (3, 0)
+        connection.close()
+        
+        assert is_transient_error(Error(msg="Can't connect", errno=2003))
+        assert not is_transient_error(Error(msg="Deadlock found", errno=1213))
+    
+    # Tests for bulk ingestion
+    def test_add_many_positive(self, task_repository):
+        """
+        Positive test for inserting several tasks in one statement
+        """
+        tasks = [Task(name=f"Bulk Task {i}", description="Bulk") for i in range(5)]
+        
+        assert task_repository.add_many(tasks) == 5
+        assert len(task_repository.get_all()) == 5
+    
+    def test_ingestion_pipeline(self, tmp_path):
+        """
+        Test that the pipeline loads valid records and rejects invalid ones
+        """
+        dump = tmp_path / "tasks.jsonl"
+        lines = [
+            '{"name": "Ingested 1", "description": "First", "status": "In progress"}',
+            '{"name": "Ingested 2", "description": "Second"}',
+            '{"name": "", "description": "Missing name"}',
+            '{"name": "Bad status", "description": "Invalid", "status": "Paused"}',
+            'not json',
+            '{"name": 42, "description": "Name is not text"}',
+            '{"name": "Bad description", "description": ["Not", "text"]}',
+        ]
+        dump.write_text("\n".join(lines))
+        
+        pipeline = IngestionPipeline(DB_CONFIG_TEST, workers=2, writers=2, batch_size=2)
+        summary = pipeline.run(str(dump))
+        
+        assert summary["read"] == 7
+        assert summary["inserted"] == 2
+        assert summary["rejected"] == 5
+        repo = TaskRepository(DatabaseManager(DB_CONFIG_TEST))
+        assert sorted(task.name for task in repo.get_all()) == ["Ingested 1", "Ingested 2"]
+    
+    # Tests for the task picker
+    def test_search_by_name_prefix(self, task_repository):
+        """
+        Test that the name search matches prefixes literally and respects the limit
+        """
+        for name in ["Deploy backend", "Deploy frontend", "Design review", "100% coverage"]:
+            task_repository.add(Task(name=name, description="Search test"))
+        
+        tasks = task_repository.search_by_name("Deploy")
+        assert [task.name for task in tasks] == ["Deploy backend", "Deploy frontend"]
+        assert len(task_repository.search_by_name("De", limit=1)) == 1
+        assert [task.name for task in task_repository.search_by_name("100%")] == ["100% coverage"]
+        assert task_repository.search_by_name("1_0") == []
+    
+    def test_update_task_by_name_prefix(self, monkeypatch):
+        """
+        Test that update_task can pick a task by typing the start of its name
+        """
+        task_manager = TaskManager(DB_CONFIG_TEST)
+        repo = task_manager.task_repository
+        task = Task(name="Unique picker task", description="Picked by name")
+        repo.add(task)
+        repo.add(Task(name="Other task", description="Not picked"))
+        
+        input_iterator = iter(["Unique", "2"])
+        monkeypatch.setattr('builtins.input', lambda prompt: next(input_iterator))
+        
+        task_manager.update_task()
+        
+        assert repo.get_by_id(task.id).status == TASK_STATE_COMPLETED
+    
+    def test_pick_task_by_numeric_name_prefix(self, monkeypatch):
+        """
+        Test that digits matching no task ID are searched as the start of a name
+        """
+        task_manager = TaskManager(DB_CONFIG_TEST)
+        task = Task(name="2024 report", description="Starts with digits")
+        task_manager.task_repository.add(task)
+        
+        input_iterator = iter(["2024"])
+        monkeypatch.setattr('builtins.input', lambda prompt: next(input_iterator))
+        
+        assert task_manager.pick_task("update").id == task.id
+    
+    def test_numeric_input_without_upper_limit(self, monkeypatch):
+        """
+        Test that IDs above the old 9999 cap are accepted when no maximum is given
+        """
+        input_iterator = iter(["0", "123456789"])
+        monkeypatch.setattr('builtins.input', lambda prompt: next(input_iterator))
+        
+        assert get_numeric_input_with_exit("ID: ", 1) == 123456789
+    
+    # Tests for profiling hooks
+    def test_profiling_writes_reports(self, tmp_path, monkeypatch):
+        """
+        Test that each profiled action writes one report covering nested repository calls
+        """
+        task_manager = TaskManager(DB_CONFIG_TEST, profile_dir=str(tmp_path))
+        task_manager.task_repository.add(Task(name="Profiled Task", description="Profiled"))
+        
+        monkeypatch.setattr('builtins.input', lambda _: '1')
+        task_manager.show_tasks()
+        
+        reports = sorted(path.name for path in tmp_path.glob("*.txt"))
+        assert len(reports) == 2
+        assert reports[0].endswith("repository.add.txt")
+        assert reports[1].endswith("show_tasks.txt")
+        content = (tmp_path / reports[1]).read_text()
+        assert "Time in database driver" in content
+        assert "Allocation peak" in content
+    
+    def test_profiling_covers_repository_and_logs_skips(self, tmp_path, capsys):
+        """
+        Test that every public repository method is profiled and overlapping calls are recorded
+        """
+        task_manager = TaskManager(DB_CONFIG_TEST, profile_dir=str(tmp_path))
+        assert hasattr(task_manager.task_repository.apply_operations, "__wrapped__")
+        assert hasattr(task_manager.task_repository.claim, "__wrapped__")
+        
+        profiler = Profiler(str(tmp_path))
+        background_call = profiler.wrap(lambda: "done", "repository.get_all")
+        profiler._lock.acquire()
+        try:
+            assert background_call() == "done"
+        finally:
+            profiler._lock.release()
+        assert profiler.skipped == ["repository.get_all"]
+        assert "repository.get_all" in (tmp_path / "skipped.log").read_text()
+        assert capsys.readouterr().out == ""
+    
+    def test_profiling_disabled_by_default(self, monkeypatch):
+        """
+        Test that profiling is off unless requested
+        """
+        monkeypatch.delenv("TASK_MANAGER_PROFILE", raising=False)
+        task_manager = TaskManager(DB_CONFIG_TEST)
+        assert task_manager.profiler is None
+    
+    # Tests for prefetching
+    def test_prefetch_serves_listing(self, monkeypatch):
+        """
+        Test that a listing prefetched during the menu is served without a query
+        """
+        task_manager = TaskManager(DB_CONFIG_TEST, prefetch=True)
+        task_manager.task_repository.add(Task(name="Prefetched Task", description="Prefetch"))
+        task_manager.prefetcher.start()
+        task_manager.prefetcher.wait()
+        
+        monkeypatch.setattr(task_manager.task_repository, "get_all",
+                            lambda *args, **kwargs: pytest.fail("listing was not prefetched"))
+        tasks = task_manager.fetch_listing("update_task", "active_picker")
+        
+        assert [task.name for task in tasks] == ["Prefetched Task"]
+        assert task_manager.prefetcher.waits["update_task"][0][1] is True
+        task_manager.prefetcher.stop()
+    
+    def test_prefetch_invalidated_by_write(self, monkeypatch):
+        """
+        Test that a write through the menu drops prefetched listings
+        """
+        task_manager = TaskManager(DB_CONFIG_TEST, prefetch=True)
+        task_manager.prefetcher.start()
+        task_manager.prefetcher.wait()
+        
+        inputs = iter(["New Task", "Written after prefetch", ""])
+        monkeypatch.setattr('builtins.input', lambda _: next(inputs))
+        task_manager.add_task()
+        tasks = task_manager.fetch_listing("delete_task", "all_picker")
+        
+        assert [task.name for task in tasks] == ["New Task"]
+        assert task_manager.prefetcher.waits["delete_task"][0][1] is False
+        task_manager.prefetcher.stop()
+    
+    def test_prefetch_recovers_after_outage(self, monkeypatch):
+        """
+        Test that warming during an outage leaves the circuit able to close again
+        """
+        task_manager = TaskManager(DB_CONFIG_TEST, prefetch=True)
+        db_manager = task_manager.db_manager
+        breaker = db_manager.circuit_breaker
+        real_connect = mysql.connector.connect
+        
+        def failing_connect(**kwargs):
+            raise Error(msg="Can't connect", errno=2003)
+        
+        # The reset timeout has passed and the warm-up is the probe that fails
+        monkeypatch.setattr(mysql.connector, "connect", failing_connect)
+        breaker.state = CircuitBreaker.OPEN
+        breaker.opened_at = time.monotonic() - breaker.reset_timeout
+        assert not db_manager.warm()
+        assert breaker.state == CircuitBreaker.OPEN
+        
+        # Once the database is back the next probe closes the circuit
+        monkeypatch.setattr(mysql.connector, "connect", real_connect)
+        breaker.opened_at -= breaker.reset_timeout
+        task_manager.prefetcher.start()
+        task_manager.prefetcher.wait()
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert task_manager.fetch_listing("delete_task", "all_picker") is not None
+        assert db_manager.connect() is not None
+        db_manager.close()
+        task_manager.prefetcher.stop()
+    
+    # Tests for request tracing
+    def test_tracing_exports_nested_spans(self, tmp_path, monkeypatch):
+        """
+        Test that an action is exported as one trace from the menu down to the SQL
+        """
+        trace_file = tmp_path / "traces.jsonl"
+        task_manager = TaskManager(DB_CONFIG_TEST, trace_file=str(trace_file), trace_sample_rate=1.0)
+        task_manager.task_repository.add(Task(name="Traced Task", description="Traced"))
+        
+        monkeypatch.setattr('builtins.input', lambda _: '1')
+        task_manager.show_tasks()
+        
+        traces = [json.loads(line) for line in trace_file.read_text().splitlines()]
+        assert len(traces) == 2
+        spans = traces[1]["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        by_name = {span["name"]: span for span in spans}
+        root = by_name["task_manager.show_tasks"]
+        assert root["parentSpanId"] == ""
+        assert by_name["repository.get_all"]["parentSpanId"] == root["spanId"]
+        assert by_name["db.connect"]["parentSpanId"] == by_name["repository.get_all"]["spanId"]
+        assert by_name["repository.hydrate"]["parentSpanId"] == by_name["repository.get_all"]["spanId"]
+        assert len({span["traceId"] for span in spans}) == 1
+        query = by_name["db.query"]
+        statement = [a["value"]["stringValue"] for a in query["attributes"] if a["key"] == "db.statement"]
+        assert statement[0].startswith("SELECT")
+        assert "(...)" in statement[0]
+    
+    def test_tracing_unsampled_requests_not_exported(self, tmp_path):
+        """
+        Test that requests outside the sample leave no trace
+        """
+        trace_file = tmp_path / "traces.jsonl"
+        task_manager = TaskManager(DB_CONFIG_TEST, trace_file=str(trace_file), trace_sample_rate=0.0)
+        task_manager.task_repository.add(Task(name="Untraced Task", description="Untraced"))
+        task_manager.task_repository.get_all()
+        
+        assert not trace_file.exists()
+    
+    def test_tracing_covers_every_repository_method(self, tmp_path):
+        """
+        Test that repository methods missing from the old hand-kept list start traces too
+        """
+        trace_file = tmp_path / "traces.jsonl"
+        task_manager = TaskManager(DB_CONFIG_TEST, trace_file=str(trace_file), trace_sample_rate=1.0)
+        task_manager.task_repository.claim(1, "tracing-worker")
+        
+        traces = [json.loads(line) for line in trace_file.read_text().splitlines()]
+        spans = traces[0]["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        assert spans[-1]["name"] == "repository.claim"
+    
+    # Tests for columnar fetch
+    def test_fetch_columns_chunks(self, task_repository):
+        """
+        Test that columns stream in chunks with dictionary-encoded statuses
+        """
+        statuses = [TASK_STATE_NOT_STARTED, TASK_STATE_COMPLETED, TASK_STATE_NOT_STARTED,
+                    TASK_STATE_IN_PROGRESS, TASK_STATE_COMPLETED]
+        for index, status in enumerate(statuses):
+            task_repository.add(Task(name=f"Column Task {index}", description="Columnar", status=status))
+        
+        chunks = list(task_repository.fetch_columns(("id", "status"), chunk_size=2))
+        
+        assert [len(chunk["id"]) for chunk in chunks] == [2, 2, 1]
+        categories = chunks[-1]["status_categories"]
+        decoded = [categories[code] for chunk in chunks for code in chunk["status"]]
+        assert decoded == statuses
+        ids = [int(task_id) for chunk in chunks for task_id in chunk["id"]]
+        assert ids == sorted(ids)
+    
+    def test_fetch_columns_survives_other_calls(self, task_repository):
+        """
+        Test that repository calls between chunks do not end the stream
+        """
+        for index in range(5):
+            task_repository.add(Task(name=f"Column Task {index}", description="Columnar"))
+        
+        ids = []
+        for chunk in task_repository.fetch_columns(("id",), chunk_size=2):
+            ids.extend(int(task_id) for task_id in chunk["id"])
+            task_repository.count_by_status()
+        
+        assert len(ids) == 5
+    
+    def test_fetch_columns_unknown_column(self, task_repository):
+        """
+        Negative test for columnar fetch - column outside the allowed list
+        """
+        with pytest.raises(ValueError):
+            list(task_repository.fetch_columns(("id", "password")))
+    
+    # Tests for status counters
+    def test_counters_follow_writes(self, task_repository):
+        """
+        Test that add, add_many, update_status and delete keep the counters exact
+        """
+        task1 = Task(name="Counter Task 1", description="Counted")
+        task2 = Task(name="Counter Task 2", description="Counted", status=TASK_STATE_IN_PROGRESS)
+        task_repository.add(task1)
+        task_repository.add(task2)
+        task_repository.add_many([
+            Task(name="Counter Task 3", description="Counted", status=TASK_STATE_COMPLETED),
+            Task(name="Counter Task 4", description="Counted", status=TASK_STATE_COMPLETED),
+        ])
+        
+        task_repository.update_status(task1.id, TASK_STATE_IN_PROGRESS)
+        # Setting the same status again must not move the counters
+        task_repository.update_status(task1.id, TASK_STATE_IN_PROGRESS)
+        task_repository.delete(task2.id)
+        
+        assert task_repository.count_by_status() == {
+            TASK_STATE_IN_PROGRESS: 1,
+            TASK_STATE_COMPLETED: 2,
+        }
+    
+    def test_rebuild_counters(self, task_repository):
+        """
+        Test that the reconciliation rebuilds drifted counters from the tasks table
+        """
+        task_repository.add(Task(name="Rebuild Task", description="Counted"))
+        
+        conn = mysql.connector.connect(**DB_CONFIG_TEST)
+        cursor = conn.cursor()
+        cursor.execute("UPDATE task_counters SET task_count = 42")
+        conn.commit()
+        cursor.close()
+        conn.close()
+        
+        assert task_repository.rebuild_counters() == {TASK_STATE_NOT_STARTED: 1}
+        assert task_repository.count_by_status() == {TASK_STATE_NOT_STARTED: 1}
+    
+    # Tests for soft delete
+    def test_soft_delete_and_undelete(self, task_repository):
+        """
+        Test that a deleted task disappears from reads and can be restored
+        """
+        task = Task(name="Soft Delete Task", description="Restorable", status=TASK_STATE_IN_PROGRESS)
+        task_repository.add(task)
+        
+        assert task_repository.delete(task.id)
+        assert task_repository.get_by_id(task.id) is None
+        assert task_repository.get_all() == []
+        assert task_repository.search_by_name("Soft") == []
+        assert task_repository.update_status(task.id, TASK_STATE_COMPLETED) == False
+        assert task_repository.count_by_status() == {}
+        
+        assert task_repository.undelete(task.id)
+        restored = task_repository.get_by_id(task.id)
+        assert restored is not None
+        assert restored.status == TASK_STATE_IN_PROGRESS
+        assert task_repository.count_by_status() == {TASK_STATE_IN_PROGRESS: 1}
+        
+        # Restoring a live task is a no-op
+        assert task_repository.undelete(task.id) == False
+    
+    def test_purge_deleted_in_chunks(self, task_repository):
+        """
+        Test that the purge removes only old tombstoned rows and their tombstones, chunk by chunk
+        """
+        tasks = [Task(name=f"Purge Task {i}", description="Purged") for i in range(5)]
+        for task in tasks:
+            task_repository.add(task)
+        for task in tasks[:4]:
+            task_repository.delete(task.id)
+        
+        # Nothing was deleted before yesterday
+        assert task_repository.purge_deleted(datetime.now() - timedelta(days=1)) == 0
+        
+        purged = task_repository.purge_deleted(datetime.now() + timedelta(seconds=1), chunk_size=3, pause=0)
+        assert purged == 4
+        assert task_repository.undelete(tasks[0].id) == False
+        assert [task.id for task in task_repository.get_all()] == [tasks[4].id]
+        
+        # Their tombstones went with them
+        assert task_repository.changes_since()["deleted"] == []
+    
+    # Tests for task ownership
+    def test_owner_scoped_repository(self, db_manager):
+        """
+        Test that a repository scoped to one owner never sees or changes other owners' tasks
+        """
+        alice = TaskRepository(db_manager, owner_id=1)
+        bob = TaskRepository(db_manager, owner_id=2)
+        
+        alice_task = Task(name="Alice task", description="Owned by 1")
+        bob_task = Task(name="Bob task", description="Owned by 2", owner_id=1)
+        alice.add(alice_task)
+        bob.add(bob_task)
+        
+        # The repository's owner wins over the task's own owner_id
+        assert bob_task.owner_id == 2
+        assert [task.id for task in alice.get_all()] == [alice_task.id]
+        assert bob.get_by_id(alice_task.id) is None
+        assert bob.search_by_name("Alice") == []
+        assert bob.update_status(alice_task.id, TASK_STATE_COMPLETED) == False
+        assert bob.delete(alice_task.id) == False
+        assert alice.count_by_status() == {TASK_STATE_NOT_STARTED: 1}
+        assert [task.id for task in bob.changes_since()["inserted"]] == [bob_task.id]
+    
+    def test_task_manager_owner(self, monkeypatch):
+        """
+        Test that TaskManager scopes its repository to the configured owner
+        """
+        monkeypatch.setenv("TASK_MANAGER_OWNER", "5")
+        assert TaskManager(DB_CONFIG_TEST).task_repository.owner_id == 5
+        assert TaskManager(DB_CONFIG_TEST, owner_id=9).task_repository.owner_id == 9
+    
+    # Tests for sharding
+    def test_sharded_repository_routing(self, shard_configs):
+        """
+        Test that sharded IDs are unique and lookups and listings span shards
+        """
+        manager = ShardedDatabaseManager(shard_configs, strategy=ShardedDatabaseManager.STRATEGY_ID)
+        repo = ShardedTaskRepository(manager)
+        
+        tasks = [Task(name=f"Shard Task {i}", description="Sharded") for i in range(6)]
+        for task in tasks:
+            assert repo.add(task)
+        
+        ids = [task.id for task in tasks]
+        assert len(set(ids)) == 6
+        # Round-robin placement puts tasks on both shards, IDs tell them apart
+        assert {manager.shard_for_id(task_id) for task_id in ids} == {0, 1}
+        
+        assert [task.id for task in repo.get_all()] == sorted(ids)
+        assert [task.id for task in repo.get_all(limit=4)] == sorted(ids)[:4]
+        assert repo.get_by_id(tasks[3].id).name == "Shard Task 3"
+        assert repo.update_status(tasks[3].id, TASK_STATE_COMPLETED)
+        assert repo.delete(tasks[4].id)
+        assert len(repo.search_by_name("Shard Task", limit=10)) == 5
+        assert repo.count_by_status() == {TASK_STATE_NOT_STARTED: 4, TASK_STATE_COMPLETED: 1}
+    
+    def test_sharded_repository_owner_affinity(self, shard_configs):
+        """
+        Test that with the owner strategy an owner's tasks live on a single shard
+        """
+        manager = ShardedDatabaseManager(shard_configs)
+        owner_repo = ShardedTaskRepository(manager, owner_id=42)
+        for i in range(4):
+            owner_repo.add(Task(name=f"Owner Task {i}", description="Sharded"))
+        
+        shard_index = manager.shard_for_owner(42)
+        tasks = owner_repo.get_all()
+        assert len(tasks) == 4
+        assert {manager.shard_for_id(task.id) for task in tasks} == {shard_index}
+        assert ShardedTaskRepository(manager, owner_id=43).get_all() == []
+    
+    def test_factories_follow_db_config(self, shard_configs):
+        """
+        Test that the script factories build sharded managers and repositories for a shard list
+        """
+        manager = create_db_manager(shard_configs, replica_configs=[[shard_configs[1]]])
+        assert isinstance(manager, ShardedDatabaseManager)
+        assert manager.shards[0].replicas is not None and manager.shards[1].replicas is None
+        assert manager.health_check()
+        assert isinstance(create_task_repository(manager, owner_id=7), ShardedTaskRepository)
+        
+        manager = create_db_manager(DB_CONFIG_TEST)
+        assert isinstance(manager, DatabaseManager)
+        assert isinstance(create_task_repository(manager), TaskRepository)
+        
+    # Tests for read replicas
+    def test_replica_reads_after_write_window(self, shard_configs):
+        """
+        Test that reads go to a replica, except right after this session wrote
+        """
+        # An empty stand-in database plays the replica, so replica reads see no tasks
+        db_manager = DatabaseManager(DB_CONFIG_TEST, replica_configs=[shard_configs[0]])
+        repo = TaskRepository(db_manager)
+        task = Task(name="Replica Task", description="Written to primary")
+        repo.add(task)
+        
+        # Read-your-writes: the session's own write is visible immediately
+        assert repo.get_by_id(task.id) is not None
+        
+        db_manager.last_write_at = None
+        assert repo.get_all() == []
+        assert db_manager.replicas.lag == [0]
+    
+    def test_unhealthy_replica_falls_back_to_primary(self):
+        """
+        Test that an unreachable replica is skipped in favour of the primary
+        """
+        unreachable = dict(DB_CONFIG_TEST, host="127.0.0.1", port=1)
+        db_manager = DatabaseManager(DB_CONFIG_TEST, replica_configs=[unreachable])
+        repo = TaskRepository(db_manager)
+        task = Task(name="Fallback Task", description="Primary only")
+        repo.add(task)
+        db_manager.last_write_at = None
+        
+        assert [t.id for t in repo.get_all()] == [task.id]
+        assert db_manager.replicas.healthy == [False]
+    
+    def test_replica_refresh_runs_once_in_background(self, monkeypatch):
+        """
+        Test that a stale health check is refreshed by one background probe while reads go on
+        """
+        db_manager = DatabaseManager(DB_CONFIG_TEST, replica_configs=[DB_CONFIG_TEST])
+        pool = db_manager.replicas
+        pool.check_health()
+        pool.checked_at -= 3600
+        
+        probes = []
+        release = threading.Event()
+        
+        def slow_measure(config):
+            probes.append(config)
+            release.wait(5)
+            return 0
+        
+        monkeypatch.setattr(pool, "_measure_lag", slow_measure)
+        picked = []
+        readers = [threading.Thread(target=lambda: picked.append(pool.pick())) for _ in range(8)]
+        for reader in readers:
+            reader.start()
+        for reader in readers:
+            reader.join(1)
+        
+        # Every reader was served from the last known health while the probe was still running
+        assert picked == [DB_CONFIG_TEST] * 8
+        assert len(probes) == 1
+        release.set()
+    
+    # Tests for column projection
+    def test_projection_loads_description_lazily(self, task_repository):
+        """
+        Test that a projected listing skips the description until it is accessed
+        """
+        task = Task(name="Projected Task", description="Loaded on demand")
+        task_repository.add(task)
+        
+        listed = task_repository.get_all(fields=("name", "status"))[0]
+        assert listed.id == task.id
+        assert listed.name == "Projected Task"
+        assert listed._description is NOT_LOADED
+        assert listed.description == "Loaded on demand"
+        assert task_repository.get_by_id(task.id, fields=("status",)).description == "Loaded on demand"
+        
+        with pytest.raises(ValueError):
+            task_repository.get_all(fields=("name", "password"))
+    
+    def test_compressed_descriptions(self, db_manager):
+        """
+        Test that long descriptions round-trip through compressed storage
+        """
+        repo = TaskRepository(db_manager, compress_descriptions=True)
+        long_task = Task(name="Long Task", description="Long text " * 500)
+        short_task = Task(name="Short Task", description="Short text")
+        repo.add(long_task)
+        repo.add_many([short_task])
+        
+        assert repo.get_by_id(long_task.id).description == long_task.description
+        assert repo.get_by_id(short_task.id).description == "Short text"
+        assert repo.search_by_name("Long", fields=("name",))[0].description == long_task.description
+        chunk = next(repo.fetch_columns(("id", "description")))
+        assert list(chunk["description"]) == [long_task.description, "Short text"]
+    
+    # Tests for the next up queue
+    def test_next_tasks_order(self, task_repository):
+        """
+        Test that next_tasks orders open tasks by priority, then due date, undated last
+        """
+        now = datetime.now().replace(microsecond=0)
+        tasks = [
+            Task(name="Low", description="Next", priority=1),
+            Task(name="High later", description="Next", priority=5, due_at=now + timedelta(days=2)),
+            Task(name="High undated", description="Next", priority=5),
+            Task(name="High soon", description="Next", priority=5, due_at=now + timedelta(days=1),
+                 status=TASK_STATE_IN_PROGRESS),
+            Task(name="Done", description="Next", priority=9, status=TASK_STATE_COMPLETED),
+        ]
+        task_repository.add_many(tasks)
+        
+        names = [task.name for task in task_repository.next_tasks(3)]
+        assert names == ["High soon", "High later", "High undated"]
+        assert [task.name for task in task_repository.next_tasks(10, fields=("name",))][-1] == "Low"
+    
+    def test_next_up_view(self, monkeypatch):
+        """
+        Test that the Next up option of show_tasks lists open tasks in priority order
+        """
+        task_manager = TaskManager(DB_CONFIG_TEST)
+        task_manager.task_repository.add(Task(name="Routine", description="Next up"))
+        task_manager.task_repository.add(Task(name="Urgent", description="Next up", priority=9))
+        monkeypatch.setattr('builtins.input', lambda prompt: "3")
+        
+        output = StringIO()
+        monkeypatch.setattr(sys, 'stdout', output)
+        task_manager.show_tasks()
+        
+        printed = output.getvalue()
+        assert printed.index("Urgent") < printed.index("Routine")
+    
+    # Tests for work claims
+    def test_concurrent_claims_are_exclusive(self, task_repository):
+        """
+        Test that workers claiming concurrently never get the same task twice
+        """
+        tasks = [Task(name=f"Queued {i}", description="Claim") for i in range(30)]
+        task_repository.add_many(tasks)
+        
+        def drain(worker_id):
+            repo = TaskRepository(DatabaseManager(DB_CONFIG_TEST))
+            claimed = []
+            while True:
+                batch = repo.claim(3, worker_id)
+                if not batch:
+                    return claimed
+                claimed.extend(task.id for task in batch)
+        
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(drain, [f"worker-{i}" for i in range(4)]))
+        
+        claimed = [task_id for worker_claims in results for task_id in worker_claims]
+        assert sorted(claimed) == sorted(task.id for task in tasks)
+        assert task_repository.count_by_status() == {TASK_STATE_IN_PROGRESS: 30}
+    
+    def test_concurrent_unscoped_claims_all_receive_tasks(self, task_repository):
+        """
+        Test that workers claiming across owners at the same moment each get tasks
+        """
+        for owner_id in (1, 2):
+            TaskRepository(task_repository.db_manager, owner_id=owner_id).add_many(
+                [Task(name=f"Shared {owner_id}-{i}", description="Claim") for i in range(20)])
+        barrier = threading.Barrier(4)
+        
+        def claim_once(worker_id):
+            repo = TaskRepository(DatabaseManager(DB_CONFIG_TEST))
+            barrier.wait()
+            return [task.id for task in repo.claim(5, worker_id)]
+        
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(claim_once, [f"worker-{i}" for i in range(4)]))
+        
+        assert all(len(claimed) == 5 for claimed in results)
+        assert len({task_id for claimed in results for task_id in claimed}) == 20
+    
+    def test_expired_claims_are_requeued(self, task_repository):
+        """
+        Test that an abandoned claim goes back to the queue and the old worker loses it
+        """
+        task = Task(name="Abandoned", description="Claim")
+        task_repository.add(task)
+        
+        assert [t.id for t in task_repository.claim(5, "slow-worker", lease_seconds=0.01)] == [task.id]
+        assert task_repository.claim(5, "other-worker") == []
+        time.sleep(0.05)
+        assert task_repository.requeue_expired_claims() == 1
+        
+        assert [t.id for t in task_repository.claim(5, "other-worker")] == [task.id]
+        assert not task_repository.finish_claim(task.id, "slow-worker")
+        assert task_repository.renew_claim(task.id, "other-worker")
+        assert task_repository.finish_claim(task.id, "other-worker")
+        assert task_repository.get_by_id(task.id).status == TASK_STATE_COMPLETED
+    
+    # Tests for status history
+    def test_status_timeline(self, task_repository):
+        """
+        Test that every transition is appended to the task's timeline
+        """
+        task = Task(name="Tracked Task", description="History")
+        task_repository.add(task)
+        task_repository.update_status(task.id, TASK_STATE_IN_PROGRESS)
+        task_repository.update_status(task.id, TASK_STATE_COMPLETED)
+        
+        timeline = task_repository.status_timeline(task.id)
+        assert [(step["from_status"], step["to_status"]) for step in timeline] == [
+            (None, TASK_STATE_NOT_STARTED),
+            (TASK_STATE_NOT_STARTED, TASK_STATE_IN_PROGRESS),
+            (TASK_STATE_IN_PROGRESS, TASK_STATE_COMPLETED),
+        ]
+        
+        batch = [Task(name=f"Bulk Tracked {i}", description="History") for i in range(3)]
+        task_repository.add_many(batch)
+        assert [len(task_repository.status_timeline(t.id)) for t in batch] == [1, 1, 1]
+    
+    def test_time_in_status_and_cycle_time_stats(self, task_repository):
+        """
+        Test the aggregate statistics over a time window
+        """
+        window_start = datetime.now() - timedelta(seconds=1)
+        tasks = [Task(name=f"Timed {i}", description="History") for i in range(2)]
+        task_repository.add_many(tasks)
+        for task in tasks:
+            task_repository.update_status(task.id, TASK_STATE_IN_PROGRESS)
+        time.sleep(0.2)
+        for task in tasks:
+            task_repository.update_status(task.id, TASK_STATE_COMPLETED)
+        window_end = datetime.now() + timedelta(seconds=1)
+        
+        in_progress = task_repository.time_in_status_stats(TASK_STATE_IN_PROGRESS, window_start, window_end)
+        assert in_progress["count"] == 2
+        assert in_progress["min_seconds"] >= 0.2
+        cycle = task_repository.cycle_time_stats(window_start, window_end)
+        assert cycle["count"] == 2
+        assert cycle["avg_seconds"] >= in_progress["avg_seconds"]
+        
+        earlier = task_repository.cycle_time_stats(window_start - timedelta(days=1), window_start)
+        assert earlier["count"] == 0 and earlier["avg_seconds"] is None
+    
+    # Tests for tags
+    def test_find_by_tag_expressions(self, task_repository):
+        """
+        Test tagging and AND/OR tag queries combined with status
+        """
+        tasks = [Task(name=f"Tagged {i}", description="Tags") for i in range(4)]
+        task_repository.add_many(tasks)
+        task_repository.tag(tasks[0].id, "Backend", "urgent")
+        task_repository.tag(tasks[1].id, "backend", "critical")
+        task_repository.tag(tasks[2].id, "backend")
+        task_repository.tag(tasks[3].id, "urgent")
+        task_repository.update_status(tasks[1].id, TASK_STATE_COMPLETED)
+        
+        def ids(expression, filter_status=None):
+            return [t.id for t in task_repository.find_by_tags(expression, filter_status)]
+        
+        assert task_repository.get_tags(tasks[0].id) == ["backend", "urgent"]
+        assert ids(["backend", "urgent"]) == [tasks[0].id]
+        assert ids(["backend", ("urgent", "critical")]) == [tasks[0].id, tasks[1].id]
+        assert ids([("urgent", "critical")], (TASK_STATE_NOT_STARTED,)) == [tasks[0].id, tasks[3].id]
+        assert ids(["backend", "unknown"]) == []
+        
+        assert task_repository.untag(tasks[0].id, "urgent") == 1
+        assert ids(["backend", "urgent"]) == []
+        assert not task_repository.tag(999999, "backend")
+        with pytest.raises(ValueError):
+            task_repository.tag(tasks[0].id, " ")
+    
+    def test_tag_bitmap_index(self, task_repository):
+        """
+        Test that the bitmap index answers tag queries like the database
+        """
+        tasks = [Task(name=f"Indexed {i}", description="Tags") for i in range(3)]
+        task_repository.add_many(tasks)
+        task_repository.tag(tasks[0].id, "backend", "urgent")
+        task_repository.tag(tasks[1].id, "backend")
+        task_repository.tag(tasks[2].id, "urgent")
+        
+        index = TagBitmapIndex(task_repository)
+        assert index.load()
+        expression = ["backend", ("urgent", "critical")]
+        expected = [t.id for t in task_repository.find_by_tags(expression)]
+        assert index.query(expression) == expected == [tasks[0].id]
+        
+        index.add(tasks[1].id, "Critical", TASK_STATE_NOT_STARTED)
+        assert index.query(expression) == [tasks[0].id, tasks[1].id]
+        index.set_status(tasks[0].id, TASK_STATE_COMPLETED)
+        assert index.query(expression, (TASK_STATE_NOT_STARTED,)) == [tasks[1].id]
+        index.discard(tasks[1].id)
+        assert index.query("backend") == [tasks[0].id]
+    
+    def test_repository_tag_index(self, task_repository, monkeypatch):
+        """
+        Test that a repository with a tag index keeps it current with its own writes
+        """
+        repo = TaskRepository(task_repository.db_manager, tag_index=True)
+        tasks = [Task(name=f"Indexed {i}", description="Tags") for i in range(3)]
+        repo.add_many(tasks)
+        repo.tag(tasks[0].id, "backend")
+        
+        assert [t.id for t in repo.find_by_tags(["backend"])] == [tasks[0].id]
+        assert repo.tag_index.loaded
+        
+        # Large IDs land in their own chunk instead of widening every bitmap
+        repo.tag_index.add(10 ** 9, "backend", TASK_STATE_NOT_STARTED)
+        assert repo.tag_index.query("backend") == [tasks[0].id, 10 ** 9]
+        
+        repo.tag(tasks[1].id, "backend", "urgent")
+        repo.update_status(tasks[0].id, TASK_STATE_COMPLETED)
+        found = repo.find_by_tags(["backend"], filter_status=(TASK_STATE_NOT_STARTED,))
+        assert [t.id for t in found] == [tasks[1].id]
+        
+        repo.untag(tasks[1].id, "urgent")
+        assert repo.find_by_tags(["urgent"]) == []
+        repo.delete(tasks[0].id)
+        assert [t.id for t in repo.find_by_tags(["backend"])] == [tasks[1].id]
+        
+        # Tasks found in the index are loaded a chunk of IDs at a time, in ID order
+        monkeypatch.setattr("repository.TAG_INDEX_FETCH_CHUNK_SIZE", 2)
+        for task in tasks[1:]:
+            repo.tag(task.id, "shared")
+        extra = Task(name="Indexed 3", description="Tags")
+        repo.add(extra)
+        repo.tag(extra.id, "shared")
+        assert [t.id for t in repo.find_by_tags(["shared"])] == [tasks[1].id, tasks[2].id, extra.id]
+    
+    # Tests for bulk transitions
+    def test_bulk_transition_in_chunks(self, task_repository):
+        """
+        Test that a bulk transition walks every chunk and keeps counters in step
+        """
+        old = datetime.now() - timedelta(days=100)
+        tasks = [Task(name=f"Old {i}", description="Bulk", status=TASK_STATE_IN_PROGRESS, created_at=old)
+                 for i in range(7)]
+        tasks.append(Task(name="Recent", description="Bulk", status=TASK_STATE_IN_PROGRESS))
+        task_repository.add_many(tasks)
+        task_filter = {"status": TASK_STATE_IN_PROGRESS, "created_before": datetime.now() - timedelta(days=90)}
+        
+        assert task_repository.bulk_transition(task_filter, TASK_STATE_COMPLETED, dry_run=True) == 7
+        reports = []
+        affected = task_repository.bulk_transition(
+            task_filter, TASK_STATE_COMPLETED, chunk_size=3, pause=0,
+            progress=lambda count, last_id: reports.append(count)
+        )
+        
+        assert affected == 7
+        assert reports == [3, 6, 7]
+        assert task_repository.count_by_status() == {TASK_STATE_IN_PROGRESS: 1, TASK_STATE_COMPLETED: 7}
+        assert task_repository.bulk_transition(task_filter, TASK_STATE_COMPLETED, dry_run=True) == 0
+    
+    def test_bulk_transition_skips_rows_outside_filter(self, task_repository):
+        """
+        Test that a bulk transition does not wait on a locked row the filter excludes
+        """
+        old = datetime.now() - timedelta(days=100)
+        first = Task(name="Old 0", description="Bulk", status=TASK_STATE_IN_PROGRESS, created_at=old)
+        recent = Task(name="Recent", description="Bulk", status=TASK_STATE_IN_PROGRESS)
+        last = Task(name="Old 1", description="Bulk", status=TASK_STATE_IN_PROGRESS, created_at=old)
+        task_repository.add_many([first, recent, last])
+        task_filter = {"status": TASK_STATE_IN_PROGRESS, "created_before": datetime.now() - timedelta(days=90)}
+        
+        conn = mysql.connector.connect(**DB_CONFIG_TEST)
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM tasks WHERE id = %s FOR UPDATE", (recent.id,))
+        cursor.fetchall()
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            future = executor.submit(task_repository.bulk_transition, task_filter, TASK_STATE_COMPLETED, pause=0)
+            assert future.result(timeout=10) == 2
+        finally:
+            conn.rollback()
+            cursor.close()
+            conn.close()
+            executor.shutdown()
+        assert task_repository.get_by_id(recent.id).status == TASK_STATE_IN_PROGRESS
+    
+    def test_bulk_transition_unknown_filter(self, task_repository):
+        """
+        Test that an unsupported filter key is rejected
+        """
+        with pytest.raises(ValueError):
+            task_repository.bulk_transition({"name": "x"}, TASK_STATE_COMPLETED)
+    
+    # Tests for idempotent inserts
+    def test_add_with_idempotency_key(self, task_repository):
+        """
+        Test that a retried add returns the existing task instead of a duplicate
+        """
+        first = Task(name="Once", description="Idempotent", idempotency_key="request-1")
+        retry = Task(name="Once", description="Idempotent", idempotency_key="request-1")
+        assert task_repository.add(first)
+        assert task_repository.add(retry)
+        
+        assert retry.id == first.id
+        assert len(task_repository.get_all()) == 1
+        assert task_repository.count_by_status() == {TASK_STATE_NOT_STARTED: 1}
+        assert len(task_repository.status_timeline(first.id)) == 1
+    
+    def test_add_many_with_idempotency_keys(self, task_repository):
+        """
+        Test that a retried batch only inserts the tasks that are missing
+        """
+        task_repository.add(Task(name="Earlier", description="Idempotent", idempotency_key="row-0"))
+        batch = [Task(name=f"Row {i}", description="Idempotent", idempotency_key=f"row-{i}") for i in range(3)]
+        batch.append(Task(name="Unkeyed", description="Idempotent"))
+        
+        assert task_repository.add_many(batch) == 4
+        retry = [Task(name=f"Row {i}", description="Idempotent", idempotency_key=f"row-{i}") for i in range(3)]
+        assert task_repository.add_many(retry) == 3
+        
+        assert [task.id for task in retry] == [task.id for task in batch[:3]]
+        assert len(task_repository.get_all()) == 4
+        assert task_repository.count_by_status() == {TASK_STATE_NOT_STARTED: 4}
+    
+    # Tests for batch scripts
+    def test_batch_script_all_or_nothing(self, task_repository, tmp_path):
+        """
+        Test that a failing operation discards the whole script
+        """
+        task = Task(name="Scripted", description="Batch")
+        task_repository.add(task)
+        script = tmp_path / "script.jsonl"
+        script.write_text("\n".join(json.dumps(record) for record in [
+            {"op": "add", "name": "New", "description": "Batch"},
+            {"op": "update", "id": task.id, "status": TASK_STATE_IN_PROGRESS},
+            {"op": "delete", "id": task.id + 1000},
+        ]))
+        
+        summary = run_script(task_repository, str(script))
+        
+        assert summary["applied"] == 0
+        assert summary["rolled_back"] == 2
+        assert summary["failed_records"] == [3]
+        assert summary["committed"] == 0
+        assert [t.id for t in task_repository.get_all()] == [task.id]
+        assert task_repository.get_by_id(task.id).status == TASK_STATE_NOT_STARTED
+    
+    def test_batch_script_commit_every(self, task_repository, tmp_path):
+        """
+        Test that per-N commits keep going past failed operations
+        """
+        script = tmp_path / "script.jsonl"
+        script.write_text("\n".join(json.dumps(record) for record in [
+            {"op": "add", "name": "First", "description": "Batch"},
+            {"op": "delete", "id": 999999},
+            {"op": "add", "name": "Second", "description": "Batch", "status": TASK_STATE_COMPLETED},
+        ]))
+        
+        summary = run_script(task_repository, str(script), commit_every=2)
+        
+        assert summary["applied"] == 2
+        assert summary["failed"] == 1
+        assert summary["committed"] == 3
+        assert sorted(t.name for t in task_repository.get_all()) == ["First", "Second"]
+        
+        # A commit interval below 1 is refused before anything runs
+        with pytest.raises(ValueError):
+            task_repository.apply_operations([("add", Task(name="Third", description="Batch"))], commit_every=0)
+        assert len(task_repository.get_all()) == 2
+    
+    def test_sharded_apply_operations(self, shard_configs):
+        """
+        Test that operations run on the shard of their task and report in script order
+        """
+        manager = ShardedDatabaseManager(shard_configs, strategy=ShardedDatabaseManager.STRATEGY_ID)
+        repo = ShardedTaskRepository(manager)
+        tasks = [Task(name=f"Shard Task {i}", description="Sharded") for i in range(2)]
+        for task in tasks:
+            repo.add(task)
+        
+        results, committed = repo.apply_operations([
+            ("update", (tasks[0].id, TASK_STATE_IN_PROGRESS, None)),
+            ("delete", tasks[1].id),
+            ("add", Task(name="Shard Task 2", description="Sharded")),
+        ])
+        
+        assert results == [True, True, True]
+        assert committed == [True, True, True]
+        assert repo.get_by_id(tasks[0].id).status == TASK_STATE_IN_PROGRESS
+        assert [task.name for task in repo.get_all()] == ["Shard Task 0", "Shard Task 2"]
+    
+    def test_batch_script_rejects_invalid_records(self, task_repository, tmp_path):
+        """
+        Negative test for batch scripts - invalid records stop the script before it runs
+        """
+        script = tmp_path / "script.jsonl"
+        script.write_text("\n".join(json.dumps(record) for record in [
+            {"op": "add", "name": "Valid", "description": "Batch"},
+            {"op": "add", "name": "No description"},
+            {"op": "update", "id": 1, "status": TASK_STATE_NOT_STARTED},
+            {"op": "rename", "id": 1},
+            {"op": 3, "id": 1},
+            {"op": "add", "name": ["Not", "text"], "description": "Batch"},
+            {"op": "add", "name": "Bad priority", "description": "Batch", "priority": 1.5},
+        ]))
+        
+        summary = run_script(task_repository, str(script))
+        
+        assert [line for line, _ in summary["errors"]] == [2, 3, 4, 5, 6, 7]
+        assert summary["errors"][0][1] == ERROR_TASK_DESC_REQUIRED
+        assert task_repository.get_all() == []
+    
+    # Tests for snapshots
+    def test_snapshot_round_trip(self, task_repository, tmp_path):
+        """
+        Test that a restored snapshot has the same rows and indexes as the source
+        """
+        tasks = [Task(name=f"Snapshot {i}", description="Snapshot " * i, status=TASK_STATE_IN_PROGRESS,
+                      priority=i % 3, due_at=datetime(2030, 1, 1, 12, 30) if i % 2 else None)
+                 for i in range(5)]
+        task_repository.add_many(tasks)
+        task_repository.tag(tasks[0].id, "snap")
+        task_repository.delete(tasks[1].id)
+        before = task_repository.get_all()
+        path = str(tmp_path / "tasks.snap")
+        
+        row_counts = export_snapshot(task_repository.db_manager, path, chunk_size=2)
+        assert row_counts["tasks"] == 5
+        
+        conn = mysql.connector.connect(**DB_CONFIG_TEST)
+        cursor = conn.cursor()
+        for table in CLEANUP_TABLES:
+            cursor.execute(f"DELETE FROM {table}")
+        conn.commit()
+        
+        assert restore_snapshot(task_repository.db_manager, path, batch_size=2) == row_counts
+        
+        after = task_repository.get_all()
+        assert [(t.id, t.name, t.description, t.status, t.priority, t.due_at) for t in after] == \
+            [(t.id, t.name, t.description, t.status, t.priority, t.due_at) for t in before]
+        assert task_repository.get_tags(tasks[0].id) == ["snap"]
+        assert task_repository.count_by_status() == {TASK_STATE_IN_PROGRESS: 4}
+        cursor.execute("SHOW INDEX FROM tasks WHERE Key_name = 'idx_tasks_owner_next'")
+        assert len(cursor.fetchall()) == 6
+        cursor.close()
+        conn.close()
+    
+    def test_snapshot_corrupt_file(self, task_repository, tmp_path):
+        """
+        Negative test for snapshots - a damaged chunk is rejected before anything is loaded
+        """
+        task_repository.add(Task(name="Snapshot", description="Corrupt"))
+        path = tmp_path / "tasks.snap"
+        export_snapshot(task_repository.db_manager, str(path))
+        data = bytearray(path.read_bytes())
+        data[len(data) // 2] ^= 0xFF
+        path.write_bytes(bytes(data))
+        
+        with pytest.raises(ValueError):
+            restore_snapshot(task_repository.db_manager, str(path))
+    
+    # Tests for change notifications
+    def test_notifications_coalesced_and_filtered(self, db_manager):
+        """
+        Test that committed changes reach matching subscribers in one coalesced batch
+        """
+        bus = NotificationBus()
+        repository = TaskRepository(db_manager, owner_id=1, notification_bus=bus)
+        completed, everything, other_owner = [], [], []
+        bus.subscribe(completed.append, statuses=[TASK_STATE_COMPLETED])
+        bus.subscribe(everything.append, owners=[1])
+        bus.subscribe(other_owner.append, owners=[2])
+        
+        task = Task(name="Notified", description="Events")
+        repository.add(task)
+        repository.update_status(task.id, TASK_STATE_IN_PROGRESS)
+        repository.update_status(task.id, TASK_STATE_COMPLETED)
+        dropped = Task(name="Short lived", description="Events")
+        repository.add(dropped)
+        repository.delete(dropped.id)
+        bus.flush()
+        
+        assert everything == [[{"type": "inserted", "id": task.id, "owner_id": 1,
+                                "status": TASK_STATE_COMPLETED, "from_status": None}]]
+        assert completed == everything
+        assert other_owner == []
+    
+    def test_notifications_over_socket(self, db_manager, tmp_path):
+        """
+        Test that a socket subscriber receives batches published in another thread
+        """
+        bus = NotificationBus(batch_interval=0.05)
+        server = NotificationServer(bus, str(tmp_path / "notify.sock"))
+        bus.start()
+        server.start()
+        repository = TaskRepository(db_manager, notification_bus=bus)
+        received = []
+        
+        def subscriber():
+            for message in listen(server.path, statuses=[TASK_STATE_NOT_STARTED]):
+                received.append(message)
+                return
+        
+        thread = threading.Thread(target=subscriber)
+        thread.start()
+        time.sleep(0.2)
+        repository.add_many([Task(name=f"Socket {i}", description="Events") for i in range(3)])
+        thread.join(5)
+        server.stop()
+        bus.stop()
+        
+        assert [event["type"] for event in received[0]["events"]] == ["inserted"] * 3
+    
+    def test_notification_server_keeps_foreign_paths(self, tmp_path):
+        """
+        Test that the server replaces only a stale socket and creates a private one
+        """
+        path = tmp_path / "notify.sock"
+        path.write_text("not a socket")
+        with pytest.raises(OSError):
+            NotificationServer(NotificationBus(), str(path)).start()
+        assert path.read_text() == "not a socket"
+        
+        path.unlink()
+        server = NotificationServer(NotificationBus(), str(path))
+        server.start()
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+        with pytest.raises(OSError):
+            NotificationServer(NotificationBus(), str(path)).start()
+        server.stop()
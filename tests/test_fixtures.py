@@ -11,8 +11,8 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 # Import our modules
 from constants import TASK_STATE_NOT_STARTED, TASK_STATE_IN_PROGRESS, TASK_STATE_COMPLETED
 from models import Task
-from db_manager import DatabaseManager
-from repository import TaskRepository
+from db_manager import DatabaseManager, ShardedDatabaseManager
+from repository import TaskRepository, ShardedTaskRepository
 from task_manager import TaskManager
 
 # Import test database configuration - raise exception if missing
@@ -21,6 +21,9 @@ try:
 except ImportError:
     raise ImportError("Test database configuration file (test_db_config.py) is missing. Please create this file with your test database settings.")
 
+# Tables emptied before each test
+CLEANUP_TABLES = ["tasks", "task_tombstones", "task_counters", "task_status_history", "tags", "task_tags"]
+
 
 def close_all_connections():
     """Helper function to force close any lingering connections"""
@@ -69,22 +72,13 @@ def recreate_test_database():
         cursor.execute(f"DROP DATABASE IF EXISTS {DB_CONFIG_TEST['database']}")
         cursor.execute(f"CREATE DATABASE {DB_CONFIG_TEST['database']}")
         
-        # Use the database and create the tasks table
-        cursor.execute(f"USE {DB_CONFIG_TEST['database']}")
-        create_table_query = """
-        CREATE TABLE IF NOT EXISTS tasks (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            name VARCHAR(255) NOT NULL,
-            description TEXT NOT NULL,
-            status VARCHAR(20) NOT NULL DEFAULT 'Not started',
-            created_at DATETIME NOT NULL
-        )
-        """
-        cursor.execute(create_table_query)
         conn.commit()
         
         cursor.close()
         conn.close()
+        
+        # Create the tables with the same schema the application uses
+        DatabaseManager(DB_CONFIG_TEST).create_table()
     except Error as e:
         print(f"Error recreating test database: {e}")
 
@@ -121,7 +115,8 @@ def clean_database():
     try:
         conn = mysql.connector.connect(**DB_CONFIG_TEST)
         cursor = conn.cursor()
-        cursor.execute("DELETE FROM tasks")
+        for table in CLEANUP_TABLES:
+            cursor.execute(f"DELETE FROM {table}")
         conn.commit()
         cursor.close()
         conn.close()
@@ -160,4 +155,41 @@ def task_manager(db_manager):
     Fixture to provide a TaskManager instance for testing
     """
     task_manager = TaskManager(DB_CONFIG_TEST)
-    yield task_manager
\ No newline at end of file
+    yield task_manager
+
+
+@pytest.fixture(scope="function")
+def shard_configs():
+    """
+    Fixture to provide two empty shard databases on the test server
+    """
+    configs = [
+        dict(DB_CONFIG_TEST, database=f"{DB_CONFIG_TEST['database']}_shard{index}")
+        for index in range(2)
+    ]
+    for config in configs:
+        manager = DatabaseManager(config)
+        manager.create_database()
+        manager.create_table()
+        conn = mysql.connector.connect(**config)
+        cursor = conn.cursor()
+        for table in CLEANUP_TABLES:
+            cursor.execute(f"DELETE FROM {table}")
+        conn.commit()
+        cursor.close()
+        conn.close()
+    
+    yield configs
+    
+    conn_params = {
+        "host": DB_CONFIG_TEST["host"],
+        "port": DB_CONFIG_TEST.get("port", 3306),
+        "user": DB_CONFIG_TEST["user"],
+        "password": DB_CONFIG_TEST["password"]
+    }
+    conn = mysql.connector.connect(**conn_params)
+    cursor = conn.cursor()
+    for config in configs:
+        cursor.execute(f"DROP DATABASE IF EXISTS {config['database']}")
+    cursor.close()
+    conn.close()
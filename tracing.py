@@ -0,0 +1,364 @@
+import contextvars
+import functools
+import json
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from constants import TRACE_ENV_VAR, TRACE_SAMPLE_ENV_VAR, TRACE_DEFAULT_FILE, TRACE_SAMPLE_RATE
+from profiling import PROFILED_ACTIONS, public_methods
+
+# OTLP span kinds
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_CLIENT = 3
+
+# OTLP status codes
+STATUS_UNSET = 0
+STATUS_ERROR = 2
+
+SCOPE_NAME = "task_manager.tracing"
+SERVICE_NAME = "task-manager"
+
+# Menu actions wrapped by install_tracing, the same set the profiler covers.
+# Repository methods are found with public_methods, like the profiler does.
+TRACED_ACTIONS = PROFILED_ACTIONS
+
+# "IN (%s, %s, %s)" lists grow with the number of IDs, so they are folded
+# into one shape to keep statements comparable between requests
+IN_LIST_PATTERN = re.compile(r"\(\s*%s(?:\s*,\s*%s)+\s*\)")
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+def trace_file_from_env():
+    """
+    Returns the trace file requested through the environment, or None
+    """
+    value = os.environ.get(TRACE_ENV_VAR, "").strip()
+    if not value or value == "0":
+        return None
+    return TRACE_DEFAULT_FILE if value == "1" else value
+
+
+def sample_rate_from_env():
+    """
+    Returns the sampling rate requested through the environment
+    """
+    value = os.environ.get(TRACE_SAMPLE_ENV_VAR, "").strip()
+    return float(value) if value else TRACE_SAMPLE_RATE
+
+
+def sql_shape(statement):
+    """
+    Returns a statement with whitespace collapsed and IN lists folded to "(...)"
+    """
+    return IN_LIST_PATTERN.sub("(...)", " ".join(statement.split()))
+
+
+def _attribute_value(value):
+    # OTLP JSON encodes 64-bit integers as strings
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _attributes(attributes):
+    return [{"key": key, "value": _attribute_value(value)} for key, value in attributes.items()]
+
+
+class _UnsampledSpan:
+    """
+    Stand-in for spans of requests that were not sampled
+    """
+    recording = False
+
+    def set_attribute(self, key, value):
+        pass
+
+
+UNSAMPLED_SPAN = _UnsampledSpan()
+
+
+class Span:
+    """
+    One timed operation of a traced request
+    """
+    recording = True
+
+    def __init__(self, trace, name, kind, parent=None):
+        self.trace = trace
+        self.name = name
+        self.kind = kind
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_span_id = parent.span_id if parent else ""
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = {}
+        self.status = {"code": STATUS_UNSET}
+        # Rows turned into Task objects while this span was current, see record_hydration
+        self.hydrated_rows = 0
+        self.hydration_start_ns = None
+        self.hydration_end_ns = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def record_hydration(self, start_ns, end_ns):
+        if self.hydration_start_ns is None:
+            self.hydration_start_ns = start_ns
+        self.hydration_end_ns = end_ns
+        self.hydrated_rows += 1
+
+    def to_otlp(self):
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": _attributes(self.attributes),
+            "status": self.status,
+        }
+
+
+class Tracer:
+    """
+    Records nested spans per request and appends finished traces to a JSONL file.
+
+    Each line of the file is one trace in the OTLP/JSON layout written by the
+    OpenTelemetry Collector file exporter, so it can be loaded by any OTLP tool.
+    Sampling is decided once per request at the root span; the spans below an
+    unsampled root cost one context variable lookup.
+    """
+    def __init__(self, output_file=TRACE_DEFAULT_FILE, sample_rate=TRACE_SAMPLE_RATE):
+        """
+        Initialize the tracer.
+
+        Args:
+            output_file (str): JSONL file the traces are appended to.
+            sample_rate (float): Fraction of requests that are traced, 0 to 1.
+        """
+        self.output_file = output_file
+        self.sample_rate = sample_rate
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, kind=SPAN_KIND_INTERNAL, root=False):
+        """
+        Opens a span as a child of the current one.
+
+        Args:
+            name (str): Span name.
+            kind (int): OTLP span kind.
+            root (bool): Start a new (possibly sampled) trace when no span is
+                current. Otherwise work outside a traced request is not recorded.
+        """
+        parent = _current_span.get()
+        if parent is None and root:
+            if random.random() < self.sample_rate:
+                span = Span([], name, kind)
+            else:
+                span = UNSAMPLED_SPAN
+        elif parent is not None and parent.recording:
+            span = Span(parent.trace, name, kind, parent)
+        else:
+            yield UNSAMPLED_SPAN
+            return
+
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            if span.recording:
+                span.status = {"code": STATUS_ERROR, "message": str(e)}
+            raise
+        finally:
+            _current_span.reset(token)
+            if span.recording:
+                self._end(span, is_root=parent is None)
+
+    def _end(self, span, is_root):
+        span.end_ns = time.time_ns()
+        if span.hydrated_rows:
+            hydration = Span(span.trace, "repository.hydrate", SPAN_KIND_INTERNAL, span)
+            hydration.start_ns = span.hydration_start_ns
+            hydration.end_ns = span.hydration_end_ns
+            hydration.set_attribute("task.rows", span.hydrated_rows)
+            span.trace.append(hydration)
+        span.trace.append(span)
+        if is_root:
+            self._export(span.trace)
+
+    def _export(self, spans):
+        line = json.dumps({"resourceSpans": [{
+            "resource": {"attributes": _attributes({"service.name": SERVICE_NAME})},
+            "scopeSpans": [{
+                "scope": {"name": SCOPE_NAME},
+                "spans": [span.to_otlp() for span in spans],
+            }],
+        }]})
+        with self._lock:
+            with open(self.output_file, "a") as trace_file:
+                trace_file.write(line + "\n")
+
+    def wrap(self, func, name, kind=SPAN_KIND_INTERNAL, root=True):
+        """
+        Returns func wrapped in a span
+        """
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self.span(name, kind, root=root):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+class TracedCursor:
+    """
+    Cursor proxy that records a span per statement and per fetch
+    """
+    def __init__(self, cursor, tracer):
+        self._cursor = cursor
+        self._tracer = tracer
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        with self._tracer.span("db.query", SPAN_KIND_CLIENT) as span:
+            result = self._cursor.execute(operation, params, *args, **kwargs)
+            if span.recording:
+                statement = sql_shape(operation)
+                span.set_attribute("db.system", "mysql")
+                span.set_attribute("db.operation", statement.split(" ", 1)[0].upper())
+                span.set_attribute("db.statement", statement)
+                span.set_attribute("db.rows_affected", self._cursor.rowcount)
+            return result
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        with self._tracer.span("db.query", SPAN_KIND_CLIENT) as span:
+            if span.recording:
+                seq_params = list(seq_params)
+            result = self._cursor.executemany(operation, seq_params, *args, **kwargs)
+            if span.recording:
+                statement = sql_shape(operation)
+                span.set_attribute("db.system", "mysql")
+                span.set_attribute("db.operation", statement.split(" ", 1)[0].upper())
+                span.set_attribute("db.statement", statement)
+                span.set_attribute("db.batch_size", len(seq_params))
+                span.set_attribute("db.rows_affected", self._cursor.rowcount)
+            return result
+
+    def fetchone(self):
+        with self._tracer.span("db.fetch", SPAN_KIND_CLIENT) as span:
+            row = self._cursor.fetchone()
+            span.set_attribute("db.rows", 0 if row is None else 1)
+            return row
+
+    def fetchmany(self, *args, **kwargs):
+        with self._tracer.span("db.fetch", SPAN_KIND_CLIENT) as span:
+            rows = self._cursor.fetchmany(*args, **kwargs)
+            span.set_attribute("db.rows", len(rows))
+            return rows
+
+    def fetchall(self):
+        with self._tracer.span("db.fetch", SPAN_KIND_CLIENT) as span:
+            rows = self._cursor.fetchall()
+            span.set_attribute("db.rows", len(rows))
+            return rows
+
+
+class TracedConnection:
+    """
+    Connection proxy that hands out traced cursors and records commits
+    """
+    def __init__(self, connection, tracer):
+        self._connection = connection
+        self._tracer = tracer
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def cursor(self, *args, **kwargs):
+        return TracedCursor(self._connection.cursor(*args, **kwargs), self._tracer)
+
+    def commit(self):
+        with self._tracer.span("db.commit", SPAN_KIND_CLIENT):
+            return self._connection.commit()
+
+
+def trace_database_manager(db_manager, tracer):
+    """
+    Records connection checkouts of a DatabaseManager and traces the connections it returns
+    """
+    for manager in getattr(db_manager, "shards", [db_manager]):
+        connect = manager.connect
+
+        @functools.wraps(connect)
+        def traced_connect(read_only=False, connect=connect):
+            with tracer.span("db.connect", SPAN_KIND_CLIENT) as span:
+                connection = connect(read_only=read_only)
+                span.set_attribute("db.read_only", read_only)
+                span.set_attribute("db.connected", connection is not None)
+            return TracedConnection(connection, tracer) if connection else connection
+
+        manager.connect = traced_connect
+
+
+def trace_repository(repository, tracer):
+    """
+    Wraps the methods of a task repository so that each call outside a
+    TaskManager action starts a trace of its own, like an API request
+    """
+    for name in public_methods(repository):
+        setattr(repository, name, tracer.wrap(getattr(repository, name), f"repository.{name}"))
+
+    shard_repositories = getattr(repository, "shards", [repository])
+    for shard_repository in shard_repositories:
+        row_to_task = shard_repository._row_to_task
+
+        def traced_row_to_task(row, row_to_task=row_to_task):
+            span = _current_span.get()
+            if span is None or not span.recording:
+                return row_to_task(row)
+            start_ns = time.time_ns()
+            task = row_to_task(row)
+            span.record_hydration(start_ns, time.time_ns())
+            return task
+
+        shard_repository._row_to_task = traced_row_to_task
+
+    executor = getattr(repository, "_executor", None)
+    if executor is not None:
+        # Shard calls run on pool threads, which would otherwise start without a current span
+        submit = executor.submit
+
+        def traced_submit(fn, *args, **kwargs):
+            return submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+        executor.submit = traced_submit
+    trace_database_manager(repository.db_manager, tracer)
+
+
+def install_tracing(task_manager, output_file=TRACE_DEFAULT_FILE, sample_rate=TRACE_SAMPLE_RATE):
+    """
+    Wraps the menu actions of a TaskManager, the methods of its repository and
+    the connections of its database manager in spans
+    """
+    tracer = Tracer(output_file, sample_rate)
+    for name in TRACED_ACTIONS:
+        setattr(task_manager, name, tracer.wrap(getattr(task_manager, name), f"task_manager.{name}"))
+    trace_repository(task_manager.task_repository, tracer)
+    return tracer
@@ -7,6 +7,79 @@ def is_exit_command(command):
     return isinstance(command, str) and command.lower() == 'exit'
 
 
+def validate_task_fields(name, description, status=TASK_STATE_NOT_STARTED, priority=DEFAULT_PRIORITY):
+    """
+    Validate task fields with the same rules the interactive prompts apply
+    
+    Returns:
+        str: Error message for the first invalid field, or None if the task is valid
+    """
+    if not name or not name.strip():
+        return ERROR_TASK_NAME_REQUIRED
+    if len(name) > MAX_NAME_LENGTH:
+        return ERROR_NAME_TOO_LONG
+    if not description or not description.strip():
+        return ERROR_TASK_DESC_REQUIRED
+    if status not in TASK_STATES:
+        return ERROR_INVALID_STATUS.format(status)
+    if not isinstance(priority, int) or not DEFAULT_PRIORITY <= priority <= MAX_PRIORITY:
+        return ERROR_INVALID_PRIORITY.format(priority)
+    return None
+
+
+def text_field(record, key):
+    """
+    Returns a text field of an imported record, "" when it is missing
+
+    Raises:
+        ValueError: If the field is present but not text
+    """
+    value = record.get(key)
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        raise ValueError(ERROR_INVALID_TEXT_FIELD.format(key, value))
+    return value
+
+
+def normalize_tag(tag):
+    """
+    Returns the stored form of a tag: trimmed and lower case
+    
+    Raises:
+        ValueError: If the tag is empty or too long
+    """
+    normalized = tag.strip().lower() if isinstance(tag, str) else ""
+    if not normalized or len(normalized) > MAX_TAG_LENGTH:
+        raise ValueError(ERROR_INVALID_TAG.format(tag))
+    return normalized
+
+
+def tag_groups(expression):
+    """
+    Normalizes a tag expression into AND-ed groups of OR-ed tags
+    
+    Args:
+        expression (list): Items that must all match. A string is a single tag,
+            a tuple or list of strings matches any of them, e.g.
+            ["backend", ("urgent", "critical")] is backend AND (urgent OR critical).
+        
+    Returns:
+        list: Tuples of normalized tags, one per group
+    """
+    if isinstance(expression, str):
+        expression = [expression]
+    groups = []
+    for item in expression:
+        tags = [item] if isinstance(item, str) else list(item)
+        if not tags:
+            raise ValueError("Empty tag group in expression")
+        groups.append(tuple(sorted({normalize_tag(tag) for tag in tags})))
+    if not groups:
+        raise ValueError("Empty tag expression")
+    return groups
+
+
 def get_input_with_exit(prompt, validation_func=None, error_message=None):
     """
     Get input from user with exit command handling and optional validation
@@ -34,14 +107,14 @@ def get_input_with_exit(prompt, validation_func=None, error_message=None):
             return user_input
 
 
-def get_numeric_input_with_exit(prompt, min_val, max_val, allow_empty=False):
+def get_numeric_input_with_exit(prompt, min_val, max_val=None, allow_empty=False):
     """
     Get numeric input from user with validation and exit command handling
     
     Args:
         prompt (str): Input prompt to display
         min_val (int): Minimum acceptable value
-        max_val (int): Maximum acceptable value
+        max_val (int, optional): Maximum acceptable value, None for no upper limit
         allow_empty (bool): Whether to allow empty input (return None)
         
     Returns:
@@ -58,8 +131,10 @@ def get_numeric_input_with_exit(prompt, min_val, max_val, allow_empty=False):
             
         try:
             value = int(user_input)
-            if min_val <= value <= max_val:
+            if value >= min_val and (max_val is None or value <= max_val):
                 return value
+            elif max_val is None:
+                print(ERROR_INVALID_CHOICE.format(f"{min_val} or higher"))
             else:
                 print(ERROR_INVALID_CHOICE.format(f"{min_val}-{max_val}"))
         except ValueError: